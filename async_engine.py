@@ -0,0 +1,272 @@
+"""
+Async Scan Engine Module
+asyncio front end for the detection system, for embedding in ingestion services
+Bounded queues give backpressure; all blocking work runs off the event loop
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from main_detector import MalwareDetectionSystem, _init_worker, _scan_chunk, _build_worker_system
+
+# Marks the end of a queue's stream
+_DONE = object()
+
+# Seconds between checks for cancellation while the walker waits on a full queue
+_PUT_POLL_SECONDS = 0.25
+
+# Per-thread detection systems for the thread executor
+_thread_state = threading.local()
+
+
+def _thread_scan_chunk(initargs, paths):
+    """Analyze a chunk of files on an executor thread with its own system"""
+    system = getattr(_thread_state, 'system', None)
+    if system is None:
+        system = _thread_state.system = _build_worker_system(*initargs)
+    items = system.process_batch(paths)
+    return items, system.metrics.drain()
+
+
+class AsyncScanEngine:
+    """
+    Asynchronous scanner with bounded queues
+
+    Paths flow from a producer through a bounded path queue to a
+    dispatcher, which batches them onto an executor (worker processes by
+    default, or threads); results flow back through a bounded result
+    queue to the consumer's ``async for``. A slow consumer fills the
+    result queue, which stalls dispatch, which fills the path queue,
+    which blocks the directory walker, so memory stays flat however large
+    the tree is. Walking, file mapping, feature extraction, inference and
+    log writes all run off the event loop.
+
+    Results come back in completion order, not submission order. Like
+    scan_directory, only this process writes the forensic log.
+    """
+
+    def __init__(self, system=None, workers=None, executor='process', batch_size=16,
+                 queue_size=1024, max_in_flight=None):
+        if executor not in ('process', 'thread'):
+            raise ValueError(f"Unknown executor: {executor}")
+
+        self._owns_system = system is None
+        self.system = system or MalwareDetectionSystem()
+        self.workers = workers or os.cpu_count() or 1
+        self.executor_kind = executor
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight or self.workers * 2
+
+        self._executor = None
+        self._writer = None
+        self._initargs = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def start(self):
+        """Start the executors (done automatically on first scan)"""
+        if self._executor is not None:
+            return
+
+        self._initargs = self.system._worker_initargs()
+        if self.executor_kind == 'process':
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=self._initargs
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        # One writer thread keeps log appends ordered and off the loop
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    async def close(self):
+        """
+        Shut down the executors without blocking the event loop
+
+        A system the engine created is closed too (log, scan manifest,
+        verdict cache and IOC store), on this thread: call close from the
+        thread that created the engine, which owns the system's
+        verdict cache connection.
+        """
+        loop = asyncio.get_running_loop()
+        for executor in (self._executor, self._writer):
+            if executor is not None:
+                await loop.run_in_executor(None, executor.shutdown)
+        self._executor = None
+        self._writer = None
+
+        if self._owns_system:
+            self.system.close()
+
+    async def scan_file(self, filepath):
+        """Scan one file, returning its result"""
+        async for _, result in self.scan_paths([filepath]):
+            return result
+
+    def scan_directory(self, directory, recursive=False):
+        """Async iterator of (path, result) for every file under directory"""
+        return self.scan_paths(self.system._iter_directory(directory, recursive))
+
+    async def scan_paths(self, paths):
+        """
+        Scan paths, yielding (path, result) as results complete
+
+        paths may be an async iterable, or a plain (possibly blocking)
+        iterable such as a directory walk, which is consumed on a thread.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        path_queue = asyncio.Queue(self.queue_size)
+        result_queue = asyncio.Queue(self.queue_size)
+        stop = threading.Event()
+
+        producer = loop.create_task(self._produce(paths, path_queue, stop))
+        dispatcher = loop.create_task(self._dispatch(path_queue, result_queue))
+
+        try:
+            while True:
+                item = await result_queue.get()
+                if item is _DONE:
+                    break
+                yield item
+
+            # Surface producer or dispatcher errors
+            await producer
+            await dispatcher
+        finally:
+            stop.set()
+            producer.cancel()
+            dispatcher.cancel()
+
+    async def _produce(self, paths, path_queue, stop):
+        """Feed paths into the bounded path queue, then the end marker"""
+        cancelled = False
+        try:
+            if hasattr(paths, '__aiter__'):
+                async for path in paths:
+                    await path_queue.put(path)
+            else:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._pump, paths, path_queue, stop, loop)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # Nobody drains the queue after a cancellation
+            if not cancelled:
+                await path_queue.put(_DONE)
+
+    def _pump(self, paths, path_queue, stop, loop):
+        """Walk a blocking iterable on a thread, waiting while the queue is full"""
+        for path in paths:
+            future = asyncio.run_coroutine_threadsafe(path_queue.put(path), loop)
+            while True:
+                try:
+                    future.result(_PUT_POLL_SECONDS)
+                    break
+                except FutureTimeoutError:
+                    if stop.is_set():
+                        future.cancel()
+                        return
+            if stop.is_set():
+                return
+
+    async def _dispatch(self, path_queue, result_queue):
+        """Batch queued paths onto the executor, at most max_in_flight at a time"""
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        cancelled = False
+
+        try:
+            finished = False
+            while not finished:
+                path = await path_queue.get()
+                if path is _DONE:
+                    break
+
+                # Take what is already queued, without waiting for a full batch
+                batch = [path]
+                while len(batch) < self.batch_size and not path_queue.empty():
+                    path = path_queue.get_nowait()
+                    if path is _DONE:
+                        finished = True
+                        break
+                    batch.append(path)
+
+                await slots.acquire()
+                task = loop.create_task(self._run_batch(batch, result_queue, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            if not cancelled:
+                await result_queue.put(_DONE)
+
+    async def _run_batch(self, batch, result_queue, slots):
+        """
+        Scan one batch on the executor, record its log entries and queue its results
+
+        The batch keeps its slot until the last result is on the result
+        queue, so a full queue stops new batches from being dispatched.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if self.executor_kind == 'process':
+                items, metrics_snapshot = await loop.run_in_executor(self._executor, _scan_chunk, batch)
+            else:
+                items, metrics_snapshot = await loop.run_in_executor(
+                    self._executor, _thread_scan_chunk, self._initargs, batch
+                )
+
+            await loop.run_in_executor(self._writer, self._finish_batch, items, metrics_snapshot)
+
+            for filepath, result, _ in items:
+                await result_queue.put((filepath, result))
+        finally:
+            slots.release()
+
+    def _finish_batch(self, items, metrics_snapshot):
+        """Merge a batch's metrics and append its log entries (writer thread)"""
+        self.system.metrics.merge(metrics_snapshot)
+        for _, result, log_entry in items:
+            if log_entry is not None:
+                self.system._record_entry(log_entry, result['detector'])
+
+
+async def _scan_and_print(directory, recursive, workers):
+    """Scan a directory with the async engine, printing results as they arrive"""
+    async with AsyncScanEngine(workers=workers) as engine:
+        scanned = 0
+        async for filepath, result in engine.scan_directory(directory, recursive):
+            scanned += 1
+            print(f"  {result['verdict']:<12} {filepath}")
+        print(f"\n{scanned} files scanned")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python async_engine.py <directory> [-r] [workers]")
+        sys.exit(1)
+
+    args = [arg for arg in sys.argv[2:] if arg != '-r']
+    asyncio.run(_scan_and_print(sys.argv[1], '-r' in sys.argv[2:], int(args[0]) if args else None))
@@ -0,0 +1,10 @@
+"""
+Benchmarks Package
+Reproducible synthetic corpora and per-stage timing for the scanner
+
+Run from the repository root:
+    python -m benchmarks -n 200 -o bench_report.json
+"""
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.run_benchmarks import run_benchmarks
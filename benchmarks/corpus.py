@@ -0,0 +1,359 @@
+"""
+Synthetic Corpus Generator
+Builds reproducible JPEG and PE samples offline for benchmarking
+Covers varied EXIF payloads, section/import/resource layouts and malformed files
+"""
+
+import json
+import os
+import random
+import struct
+
+# --- JPEG -------------------------------------------------------------------
+
+TIFF_ASCII = 2
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_RATIONAL = 5
+TIFF_UNDEFINED = 7
+
+JPEG_MALFORMATIONS = ('bad_ifd_offset', 'truncated_app1', 'ifd_loop', 'no_exif')
+
+CAMERAS = (
+    (b'Canon', b'Canon EOS 5D Mark IV'),
+    (b'NIKON CORPORATION', b'NIKON D850'),
+    (b'SONY', b'ILCE-7M3'),
+    (b'Apple', b'iPhone 14 Pro'),
+    (b'samsung', b'SM-G991B'),
+)
+
+
+def _ascii(value):
+    """TIFF ASCII field bytes (NUL terminated)"""
+    return value + b'\x00'
+
+
+def _build_ifd(entries, offset, next_ifd=0):
+    """
+    Serialize one little-endian IFD located at offset
+
+    entries is a list of (tag, type, count, raw_bytes); values longer than
+    four bytes are placed right after the directory.
+    """
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    directory = struct.pack('<H', len(entries))
+    extra = b''
+
+    for tag, field_type, count, raw in sorted(entries):
+        if len(raw) <= 4:
+            field = raw.ljust(4, b'\x00')
+        else:
+            field = struct.pack('<I', data_offset + len(extra))
+            extra += raw + (b'\x00' if len(raw) % 2 else b'')
+        directory += struct.pack('<HHI', tag, field_type, count) + field
+
+    return directory + struct.pack('<I', next_ifd) + extra
+
+
+def build_exif_tiff(rng, maker_note_size, comment_size, malformation=None):
+    """Build a TIFF block with IFD0 and an Exif IFD of the requested sizes"""
+    make, model = rng.choice(CAMERAS)
+    software = b'Firmware ' + str(rng.randint(1, 9)).encode() + b'.' + str(rng.randint(0, 99)).encode()
+
+    ifd0_entries = [
+        (0x010F, TIFF_ASCII, len(make) + 1, _ascii(make)),
+        (0x0110, TIFF_ASCII, len(model) + 1, _ascii(model)),
+        (0x0131, TIFF_ASCII, len(software) + 1, _ascii(software)),
+        (0x0112, TIFF_SHORT, 1, struct.pack('<H', rng.randint(1, 8))),
+        (0x011A, TIFF_RATIONAL, 1, struct.pack('<II', 72, 1)),
+        (0x8769, TIFF_LONG, 1, struct.pack('<I', 0)),
+    ]
+
+    date = b'20%02d:%02d:%02d 12:00:00' % (rng.randint(10, 24), rng.randint(1, 12), rng.randint(1, 28))
+    maker_note = bytes(rng.getrandbits(8) for _ in range(maker_note_size))
+    comment = b'ASCII\x00\x00\x00' + bytes(rng.choice(b'abcdefghij <>/;=') for _ in range(comment_size))
+    exif_entries = [
+        (0x9003, TIFF_ASCII, len(date) + 1, _ascii(date)),
+        (0x927C, TIFF_UNDEFINED, len(maker_note), maker_note),
+        (0x9286, TIFF_UNDEFINED, len(comment), comment),
+    ]
+
+    # IFD0's size does not depend on the pointer value, so lay it out twice
+    ifd0 = _build_ifd(ifd0_entries, 8)
+    exif_offset = 8 + len(ifd0)
+    ifd0_entries[-1] = (0x8769, TIFF_LONG, 1, struct.pack('<I', exif_offset))
+
+    next_ifd = 8 if malformation == 'ifd_loop' else 0
+    ifd0 = _build_ifd(ifd0_entries, 8, next_ifd)
+    exif_ifd = _build_ifd(exif_entries, exif_offset)
+
+    ifd0_offset = 8
+    if malformation == 'bad_ifd_offset':
+        ifd0_offset = 0x7FFFFFF0
+
+    return b'II*\x00' + struct.pack('<I', ifd0_offset) + ifd0 + exif_ifd
+
+
+def make_jpeg(rng, maker_note_size, comment_size, malformation=None):
+    """Build a minimal baseline JPEG with an Exif APP1 segment"""
+    width = rng.choice((640, 800, 1024, 1920, 4032))
+    height = rng.choice((480, 600, 768, 1080, 3024))
+
+    segments = [b'\xff\xd8']
+
+    if malformation != 'no_exif':
+        tiff = build_exif_tiff(rng, maker_note_size, comment_size, malformation)
+        payload = b'Exif\x00\x00' + tiff
+        declared = len(payload) + 2
+        if malformation == 'truncated_app1':
+            declared = 0xFFFF
+        segments.append(b'\xff\xe1' + struct.pack('>H', declared) + payload)
+        if malformation == 'truncated_app1':
+            return b''.join(segments)
+
+    segments.append(b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00')
+    scan = bytes(rng.getrandbits(8) for _ in range(rng.randint(512, 4096))).replace(b'\xff', b'\x00')
+    segments.append(b'\xff\xda' + struct.pack('>H', 8) + b'\x01\x01\x00\x00\x3f\x00' + scan)
+    segments.append(b'\xff\xd9')
+
+    return b''.join(segments)
+
+
+# --- PE ---------------------------------------------------------------------
+
+PE_MALFORMATIONS = ('truncated', 'bad_lfanew', 'bad_import_rva', 'huge_section_count')
+
+CLEAN_DLLS = (
+    b'KERNEL32.dll', b'USER32.dll', b'GDI32.dll', b'ADVAPI32.dll', b'SHELL32.dll',
+    b'COMCTL32.dll', b'OLE32.dll', b'VERSION.dll', b'VCRUNTIME140.dll', b'MSVCRT.dll'
+)
+SUSPICIOUS_DLLS = (
+    b'WS2_32.dll', b'WSOCK32.dll', b'WININET.dll', b'URLMON.dll', b'CRYPT32.dll',
+    b'NTDLL.dll', b'PSAPI.dll', b'WINHTTP.dll'
+)
+
+FILE_ALIGNMENT = 0x200
+SECTION_ALIGNMENT = 0x1000
+
+
+def _align(value, alignment):
+    return (value + alignment - 1) // alignment * alignment
+
+
+def _import_section(dlls, rva):
+    """Import descriptors followed by the DLL name strings"""
+    table_size = (len(dlls) + 1) * 20
+    names = b''
+    descriptors = b''
+    for dll in dlls:
+        name_rva = rva + table_size + len(names)
+        descriptors += struct.pack('<IIIII', 0, 0, 0, name_rva, rva)
+        names += dll + b'\x00'
+    return descriptors + b'\x00' * 20 + names
+
+
+def _resource_section(resources):
+    """Root resource directory with one subdirectory per (type_id, count)"""
+    root = struct.pack('<IIHHHH', 0, 0, 0, 0, 0, len(resources))
+    subdirs = b''
+    entries = b''
+    subdir_base = 16 + 8 * len(resources)
+    for type_id, count in resources:
+        entries += struct.pack('<II', type_id, 0x80000000 | (subdir_base + len(subdirs)))
+        subdirs += struct.pack('<IIHHHH', 0, 0, 0, 0, 0, count)
+        subdirs += b''.join(struct.pack('<II', i + 1, 0) for i in range(count))
+    return root + entries + subdirs
+
+
+def make_pe(rng, pe32_plus=False, text_size=4096, dlls=CLEAN_DLLS[:3], resources=((3, 2), (16, 1)),
+            extra_sections=0, timestamp=1600000000, is_dll=False, malformation=None):
+    """Build a structurally valid PE32/PE32+ image (optionally damaged)"""
+    opt_size = 240 if pe32_plus else 224
+    section_names = [b'.text', b'.rdata', b'.data']
+    if resources:
+        section_names.append(b'.rsrc')
+    section_names += [b'.sec%d' % i for i in range(extra_sections)]
+
+    e_lfanew = 0x80
+    headers_size = _align(e_lfanew + 4 + 20 + opt_size + 40 * len(section_names), FILE_ALIGNMENT)
+
+    # Lay out section contents and addresses
+    contents = {}
+    contents[b'.text'] = bytes(rng.getrandbits(8) for _ in range(text_size))
+    contents[b'.data'] = bytes(rng.randint(0, 16) for _ in range(rng.randint(256, 2048)))
+    for name in section_names[4 if resources else 3:]:
+        contents[name] = bytes(rng.getrandbits(8) for _ in range(rng.randint(128, 1024)))
+
+    rvas = {}
+    next_rva = SECTION_ALIGNMENT
+    for name in section_names:
+        rvas[name] = next_rva
+        size = len(contents.get(name, b'')) or 1024
+        next_rva += _align(size, SECTION_ALIGNMENT)
+
+    contents[b'.rdata'] = _import_section(dlls, rvas[b'.rdata'])
+    if resources:
+        contents[b'.rsrc'] = _resource_section(resources)
+
+    # Section table and raw data
+    section_table = b''
+    raw = b''
+    raw_pointer = headers_size
+    characteristics = {
+        b'.text': 0x60000020, b'.rdata': 0x40000040, b'.data': 0xC0000040, b'.rsrc': 0x40000040
+    }
+    for name in section_names:
+        body = contents[name]
+        raw_size = _align(len(body), FILE_ALIGNMENT)
+        section_table += struct.pack(
+            '<8sIIIIIIHHI', name, len(body), rvas[name], raw_size, raw_pointer,
+            0, 0, 0, 0, characteristics.get(name, 0xE0000020)
+        )
+        raw += body.ljust(raw_size, b'\x00')
+        raw_pointer += raw_size
+
+    size_of_image = next_rva
+    size_of_code = _align(len(contents[b'.text']), FILE_ALIGNMENT)
+
+    # Data directories: import and resource
+    directories = [(0, 0)] * 16
+    import_rva = rvas[b'.rdata']
+    if malformation == 'bad_import_rva':
+        import_rva = 0x7FFF0000
+    directories[1] = (import_rva, (len(dlls) + 1) * 20)
+    if resources:
+        directories[2] = (rvas[b'.rsrc'], len(contents[b'.rsrc']))
+    data_dirs = b''.join(struct.pack('<II', rva, size) for rva, size in directories)
+
+    entry_point = rvas[b'.text'] + rng.randint(0, 64)
+    if pe32_plus:
+        optional = struct.pack(
+            '<HBBIIIII', 0x20B, 14, rng.randint(0, 30), size_of_code, 0x1000, 0, entry_point, rvas[b'.text']
+        ) + struct.pack(
+            '<QIIHHHHHHIIIIHHQQQQII', 0x140000000, SECTION_ALIGNMENT, FILE_ALIGNMENT, 6, 0, 0, 0, 6, 0, 0,
+            size_of_image, headers_size, 0, 2 if rng.random() < 0.7 else 3, 0x8160,
+            0x100000, 0x1000, 0x100000, 0x1000, 0, 16
+        )
+    else:
+        optional = struct.pack(
+            '<HBBIIIIII', 0x10B, rng.choice((6, 9, 14)), rng.randint(0, 30), size_of_code, 0x1000, 0,
+            entry_point, rvas[b'.text'], rvas[b'.data']
+        ) + struct.pack(
+            '<IIIHHHHHHIIIIHHIIIIII', 0x400000, SECTION_ALIGNMENT, FILE_ALIGNMENT, 5, 1, 0, 0, 5, 1, 0,
+            size_of_image, headers_size, 0, 2 if rng.random() < 0.7 else 3, 0x8140,
+            0x100000, 0x1000, 0x100000, 0x1000, 0, 16
+        )
+    optional += data_dirs
+
+    num_sections = len(section_names)
+    if malformation == 'huge_section_count':
+        num_sections = 0xFFFF
+    coff = struct.pack(
+        '<HHIIIHH', 0x8664 if pe32_plus else 0x14C, num_sections, timestamp, 0, 0, opt_size,
+        0x2102 if is_dll else 0x0102
+    )
+
+    dos = bytearray(e_lfanew)
+    dos[0:2] = b'MZ'
+    struct.pack_into('<I', dos, 0x3C, 0x7FFFFFF0 if malformation == 'bad_lfanew' else e_lfanew)
+
+    headers = (bytes(dos) + b'PE\x00\x00' + coff + optional + section_table).ljust(headers_size, b'\x00')
+    image = headers + raw
+
+    if malformation == 'truncated':
+        image = image[:rng.randint(e_lfanew + 24, headers_size + 64)]
+
+    return image
+
+
+# --- Corpus -----------------------------------------------------------------
+
+def generate_jpeg(rng, malicious, malformation=None):
+    """One JPEG sample; malicious samples carry oversized EXIF payloads"""
+    if malicious:
+        maker_note = rng.randint(8000, 40000)
+        comment = rng.randint(2000, 15000)
+    else:
+        maker_note = rng.randint(64, 2048)
+        comment = rng.randint(0, 64)
+    return make_jpeg(rng, maker_note, comment, malformation)
+
+
+def generate_pe(rng, malicious, malformation=None):
+    """One PE sample; malicious samples lean on network DLLs and odd headers"""
+    if malicious:
+        dlls = rng.sample(CLEAN_DLLS[:4], 1) + rng.sample(SUSPICIOUS_DLLS, rng.randint(2, 5))
+        resources = ((10, rng.randint(0, 2)),) if rng.random() < 0.5 else ()
+        timestamp = rng.choice((0, rng.randint(2100000000, 4000000000)))
+        text_size = rng.randint(1024, 8192)
+        extra_sections = rng.randint(1, 4)
+    else:
+        dlls = rng.sample(CLEAN_DLLS, rng.randint(3, 8))
+        resources = ((3, rng.randint(1, 12)), (14, 1), (16, 1), (24, 1))
+        timestamp = rng.randint(1100000000, 1900000000)
+        text_size = rng.randint(4096, 32768)
+        extra_sections = rng.randint(0, 1)
+
+    return make_pe(
+        rng,
+        pe32_plus=rng.random() < 0.5,
+        text_size=text_size,
+        dlls=dlls,
+        resources=resources,
+        extra_sections=extra_sections,
+        timestamp=timestamp,
+        is_dll=rng.random() < 0.2,
+        malformation=malformation
+    )
+
+
+def generate_corpus(out_dir, n_jpeg=200, n_pe=200, n_other=100, seed=1234,
+                    malicious_ratio=0.3, malformed_ratio=0.05):
+    """
+    Write a reproducible synthetic corpus under out_dir
+
+    Produces out_dir/jpeg/*.jpg, out_dir/pe/*.exe|dll and out_dir/other/*
+    (unsupported text files), plus corpus_manifest.json listing every
+    sample with its label and malformation. The same seed always yields
+    byte-identical files. Returns the manifest.
+    """
+    rng = random.Random(seed)
+    manifest = {'seed': seed, 'jpeg': [], 'pe': [], 'other': []}
+
+    for subdir in ('jpeg', 'pe', 'other'):
+        os.makedirs(os.path.join(out_dir, subdir), exist_ok=True)
+
+    for kind, count, generate, malformations in (
+        ('jpeg', n_jpeg, generate_jpeg, JPEG_MALFORMATIONS),
+        ('pe', n_pe, generate_pe, PE_MALFORMATIONS)
+    ):
+        for i in range(count):
+            malicious = rng.random() < malicious_ratio
+            malformation = rng.choice(malformations) if rng.random() < malformed_ratio else None
+            data = generate(rng, malicious, malformation)
+
+            ext = '.jpg' if kind == 'jpeg' else rng.choice(('.exe', '.exe', '.dll'))
+            path = os.path.join(out_dir, kind, f'{kind}_{i:06d}{ext}')
+            with open(path, 'wb') as f:
+                f.write(data)
+
+            manifest[kind].append({
+                'path': path,
+                'label': 1 if malicious else 0,
+                'malformation': malformation,
+                'size': len(data)
+            })
+
+    for i in range(n_other):
+        path = os.path.join(out_dir, 'other', f'other_{i:06d}.txt')
+        lines = rng.randint(10, 400)
+        with open(path, 'w') as f:
+            for line in range(lines):
+                f.write(f'{line:06d} log line {rng.getrandbits(64):016x}\n')
+        manifest['other'].append({'path': path, 'label': None, 'malformation': None,
+                                  'size': os.path.getsize(path)})
+
+    with open(os.path.join(out_dir, 'corpus_manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
@@ -0,0 +1,230 @@
+"""
+Benchmark Runner
+Times each scanner stage over a synthetic corpus and writes a JSON report
+Reports files/sec, MB/s and p50/p95/p99 latency per stage
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.corpus import generate_corpus
+from file_walker import FileWalker
+from main_detector import MalwareDetectionSystem
+from jpeg_exif_detector import JPEGExifDetector
+from pe_file_detector import PEFileDetector
+from forensic_tracer import ForensicTracer
+
+REPORT_VERSION = 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies_ns, total_bytes, wall_ns=None):
+    """Throughput and latency summary for one stage"""
+    wall_ns = wall_ns if wall_ns is not None else sum(latencies_ns)
+    seconds = wall_ns / 1e9
+    files = len(latencies_ns)
+    ordered = sorted(latencies_ns)
+
+    def ms(value):
+        return None if value is None else round(value / 1e6, 4)
+
+    return {
+        'files': files,
+        'bytes': total_bytes,
+        'seconds': round(seconds, 6),
+        'files_per_sec': round(files / seconds, 2) if seconds else None,
+        'mb_per_sec': round(total_bytes / 1e6 / seconds, 3) if seconds else None,
+        'latency_ms': {
+            'mean': ms(sum(ordered) / files) if files else None,
+            'p50': ms(percentile(ordered, 50)),
+            'p95': ms(percentile(ordered, 95)),
+            'p99': ms(percentile(ordered, 99)),
+            'max': ms(ordered[-1]) if ordered else None
+        }
+    }
+
+
+def time_stage(samples, func, repeat=1):
+    """
+    Time func(sample) for every sample, returning the stage summary
+
+    samples are manifest records ({'path', 'size', ...}); with repeat > 1
+    each file is timed repeat times and every run counts as one sample.
+    """
+    latencies = []
+    total_bytes = 0
+    clock = time.perf_counter_ns
+
+    for _ in range(repeat):
+        for sample in samples:
+            start = clock()
+            func(sample['path'])
+            latencies.append(clock() - start)
+            total_bytes += sample['size']
+
+    return summarize(latencies, total_bytes)
+
+
+def train_detectors(train_dir, seed, n_files):
+    """Train both detectors on a separate synthetic corpus"""
+    manifest = generate_corpus(train_dir, n_jpeg=n_files, n_pe=n_files, n_other=0, seed=seed,
+                               malformed_ratio=0.0)
+
+    def split(kind):
+        clean = [s['path'] for s in manifest[kind] if s['label'] == 0]
+        malicious = [s['path'] for s in manifest[kind] if s['label'] == 1]
+        return clean, malicious
+
+    jpeg_detector = JPEGExifDetector()
+    pe_detector = PEFileDetector()
+    with contextlib.redirect_stdout(io.StringIO()):
+        jpeg_detector.train(*split('jpeg'))
+        pe_detector.train(*split('pe'))
+
+    return jpeg_detector, pe_detector
+
+
+def run_benchmarks(work_dir, n_files=200, seed=1234, repeat=1, workers=1):
+    """
+    Generate the corpus, train quick models and time every stage
+
+    Returns the report dict. Scanner output is suppressed while timing so
+    terminal speed does not leak into the numbers.
+    """
+    corpus_dir = os.path.join(work_dir, 'corpus')
+    manifest = generate_corpus(corpus_dir, n_jpeg=n_files, n_pe=n_files, n_other=n_files // 2, seed=seed)
+    jpeg_samples = manifest['jpeg']
+    pe_samples = manifest['pe']
+    all_samples = jpeg_samples + pe_samples + manifest['other']
+
+    jpeg_detector, pe_detector = train_detectors(os.path.join(work_dir, 'train'), seed + 1, max(50, n_files // 2))
+
+    system = MalwareDetectionSystem(log_file=os.path.join(work_dir, 'scan_log.jsonl'))
+    system.jpeg_detector = jpeg_detector
+    system.pe_detector = pe_detector
+
+    tracer = ForensicTracer(log_file=os.path.join(work_dir, 'bench_log.jsonl'))
+    scanned = [s for s in jpeg_samples + pe_samples if not s['malformation']]
+
+    stages = {}
+    stages['detect_file_type'] = time_stage(all_samples, system.detect_file_type, repeat)
+    stages['extract_exif_features'] = time_stage(jpeg_samples, jpeg_detector.extract_exif_features, repeat)
+    stages['extract_pe_features'] = time_stage(pe_samples, pe_detector.extract_pe_features, repeat)
+    stages['predict_jpeg'] = time_stage(jpeg_samples, jpeg_detector.predict, repeat)
+    stages['predict_pe'] = time_stage(pe_samples, pe_detector.predict, repeat)
+    stages['calculate_file_hash'] = time_stage(all_samples, tracer.calculate_file_hash, repeat)
+    stages['calculate_file_hashes'] = time_stage(all_samples, tracer.calculate_file_hashes, repeat)
+    stages['log_detection'] = time_stage(
+        scanned, lambda path: tracer.log_detection(path, 'MALICIOUS', 0.9, 'BENCHMARK'), repeat
+    )
+    tracer.close()
+
+    # End to end: only throughput is meaningful here, per-file latency is
+    # not observable from outside scan_directory. MB/s counts the bytes of
+    # the files the scan's default filter keeps, not the skipped ones.
+    total_bytes = sum(s['size'] for s in all_samples)
+    scanned_bytes = sum(
+        entry.stat().st_size for entry in FileWalker(system.make_file_filter()).walk(corpus_dir)
+    )
+    wall = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = system.scan_directory(corpus_dir, recursive=True, workers=workers)
+        wall.append(time.perf_counter_ns() - start)
+    end_to_end = summarize([], scanned_bytes * repeat, sum(wall))
+    end_to_end['files'] = len(results) * repeat
+    end_to_end['files_per_sec'] = round(end_to_end['files'] / (sum(wall) / 1e9), 2)
+    end_to_end['workers'] = workers
+    stages['scan_directory'] = end_to_end
+    system.tracer.close()
+
+    return {
+        'report_version': REPORT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'environment': {
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'corpus': {
+            'seed': seed,
+            'jpeg_files': len(jpeg_samples),
+            'pe_files': len(pe_samples),
+            'other_files': len(manifest['other']),
+            'malformed_files': sum(1 for s in all_samples if s['malformation']),
+            'total_bytes': total_bytes
+        },
+        'repeat': repeat,
+        'stages': stages
+    }
+
+
+def print_report(report):
+    """Human-readable table of the report"""
+    print(f"\n{'='*86}")
+    print(f"{'Stage':<24}{'files':>8}{'files/s':>12}{'MB/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print(f"{'-'*86}")
+    for name, stage in report['stages'].items():
+        latency = stage['latency_ms']
+
+        def fmt(value, width, digits):
+            return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+        print(f"{name:<24}{stage['files']:>8}{fmt(stage['files_per_sec'], 12, 1)}"
+              f"{fmt(stage['mb_per_sec'], 10, 2)}{fmt(latency['p50'], 10, 3)}"
+              f"{fmt(latency['p95'], 10, 3)}{fmt(latency['p99'], 10, 3)}")
+    print(f"{'='*86}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the malware detection pipeline')
+    parser.add_argument('-n', '--files', type=int, default=200,
+                        help='JPEG and PE files each in the corpus (default: 200)')
+    parser.add_argument('--seed', type=int, default=1234, help='Corpus seed (default: 1234)')
+    parser.add_argument('--repeat', type=int, default=1, help='Timed passes per stage (default: 1)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Worker processes for the scan_directory stage (default: 1)')
+    parser.add_argument('-o', '--output', default='bench_report.json',
+                        help='Where to write the JSON report (default: bench_report.json)')
+    parser.add_argument('--work-dir', help='Keep the corpus and logs in this directory')
+
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='malware_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    try:
+        report = run_benchmarks(work_dir, n_files=args.files, seed=args.seed, repeat=args.repeat,
+                                workers=args.workers)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    print(f"\nReport written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Cascade Module
+Tiered scanning: a header-only screen settles confident files cheaply
+Only ambiguous files escalate to full feature extraction and the forest
+"""
+
+from feature_schema import JPEG_SUMMARY_FEATURES, JPEG_UNKNOWN_FEATURES
+
+# Tier-1 confidence a screen verdict needs to settle a file, per scan mode
+# (None: that verdict always escalates). 'deep' never screens.
+SCAN_MODES = {
+    'fast': {'clean': 0.90, 'malicious': 0.95},
+    'balanced': {'clean': 0.98, 'malicious': 0.995},
+    'deep': None
+}
+DEFAULT_SCAN_MODE = 'deep'
+
+# Columns the screen may split on: header-only indicators each detector
+# computes before (or without) its full feature pass
+SCREEN_FEATURES = {
+    'PE_MINER': (
+        'timestamp_suspicious', 'code_to_file_ratio', 'sections_per_kb', 'is_dll',
+        'is_executable', 'file_size', 'num_sections', 'timestamp', 'characteristics',
+        'size_of_optional_header', 'major_linker_version', 'size_of_code',
+        'size_of_init_data', 'entry_point', 'size_of_image', 'size_of_headers',
+        'checksum', 'subsystem', 'dll_characteristics', 'dd_import_size',
+        'dd_resource_size', 'dd_security_size', 'dd_debug_size', 'dd_tls_size'
+    ),
+    'JPEG_EXIF': JPEG_UNKNOWN_FEATURES + JPEG_SUMMARY_FEATURES
+}
+
+# A shallow tree is cheap to walk and hard to overfit; leaves must be
+# backed by enough training files for their confidence to mean much
+SCREEN_MAX_DEPTH = 4
+SCREEN_MIN_LEAF = 10
+
+
+def resolve_thresholds(mode, clean=None, malicious=None):
+    """
+    Screen thresholds for a scan mode, with per-verdict overrides, or
+    None when the mode does not screen
+    """
+    if mode not in SCAN_MODES:
+        raise ValueError(f"Unknown scan mode: {mode} (expected one of {', '.join(SCAN_MODES)})")
+    thresholds = SCAN_MODES[mode]
+    if thresholds is None:
+        return None
+
+    thresholds = dict(thresholds)
+    for verdict, value in (('clean', clean), ('malicious', malicious)):
+        if value is not None:
+            if not 0.5 <= value <= 1.0:
+                raise ValueError(f"Screen {verdict} threshold must be between 0.5 and 1.0, got {value}")
+            thresholds[verdict] = value
+    return thresholds
+
+
+class ScreenModel:
+    """
+    Tier-1 model: a shallow decision tree over a detector's header-only
+    columns, flattened to plain lists and walked in pure Python
+
+    It is fit on the same training matrix as the forest, restricted to
+    SCREEN_FEATURES, and saved in the model manifest. Walking it costs a
+    handful of comparisons, so a file it settles skips the detector's
+    full feature pass and the forest. Splits compare float(row[column])
+    <= threshold, as scikit-learn does on float32 input.
+
+    Leaf probabilities are Laplace-smoothed training class frequencies,
+    (n_class + 1) / (n_leaf + n_classes), so a pure leaf backed by a
+    handful of files cannot claim certainty: the settle thresholds then
+    require both purity and support.
+    """
+
+    def __init__(self, feature_names, feature, threshold, left, right, proba, classes, schema):
+        self.feature_names = list(feature_names)
+        self.feature = list(feature)
+        self.threshold = list(threshold)
+        self.left = list(left)
+        self.right = list(right)
+        self.proba = [list(p) for p in proba]
+        self.classes = list(classes)
+
+        self.columns = [schema.column(name) for name in self.feature_names]
+        if None in self.columns:
+            missing = self.feature_names[self.columns.index(None)]
+            raise ValueError(f"Screen feature {missing} is not in the {schema.detector_type} schema")
+
+    @classmethod
+    def fit(cls, X, y, schema, max_depth=SCREEN_MAX_DEPTH, min_samples_leaf=SCREEN_MIN_LEAF):
+        """Fit a screen on the schema's screen columns of X, or return None if it cannot be fit"""
+        import numpy as np
+        from sklearn.tree import DecisionTreeClassifier
+
+        names = [name for name in SCREEN_FEATURES.get(schema.detector_type, ()) if name in schema.index]
+        if not names or len(np.unique(y)) < 2:
+            return None
+
+        columns = [schema.index[name] for name in names]
+        tree = DecisionTreeClassifier(
+            max_depth=max_depth, min_samples_leaf=min_samples_leaf, random_state=42
+        ).fit(np.asarray(X[:, columns], dtype=np.float32), y)
+
+        t = tree.tree_
+        value = t.value[:, 0, :].astype(np.float64)
+        fractions = value / np.maximum(value.sum(axis=1), 1e-12)[:, np.newaxis]
+        counts = fractions * t.n_node_samples[:, np.newaxis]
+        n_classes = counts.shape[1]
+        proba = (counts + 1.0) / (t.n_node_samples[:, np.newaxis] + n_classes)
+
+        return cls(
+            names,
+            [int(f) for f in t.feature],
+            [float(v) for v in t.threshold],
+            [int(c) for c in t.children_left],
+            [int(c) for c in t.children_right],
+            proba.tolist(),
+            [int(c) for c in tree.classes_],
+            schema
+        )
+
+    def leaf(self, row):
+        """Index of the leaf row falls into"""
+        left, right, feature, threshold, columns = self.left, self.right, self.feature, self.threshold, self.columns
+        node = 0
+        while left[node] >= 0:
+            if float(row[columns[feature[node]]]) <= threshold[node]:
+                node = left[node]
+            else:
+                node = right[node]
+        return node
+
+    def settle(self, row, thresholds):
+        """
+        Class probabilities for row if the screen is confident enough to
+        settle it under thresholds ({'clean': p, 'malicious': p}), else None
+        """
+        proba = self.proba[self.leaf(row)]
+        best = max(range(len(proba)), key=proba.__getitem__)
+        limit = thresholds.get('malicious' if self.classes[best] == 1 else 'clean')
+        if limit is not None and proba[best] >= limit:
+            return proba
+        return None
+
+    def to_dict(self):
+        """JSON-serializable form, stored in model manifests"""
+        return {
+            'feature_names': self.feature_names,
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'proba': self.proba,
+            'classes': self.classes
+        }
+
+    @classmethod
+    def from_dict(cls, state, schema):
+        """Rebuild a screen saved by to_dict, resolving its columns in schema"""
+        return cls(
+            state['feature_names'], state['feature'], state['threshold'], state['left'],
+            state['right'], state['proba'], state['classes'], schema
+        )
@@ -0,0 +1,11 @@
+"""
+Checks Package
+Behavior checks for the scanner's hand-written fast paths
+Each one compares a fast path with a reference, or with the inputs that built its data
+
+Run from the repository root:
+    python -m checks
+    python -m checks forest_engine
+"""
+
+from checks.run_checks import CHECK_MODULES, run_checks
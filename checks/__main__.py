@@ -0,0 +1,5 @@
+import sys
+
+from checks.run_checks import main
+
+sys.exit(main())
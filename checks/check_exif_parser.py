@@ -0,0 +1,175 @@
+"""
+EXIF Parser Checks
+parse_jpeg_exif against the TIFF blocks the JPEGs were built from, and against PIL
+Both byte orders, every IFD the parser follows, damaged and truncated files
+"""
+
+import io
+import random
+import struct
+
+from benchmarks.corpus import JPEG_MALFORMATIONS, make_jpeg
+
+TIFF_BYTE = 1
+TIFF_ASCII = 2
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_RATIONAL = 5
+TIFF_UNDEFINED = 7
+
+
+def _ifd(endian, entries, offset, next_ifd=0):
+    """One IFD at offset, values over four bytes placed right after it"""
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    directory = struct.pack(endian + 'H', len(entries))
+    extra = b''
+    for tag, field_type, count, raw in sorted(entries):
+        if len(raw) <= 4:
+            field = raw.ljust(4, b'\x00')
+        else:
+            field = struct.pack(endian + 'I', data_offset + len(extra))
+            extra += raw + (b'\x00' if len(raw) % 2 else b'')
+        directory += struct.pack(endian + 'HHI', tag, field_type, count) + field
+    return directory + struct.pack(endian + 'I', next_ifd) + extra
+
+
+def _tiff(endian, rng):
+    """
+    TIFF block with IFD0, Exif, GPS and IFD1 directories in the given byte
+    order, and the (ifd, tag, byte size, value) tuples read_ifds must find
+    """
+    def pack(fmt, *values):
+        return struct.pack(endian + fmt, *values)
+
+    maker_note = bytes(rng.getrandbits(8) for _ in range(rng.randint(5, 3000)))
+    comment = b'ASCII\x00\x00\x00' + bytes(rng.choice(b'abc <>') for _ in range(rng.randint(0, 500)))
+    orientation, iso, thumbnail = rng.randint(1, 8), rng.randint(50, 6400), rng.randint(0, 1 << 20)
+
+    def ifd0(exif_offset, gps_offset):
+        return [
+            (0x010F, TIFF_ASCII, 6, b'Canon\x00'),
+            (0x0112, TIFF_SHORT, 1, pack('H', orientation)),
+            (0x011A, TIFF_RATIONAL, 1, pack('II', 72, 1)),
+            (0x8769, TIFF_LONG, 1, pack('I', exif_offset)),
+            (0x8825, TIFF_LONG, 1, pack('I', gps_offset)),
+        ]
+    exif = [
+        (0x8827, TIFF_SHORT, 1, pack('H', iso)),
+        (0x9003, TIFF_ASCII, 20, b'2024:01:02 03:04:05\x00'),
+        (0x927C, TIFF_UNDEFINED, len(maker_note), maker_note),
+        (0x9286, TIFF_UNDEFINED, len(comment), comment),
+    ]
+    gps = [
+        (0x0000, TIFF_BYTE, 4, bytes((2, 3, 0, 0))),
+        (0x0001, TIFF_ASCII, 2, b'N\x00'),
+    ]
+    ifd1 = [(0x0202, TIFF_LONG, 1, pack('I', thumbnail))]
+
+    # Directory sizes do not depend on the pointer values, so lay out twice
+    exif_offset = 8 + len(_ifd(endian, ifd0(0, 0), 8))
+    exif_block = _ifd(endian, exif, exif_offset)
+    gps_offset = exif_offset + len(exif_block)
+    gps_block = _ifd(endian, gps, gps_offset)
+    ifd1_offset = gps_offset + len(gps_block)
+    tiff = ((b'II' if endian == '<' else b'MM') + pack('HI', 42, 8)
+            + _ifd(endian, ifd0(exif_offset, gps_offset), 8, ifd1_offset)
+            + exif_block + gps_block + _ifd(endian, ifd1, ifd1_offset))
+
+    expected = [
+        ('IFD0', 0x010F, 6, None), ('IFD0', 0x0112, 2, orientation), ('IFD0', 0x011A, 8, None),
+        ('IFD0', 0x8769, 4, exif_offset), ('IFD0', 0x8825, 4, gps_offset),
+        ('Exif', 0x8827, 2, iso), ('Exif', 0x9003, 20, None),
+        ('Exif', 0x927C, len(maker_note), None), ('Exif', 0x9286, len(comment), None),
+        ('GPS', 0x0000, 4, None), ('GPS', 0x0001, 2, None),
+        ('IFD1', 0x0202, 4, thumbnail),
+    ]
+    return tiff, expected
+
+
+def _jpeg(tiff, width, height):
+    """JFIF APP0, Exif APP1, baseline SOF0, a short scan and EOI"""
+    app0 = b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    app1 = b'Exif\x00\x00' + tiff
+    return (b'\xff\xd8'
+            + b'\xff\xe0' + struct.pack('>H', len(app0) + 2) + app0
+            + b'\xff\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1
+            + b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+            + b'\xff\xda' + struct.pack('>H', 8) + b'\x01\x01\x00\x00\x3f\x00' + bytes(64)
+            + b'\xff\xd9')
+
+
+def check_both_byte_orders(work_dir, seed):
+    """Every tag of IFD0, Exif, GPS and IFD1, little- and big-endian, matches the built block and PIL"""
+    from PIL import Image
+    from exif_parser import parse_jpeg_exif
+
+    rng = random.Random(seed)
+    for i in range(100):
+        endian = '<' if i % 2 == 0 else '>'
+        tiff, expected = _tiff(endian, rng)
+        width, height = rng.randint(1, 8000), rng.randint(1, 8000)
+        data = _jpeg(tiff, width, height)
+
+        parsed = parse_jpeg_exif(data)
+        assert sorted(parsed['tags']) == sorted(expected), (endian, parsed['tags'])
+        assert parsed['bad_entries'] == 0
+        assert (parsed['width'], parsed['height']) == (width, height)
+        assert parse_jpeg_exif(bytearray(data)) == parsed
+
+        image = Image.open(io.BytesIO(data))
+        assert image.size == (width, height)
+        exif = image.getexif()
+        for ifd_name, pil_tags in (('IFD0', exif), ('Exif', exif.get_ifd(0x8769)), ('GPS', exif.get_ifd(0x8825))):
+            ours = {tag for name, tag, _, _ in parsed['tags'] if name == ifd_name}
+            assert ours == set(pil_tags), (ifd_name, sorted(ours), sorted(pil_tags))
+        pil_exif = exif.get_ifd(0x8769)
+        sizes = {tag: size for name, tag, size, _ in parsed['tags'] if name == 'Exif'}
+        assert sizes[0x927C] == len(pil_exif[0x927C]) and sizes[0x9286] == len(pil_exif[0x9286])
+
+
+def check_corpus_jpegs(work_dir, seed):
+    """The benchmark corpus's JPEGs: payload sizes, dimensions and each malformation"""
+    from exif_parser import ExifParseError, parse_jpeg_exif
+
+    rng = random.Random(seed)
+    for _ in range(50):
+        maker_note, comment = rng.randint(0, 40000), rng.randint(0, 15000)
+        parsed = parse_jpeg_exif(make_jpeg(rng, maker_note, comment))
+        sizes = {(name, tag): size for name, tag, size, _ in parsed['tags']}
+        assert sizes[('Exif', 0x927C)] == maker_note and sizes[('Exif', 0x9286)] == comment + 8
+        assert parsed['bad_entries'] == 0 and parsed['width'] > 0 and parsed['height'] > 0
+
+    for malformation in JPEG_MALFORMATIONS:
+        try:
+            parsed = parse_jpeg_exif(make_jpeg(rng, 512, 16, malformation))
+        except ExifParseError:
+            raise AssertionError(f"{malformation}: a JPEG was rejected")
+        if malformation in ('bad_ifd_offset', 'ifd_loop'):
+            assert parsed['bad_entries'] > 0, malformation
+        if malformation in ('bad_ifd_offset', 'no_exif', 'truncated_app1'):
+            assert not any(name == 'Exif' for name, _, _, _ in parsed['tags']), malformation
+
+
+def check_damaged_files(work_dir, seed):
+    """Truncated and corrupted JPEGs raise ExifParseError or parse, never anything else"""
+    from exif_parser import ExifParseError, parse_jpeg_exif
+
+    rng = random.Random(seed)
+    for i in range(30):
+        data = _jpeg(_tiff('<' if i % 2 == 0 else '>', rng)[0], 640, 480)
+        variants = [data[:end] for end in sorted(set(rng.randrange(len(data)) for _ in range(40)))]
+        for _ in range(80):
+            corrupted = bytearray(data)
+            for _ in range(rng.randint(1, 12)):
+                corrupted[rng.randrange(2, min(len(data), 400))] = rng.getrandbits(8)
+            variants.append(bytes(corrupted))
+
+        for variant in variants:
+            try:
+                parsed = parse_jpeg_exif(variant)
+            except ExifParseError:
+                continue
+            assert all(size >= 0 for _, _, size, _ in parsed['tags'])
+
+
+CHECKS = (check_both_byte_orders, check_corpus_jpegs, check_damaged_files)
@@ -0,0 +1,133 @@
+"""
+Forest Engine Checks
+ForestEngine.predict_proba against scikit-learn's predict_proba
+Both detectors' trained forests, rows on split thresholds and plain sklearn forests
+"""
+
+import contextlib
+import io
+import os
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.run_benchmarks import train_detectors
+
+
+def _feature_matrix(detector, paths):
+    """Rows of the files detector extracts without error, in its schema"""
+    X = detector.schema.allocate(len(paths))
+    count = 0
+    for path in paths:
+        _, error = detector.extract_into(X[count], path)
+        if not error:
+            count += 1
+        else:
+            X[count] = 0
+    return X[:count]
+
+
+def _outcome(predict, X):
+    """predict(X) as a hashable value, or the type of the error it raised"""
+    try:
+        return predict(X).tobytes()
+    except ValueError as e:
+        return type(e)
+
+
+def _assert_same(engine, model, X, label):
+    import numpy as np
+
+    expected = model.predict_proba(X)
+    actual = engine.predict_proba(X)
+    if not np.array_equal(actual, expected):
+        rows = np.flatnonzero((actual != expected).any(axis=1))
+        raise AssertionError(
+            f"{label}: {len(rows)} of {len(X)} rows differ from predict_proba, "
+            f"first at row {rows[0]}: {actual[rows[0]]} != {expected[rows[0]]}"
+        )
+
+
+def check_detector_forests(work_dir, seed):
+    """Both detectors' forests, on files the training corpus never saw"""
+    import numpy as np
+
+    jpeg_detector, pe_detector = train_detectors(os.path.join(work_dir, 'train'), seed, 80)
+    manifest = generate_corpus(os.path.join(work_dir, 'score'), n_jpeg=120, n_pe=120, n_other=0,
+                               seed=seed + 1)
+
+    for detector, kind in ((jpeg_detector, 'jpeg'), (pe_detector, 'pe')):
+        engine = detector.forest_engine
+        assert engine is not None, f"{detector.detector_type} forest did not compile"
+        X = _feature_matrix(detector, [sample['path'] for sample in manifest[kind]])
+        assert len(X) > 100, f"only {len(X)} {kind} files extracted"
+        _assert_same(engine, detector.model, X, detector.detector_type)
+
+        # The detector's own entry point, one row and a whole batch
+        assert np.array_equal(detector._predict_proba(X[:1]), detector.model.predict_proba(X[:1]))
+        assert np.array_equal(detector._predict_proba(X), detector.model.predict_proba(X))
+
+        # Rows the engine does not take fall back to sklearn, which scores
+        # or rejects them as it would without the engine
+        bad = X[:2].copy()
+        bad[0, 0] = np.nan
+        assert not engine.accepts(bad) and not engine.accepts(X[:, :-1])
+        for rejected in (bad, X[:, :-1]):
+            expected = _outcome(detector.model.predict_proba, rejected)
+            assert _outcome(detector._predict_proba, rejected) == expected
+
+
+def check_threshold_ties(work_dir, seed):
+    """Rows placed exactly on, and one float32 step either side of, split thresholds"""
+    import numpy as np
+
+    jpeg_detector, pe_detector = train_detectors(os.path.join(work_dir, 'train'), seed, 60)
+    rng = np.random.default_rng(seed)
+
+    for detector in (jpeg_detector, pe_detector):
+        engine = detector.forest_engine
+        splits = np.flatnonzero(engine.left != np.arange(engine.n_nodes))
+        picks = rng.choice(splits, size=min(300, len(splits)), replace=False)
+
+        base = rng.choice([0.0, 1.0], size=(len(picks), engine.n_features)).astype(np.float32)
+        rows = []
+        for direction in (0.0, -np.inf, np.inf):
+            X = base.copy()
+            on = engine.threshold[picks].astype(np.float32)
+            X[np.arange(len(picks)), engine.feature[picks]] = (
+                on if direction == 0.0 else np.nextafter(on, np.float32(direction))
+            )
+            rows.append(X)
+        _assert_same(engine, detector.model, np.vstack(rows), f"{detector.detector_type} ties")
+
+
+def check_sklearn_forests(work_dir, seed):
+    """Plain forests: several classes, unpruned trees, batches split across passes"""
+    import numpy as np
+    from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+    from forest_engine import compile_forest
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(600, 12)).astype(np.float32)
+    X[:, 3] = np.round(X[:, 3])
+    y = np.array(['clean', 'malicious', 'suspicious'])[(X[:, 0] > 0).astype(int) + (X[:, 1] * X[:, 3] > 0.5)]
+    X_test = rng.normal(size=(2500, 12)).astype(np.float32)
+
+    for forest in (
+        RandomForestClassifier(n_estimators=25, random_state=seed),
+        ExtraTreesClassifier(n_estimators=25, max_depth=6, random_state=seed),
+        RandomForestClassifier(n_estimators=5, min_samples_leaf=20, class_weight='balanced',
+                               random_state=seed)
+    ):
+        forest.fit(X, y)
+        engine = compile_forest(forest)
+        assert engine is not None, f"{type(forest).__name__} did not compile"
+        assert list(engine.classes_) == list(forest.classes_)
+        _assert_same(engine, forest, X_test, type(forest).__name__)
+        assert np.array_equal(engine.predict_proba(X_test, batch_rows=7), forest.predict_proba(X_test))
+
+    with contextlib.redirect_stderr(io.StringIO()):
+        boosted = GradientBoostingClassifier(n_estimators=3).fit(X, y == 'clean')
+    assert compile_forest(boosted) is None, "a non-forest model compiled"
+    assert compile_forest(RandomForestClassifier()) is None, "an unfitted forest compiled"
+
+
+CHECKS = (check_detector_forests, check_threshold_ties, check_sklearn_forests)
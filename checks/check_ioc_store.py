@@ -0,0 +1,154 @@
+"""
+IOC Store Checks
+IOCStore lookups against the blocklists the store was built from
+Bloom filter agreement and false-positive rate, binary search bounds and rebuilds
+"""
+
+import os
+import random
+
+ALGORITHM_BYTES = {'sha256': 32, 'sha1': 20, 'md5': 16}
+
+
+def _write_list(path, digests, rng):
+    """A text blocklist in the formats read_hash_list accepts, upper and lower case"""
+    with open(path, 'w') as f:
+        f.write('# test blocklist\n\n')
+        for raw in digests:
+            hexdigest = raw.hex().upper() if rng.random() < 0.3 else raw.hex()
+            f.write(rng.choice((f'{hexdigest}\n', f'{hexdigest},sample.exe\n', f'  {hexdigest} 2024-01-01\n')))
+        f.write('not-a-hash\n' + 'z' * 64 + '\n')
+
+
+def _random_digests(rng, count):
+    return [(algorithm, rng.randbytes(ALGORITHM_BYTES[algorithm]))
+            for algorithm in rng.choices(tuple(ALGORITHM_BYTES), weights=(6, 1, 3), k=count)]
+
+
+def _build(work_dir, rng, contents, keep_existing=True):
+    """Write contents ({list name: [(algorithm, raw)]}) as blocklists and build the store"""
+    from ioc_store import build_ioc_store
+
+    sources = {}
+    for name, entries in contents.items():
+        sources[name] = os.path.join(work_dir, f'{name}.txt')
+        _write_list(sources[name], [raw for _, raw in entries], rng)
+    return build_ioc_store(os.path.join(work_dir, 'store'), sources, keep_existing=keep_existing)
+
+
+def _expected_lists(contents):
+    """{(algorithm, raw): list names in list order}"""
+    expected = {}
+    for name, entries in contents.items():
+        for key in entries:
+            if name not in expected.setdefault(key, []):
+                expected[key].append(name)
+    return expected
+
+
+def _assert_store(store, contents, order):
+    """Every listed digest is found, with its lists in store order, and passes the Bloom filter"""
+    expected = _expected_lists(contents)
+    for (algorithm, raw), names in expected.items():
+        assert store.might_contain(raw), f"{algorithm} {raw.hex()} fails the Bloom filter"
+        found = store.lookup_digest(algorithm, raw.hex())
+        assert found == sorted(names, key=order.index), (raw.hex(), found, names)
+        assert store.lookup_digest(algorithm, raw.hex().upper()) == found
+        assert [match['list'] for match in store.lookup({algorithm: raw.hex()})] == found
+
+    # The first and last digest of each sorted array bound the binary search
+    for algorithm in store.algorithms:
+        digests = sorted(raw for listed, raw in expected if listed == algorithm)
+        for raw in (digests[0], digests[-1]):
+            assert store.lookup_digest(algorithm, raw.hex()), f"{algorithm} bound {raw.hex()} not found"
+    assert len(store) == sum(len(names) for names in expected.values())
+
+
+def check_lookups(work_dir, seed):
+    """Members on one or several lists, digests beside them and digests of other algorithms"""
+    from ioc_store import IOCStore
+
+    rng = random.Random(seed)
+    shared = _random_digests(rng, 40)
+    contents = {
+        'abuse': _random_digests(rng, 3000) + shared,
+        'vendor': _random_digests(rng, 1500) + shared[:20] + shared[:5],
+        'internal': shared[10:],
+    }
+    _build(work_dir, rng, contents)
+    store = IOCStore(os.path.join(work_dir, 'store'))
+    try:
+        _assert_store(store, contents, list(contents))
+
+        expected = _expected_lists(contents)
+        for (algorithm, raw) in list(expected)[:500]:
+            # One bit away, or the same bytes read as another algorithm, is not a hit
+            neighbour = bytearray(raw)
+            neighbour[-1] ^= 1
+            if (algorithm, bytes(neighbour)) not in expected:
+                assert store.lookup_digest(algorithm, neighbour.hex()) == []
+            for other, size in ALGORITHM_BYTES.items():
+                if other != algorithm and (other, raw[:size].ljust(size, b'\0')) not in expected:
+                    assert store.lookup_digest(other, raw[:size].ljust(size, b'\0').hex()) == []
+
+        for bad in (None, '', 'zz' * 32, 'abc'):
+            assert store.lookup_digest('sha256', bad) == []
+        assert store.lookup_digest('sha512', 'ab' * 64) == []
+    finally:
+        store.close()
+
+
+def check_bloom_filter(work_dir, seed):
+    """Random non-members: never reported, and rarely past the Bloom filter"""
+    from ioc_store import IOCStore
+
+    rng = random.Random(seed)
+    contents = {'feed': _random_digests(rng, 20000)}
+    _build(work_dir, rng, contents)
+    store = IOCStore(os.path.join(work_dir, 'store'))
+    try:
+        expected = _expected_lists(contents)
+        trials, passed = 50000, 0
+        for algorithm, raw in _random_digests(rng, trials):
+            if (algorithm, raw) in expected:
+                continue
+            passed += store.might_contain(raw)
+            assert store.lookup_digest(algorithm, raw.hex()) == []
+        # About 1% by design; 3% leaves room for chance
+        assert passed / trials < 0.03, f"Bloom filter passed {passed} of {trials} non-members"
+    finally:
+        store.close()
+
+
+def check_rebuilds(work_dir, seed):
+    """keep_existing replaces lists by name, keeps the rest, and changes the version with the contents"""
+    from ioc_store import IOCStore
+
+    rng = random.Random(seed)
+    contents = {'a': _random_digests(rng, 500), 'b': _random_digests(rng, 500), 'c': _random_digests(rng, 500)}
+    first = _build(work_dir, rng, contents)
+
+    # Rebuilding the same contents gives the same version
+    assert _build(work_dir, rng, contents)['version'] == first['version']
+
+    contents['b'] = _random_digests(rng, 300) + contents['a'][:50]
+    second = _build(work_dir, rng, {'b': contents['b']})
+    assert second['version'] != first['version']
+    assert second['lists'] == ['a', 'c', 'b']
+    store = IOCStore(os.path.join(work_dir, 'store'))
+    try:
+        _assert_store(store, contents, second['lists'])
+    finally:
+        store.close()
+
+    del contents['a'], contents['c']
+    third = _build(work_dir, rng, contents, keep_existing=False)
+    assert third['lists'] == ['b'] and third['version'] != second['version']
+    store = IOCStore(os.path.join(work_dir, 'store'))
+    try:
+        _assert_store(store, contents, third['lists'])
+    finally:
+        store.close()
+
+
+CHECKS = (check_lookups, check_bloom_filter, check_rebuilds)
@@ -0,0 +1,152 @@
+"""
+PE Parser Checks
+parse_pe and parse_pe_headers against the layouts the PE images were built from
+Known header, section, import and resource values, damaged and truncated images
+"""
+
+import random
+
+from benchmarks.corpus import CLEAN_DLLS, PE_MALFORMATIONS, SUSPICIOUS_DLLS, make_pe
+
+
+def _layouts(rng, count):
+    """make_pe keyword arguments covering both header formats and every DLL and resource type"""
+    from pe_parser import RESOURCE_TYPES
+
+    dlls = CLEAN_DLLS + SUSPICIOUS_DLLS + (b'NOTTRACKED.dll', b'kernel32.DLL')
+    for i in range(count):
+        yield {
+            'pe32_plus': i % 2 == 1,
+            'text_size': rng.randint(256, 9000),
+            'dlls': tuple(rng.sample(dlls, rng.randint(0, 8))),
+            'resources': tuple((type_id, rng.randint(0, 5))
+                               for type_id, _ in rng.sample(RESOURCE_TYPES, rng.randint(0, 4))),
+            'extra_sections': rng.randint(0, 3),
+            'timestamp': rng.choice((0, rng.randint(900000000, 2100000000), 0xFFFFFFFF)),
+            'is_dll': rng.random() < 0.5
+        }
+
+
+def _dll_column(dll):
+    """Feature name of a TRACKED_DLLS entry's import flag"""
+    return 'dll_' + dll.rsplit('.', 1)[0].lower()
+
+
+def _expected(layout, data):
+    """Feature values the layout must produce, by name"""
+    from pe_parser import FEATURE_INDEX, RESOURCE_TYPES, TRACKED_DLLS
+
+    expected = {
+        'machine_type': 0x8664 if layout['pe32_plus'] else 0x14C,
+        'magic': 0x20B if layout['pe32_plus'] else 0x10B,
+        'num_sections': 3 + bool(layout['resources']) + layout['extra_sections'],
+        'timestamp': layout['timestamp'],
+        'characteristics': 0x2102 if layout['is_dll'] else 0x0102,
+        'is_dll': 1 if layout['is_dll'] else 0,
+        'is_executable': 1,
+        'timestamp_suspicious': 0 if 1000000000 <= layout['timestamp'] <= 2000000000 else 1,
+        'file_size': len(data),
+        'text_virtual_size': layout['text_size'],
+        'text_characteristics': 0x60000020,
+        'dd_import_size': (len(layout['dlls']) + 1) * 20,
+        'number_of_rva_and_sizes': 16
+    }
+
+    imported = {dll.upper() for dll in layout['dlls']}
+    for dll in TRACKED_DLLS:
+        expected[_dll_column(dll)] = 1 if dll.encode() in imported else 0
+
+    counts = dict(layout['resources'])
+    for type_id, name in RESOURCE_TYPES:
+        expected[f'res_{name}'] = counts.get(type_id, 0)
+    if not layout['resources']:
+        expected['rsrc_virtual_size'] = 0
+
+    assert set(expected) <= set(FEATURE_INDEX), set(expected) - set(FEATURE_INDEX)
+    return expected
+
+
+def _is_header_column(name):
+    """Whether parse_pe_headers fills the column"""
+    from pe_parser import COFF_FIELDS, DERIVED_FIELDS, OPTIONAL_STANDARD_FIELDS, OPTIONAL_WINDOWS_FIELDS
+
+    return (name in COFF_FIELDS or name in OPTIONAL_STANDARD_FIELDS or name in OPTIONAL_WINDOWS_FIELDS
+            or name in DERIVED_FIELDS or name.startswith('dd_'))
+
+
+def check_known_layouts(work_dir, seed):
+    """Every field the builder sets is read back, in PE32 and PE32+ images, from bytes or a row"""
+    import numpy as np
+    from pe_parser import FEATURE_INDEX, HEADER_FEATURE_NAMES, PE_FEATURE_NAMES, parse_pe, parse_pe_headers
+
+    assert set(HEADER_FEATURE_NAMES) == {name for name in PE_FEATURE_NAMES if _is_header_column(name)}
+
+    rng = random.Random(seed)
+    for layout in _layouts(rng, 200):
+        data = make_pe(rng, **layout)
+        row = parse_pe(data)
+        assert len(row) == len(PE_FEATURE_NAMES)
+
+        for name, value in _expected(layout, data).items():
+            assert row[FEATURE_INDEX[name]] == value, f"{name}: {row[FEATURE_INDEX[name]]} != {value}"
+
+        # Zero-copy inputs and preallocated rows give the same values
+        out = np.zeros(len(PE_FEATURE_NAMES), dtype=np.float32)
+        assert parse_pe(bytearray(data), out) is out
+        assert np.array_equal(out, np.array(row, dtype=np.float32))
+
+        # The screen's header-only parse is parse_pe restricted to header columns
+        headers = parse_pe_headers(data)
+        for name, full, header_only in zip(PE_FEATURE_NAMES, row, headers):
+            assert header_only == (full if _is_header_column(name) else 0.0), name
+
+
+def check_damaged_images(work_dir, seed):
+    """Malformed, truncated and corrupted images raise PEParseError or parse, never anything else"""
+    import math
+    from pe_parser import FEATURE_INDEX, TRACKED_DLLS, PEParseError, parse_pe
+
+    rng = random.Random(seed)
+
+    rejected = (
+        (b'', 'empty'), (b'MZ', 'DOS stub only'), (b'ZM' + bytes(510), 'no MZ'),
+        (make_pe(rng, malformation='bad_lfanew'), 'bad_lfanew')
+    )
+    for data, label in rejected:
+        try:
+            parse_pe(data)
+        except PEParseError:
+            continue
+        raise AssertionError(f"{label} image parsed")
+
+    # Damage past the COFF header leaves only the affected features at zero
+    row = parse_pe(make_pe(rng, malformation='huge_section_count'))
+    assert row[FEATURE_INDEX['num_sections']] == 0xFFFF and row[FEATURE_INDEX['text_virtual_size']] > 0
+    row = parse_pe(make_pe(rng, dlls=CLEAN_DLLS, malformation='bad_import_rva'))
+    assert not any(row[FEATURE_INDEX[_dll_column(dll)]] for dll in TRACKED_DLLS)
+    assert row[FEATURE_INDEX['res_icon']] == 2
+
+    def parse_or_reject(data, label):
+        try:
+            row = parse_pe(data)
+        except PEParseError:
+            return
+        assert all(math.isfinite(value) for value in row), label
+
+    for malformation in PE_MALFORMATIONS:
+        for _ in range(10):
+            parse_or_reject(make_pe(rng, malformation=malformation), malformation)
+
+    for layout in _layouts(rng, 20):
+        data = make_pe(rng, **layout)
+        for end in sorted(set(rng.randrange(len(data)) for _ in range(60)) | set(range(0, 0x200, 7))):
+            parse_or_reject(data[:end], f"truncated at {end}")
+        for _ in range(60):
+            corrupted = bytearray(data)
+            for _ in range(rng.randint(1, 16)):
+                # Bias corruption towards the headers and tables at the front
+                corrupted[min(int(rng.expovariate(1 / 600.0)), len(data) - 1)] = rng.getrandbits(8)
+            parse_or_reject(bytes(corrupted), 'corrupted')
+
+
+CHECKS = (check_known_layouts, check_damaged_images)
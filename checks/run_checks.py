@@ -0,0 +1,79 @@
+"""
+Check Runner
+Runs the behavior checks and reports each one as passed or failed
+Exits non-zero when any check fails
+"""
+
+import argparse
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+# Check modules, checks/check_<name>.py, in run order
+CHECK_MODULES = (
+    'forest_engine',
+    'pe_parser',
+    'exif_parser',
+    'ioc_store',
+)
+
+
+def load_checks(names):
+    """(qualified name, function) of every check in the named modules"""
+    checks = []
+    for name in names:
+        module = importlib.import_module(f'checks.check_{name}')
+        for func in module.CHECKS:
+            checks.append((f'{name}.{func.__name__}', func))
+    return checks
+
+
+def run_checks(names=CHECK_MODULES, work_dir=None, seed=1234):
+    """
+    Run the checks of the named modules, returning {name: error or None}
+
+    Each check gets its own empty directory under work_dir and the seed
+    of the synthetic data it generates; it fails by raising.
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix='malware_checks_')
+    outcomes = {}
+    try:
+        for index, (name, func) in enumerate(load_checks(names)):
+            check_dir = os.path.join(work_dir, f'{index:02d}_{name}')
+            os.makedirs(check_dir, exist_ok=True)
+            started = time.perf_counter()
+            try:
+                func(check_dir, seed)
+                outcomes[name] = None
+                print(f"PASS  {name}  ({time.perf_counter() - started:.2f}s)")
+            except Exception:
+                outcomes[name] = traceback.format_exc()
+                print(f"FAIL  {name}\n{outcomes[name]}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return outcomes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the behavior checks')
+    parser.add_argument('modules', nargs='*', metavar='module',
+                        help=f"Check modules to run (default: all of {', '.join(CHECK_MODULES)})")
+    parser.add_argument('--seed', type=int, default=1234, help='Seed of the synthetic data (default: 1234)')
+
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.modules if name not in CHECK_MODULES]
+    if unknown:
+        parser.error(f"unknown check module(s): {', '.join(unknown)}")
+
+    outcomes = run_checks(args.modules or CHECK_MODULES, seed=args.seed)
+    failed = sum(1 for error in outcomes.values() if error is not None)
+    print(f"\n{len(outcomes) - failed} passed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,10 @@ import time
 from jpeg_exif_detector import JPEGExifDetector, demonstrate_jpeg_detector
 from pe_file_detector import PEFileDetector, demonstrate_pe_detector
 from forensic_tracer import ForensicTracer, demonstrate_forensic_tracer
+from pe_parser import (
+    COFF_FIELDS, DATA_DIRECTORIES, DERIVED_FIELDS, OPTIONAL_STANDARD_FIELDS,
+    OPTIONAL_WINDOWS_FIELDS, PE_FEATURE_NAMES, RESOURCE_TYPES, SECTION_FIELDS, SECTIONS, TRACKED_DLLS
+)
 
 
 def print_header(title):
@@ -71,14 +75,15 @@ def demo_module_2_pe_files():
     print("  • Training set: 10,339+ malicious PE files (VX Heavens + Malfease)")
     print("  • Realtime deployable: YES ✓")
 
-    print("\n[FEATURE EXTRACTION (189 features)]")
-    print("  • 73 DLL references (binary features)")
-    print("  • 7 COFF header fields")
-    print("  • 9 Optional header standard fields")
-    print("  • 22 Windows-specific fields")
-    print("  • 30 Data directory pointers")
-    print("  • 27 Section header fields (.text, .data, .rsrc)")
-    print("  • 21 Resource directory features")
+    print(f"\n[FEATURE EXTRACTION ({len(PE_FEATURE_NAMES)} features)]")
+    print(f"  • {len(TRACKED_DLLS)} DLL references (binary features)")
+    print(f"  • {len(COFF_FIELDS)} COFF header fields")
+    print(f"  • {len(OPTIONAL_STANDARD_FIELDS)} Optional header standard fields")
+    print(f"  • {len(OPTIONAL_WINDOWS_FIELDS)} Windows-specific fields")
+    print(f"  • {len(DATA_DIRECTORIES) * 2} Data directory pointers")
+    print(f"  • {len(SECTIONS) * len(SECTION_FIELDS)} Section header fields (.text, .data, .rsrc)")
+    print(f"  • {len(RESOURCE_TYPES)} Resource directory features")
+    print(f"  • {len(DERIVED_FIELDS)} Derived features (file size, ratios, flags)")
 
     print("\n[MALWARE CATEGORIES DETECTED]")
     print("  ✓ Backdoors (AUC: 0.993)")
@@ -178,7 +183,7 @@ def demo_integrated_workflow():
 
     print("\nStep 3: Extract structural features")
     print("  → Parsing PE headers...")
-    print("  → Extracting 189 features...")
+    print(f"  → Extracting {len(PE_FEATURE_NAMES)} features...")
     print("  → Features extracted: ✓")
 
     print("\nStep 4: ML Classification")
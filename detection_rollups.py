@@ -0,0 +1,213 @@
+"""
+Detection Rollups Module
+Running verdict counters per detector and per hour/day bucket
+Persisted in a sidecar file so statistics never rescan the forensic log
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from ioc_store import KNOWN_MALICIOUS, MALICIOUS_VERDICTS
+
+ROLLUP_FORMAT_VERSION = 1
+
+# Hourly buckets older than this are dropped; daily buckets are kept forever
+HOURLY_RETENTION_DAYS = 90
+
+
+def _add_count(counts, verdict, amount=1):
+    counts[verdict] = counts.get(verdict, 0) + amount
+
+
+class DetectionRollups:
+    """
+    Verdict counts maintained incrementally as entries are logged
+
+    Counts are kept overall, per detector type, and per detector in
+    hourly ('YYYY-MM-DDTHH') and daily ('YYYY-MM-DD') buckets of the
+    detection timestamp. log_position is the storage position (byte
+    offset for JSONL, row id for SQLite) up to which entries have been
+    counted, so a stale sidecar is brought up to date by replaying only
+    the log's tail.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.log_position = 0
+        self.log_inode = None
+        self.totals = {}
+        self.by_detector = {}
+        self.hourly = {}
+        self.daily = {}
+
+    @classmethod
+    def load(cls, path):
+        """Load rollups from a sidecar file (empty rollups if unusable)"""
+        rollups = cls(path)
+        if not path or not os.path.exists(path):
+            return rollups
+
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return rollups
+
+        if state.get('format_version') != ROLLUP_FORMAT_VERSION:
+            return rollups
+
+        rollups.log_position = state['log_position']
+        rollups.log_inode = state['log_inode']
+        rollups.totals = state['totals']
+        rollups.by_detector = state['by_detector']
+        rollups.hourly = state['hourly']
+        rollups.daily = state['daily']
+        return rollups
+
+    def save(self):
+        """
+        Atomically write the rollups to the sidecar file
+
+        Rollups always count a prefix of the log, so if another process
+        saved a longer prefix of the same log since, its counts are
+        adopted instead of being overwritten with older ones.
+        """
+        if not self.path:
+            return
+
+        saved = DetectionRollups.load(self.path)
+        if saved.log_inode == self.log_inode and saved.log_position > self.log_position:
+            self.log_position = saved.log_position
+            self.totals = saved.totals
+            self.by_detector = saved.by_detector
+            self.hourly = saved.hourly
+            self.daily = saved.daily
+            return
+
+        self.prune()
+        state = {
+            'format_version': ROLLUP_FORMAT_VERSION,
+            'log_position': self.log_position,
+            'log_inode': self.log_inode,
+            'totals': self.totals,
+            'by_detector': self.by_detector,
+            'hourly': self.hourly,
+            'daily': self.daily
+        }
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        """Forget all counts (before a full rebuild)"""
+        self.log_position = 0
+        self.log_inode = None
+        self.totals = {}
+        self.by_detector = {}
+        self.hourly = {}
+        self.daily = {}
+
+    def add(self, log_entry):
+        """Count one log entry"""
+        detection = log_entry.get('detection', {})
+        verdict = detection.get('verdict', 'unknown')
+        detector = detection.get('detector_type', 'UNKNOWN')
+
+        _add_count(self.totals, verdict)
+        _add_count(self.by_detector.setdefault(detector, {}), verdict)
+
+        # ISO timestamps sort and bucket correctly as plain strings
+        timestamp = detection.get('timestamp')
+        if timestamp:
+            hour = self.hourly.setdefault(timestamp[:13], {})
+            _add_count(hour.setdefault(detector, {}), verdict)
+            day = self.daily.setdefault(timestamp[:10], {})
+            _add_count(day.setdefault(detector, {}), verdict)
+
+    def catch_up(self, storage):
+        """
+        Count entries the storage holds past log_position
+
+        Rebuilds from the start if the log was replaced or truncated.
+        JSONL storage only yields complete lines, so a torn trailing write
+        is counted once it is finished. Returns the number of entries added.
+        """
+        inode, end_position = storage.identity()
+        if inode != self.log_inode or end_position < self.log_position:
+            self.reset()
+            self.log_inode = inode
+
+        added = 0
+        for position, log_entry in storage.iter_from(self.log_position):
+            self.log_position = position
+            if log_entry is not None:
+                self.add(log_entry)
+                added += 1
+
+        return added
+
+    def prune(self, now=None):
+        """Drop hourly buckets older than HOURLY_RETENTION_DAYS"""
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=HOURLY_RETENTION_DAYS)).isoformat()[:13]
+        for hour in [hour for hour in self.hourly if hour < cutoff]:
+            del self.hourly[hour]
+
+    def get_statistics(self):
+        """Overall and per-detector verdict counts"""
+        total = sum(self.totals.values())
+        malicious = sum(self.totals.get(verdict, 0) for verdict in MALICIOUS_VERDICTS)
+
+        return {
+            'total_scans': total,
+            'malicious_detected': malicious,
+            'known_malicious': self.totals.get(KNOWN_MALICIOUS, 0),
+            'clean_files': self.totals.get('clean', 0),
+            'detection_rate': (malicious / total * 100) if total > 0 else 0,
+            'by_detector': {detector: dict(counts) for detector, counts in self.by_detector.items()}
+        }
+
+    def get_window_rates(self, window_days=7, verdict=MALICIOUS_VERDICTS, now=None):
+        """
+        Counts and rates of verdict over the last window_days
+
+        verdict is one verdict or a tuple of them, counted together; the
+        default counts every malicious verdict, as get_statistics does.
+
+        Windows up to HOURLY_RETENTION_DAYS are summed from hourly
+        buckets, longer windows from daily buckets. Returns a dict with
+        the window's count, per_hour and per_day rates and per-detector
+        counts.
+        """
+        now = now or datetime.now()
+        start = now - timedelta(days=window_days)
+        verdicts = (verdict,) if isinstance(verdict, str) else tuple(verdict)
+
+        if window_days <= HOURLY_RETENTION_DAYS:
+            buckets, cutoff = self.hourly, start.isoformat()[:13]
+        else:
+            buckets, cutoff = self.daily, start.isoformat()[:10]
+
+        by_detector = {}
+        for key, detectors in buckets.items():
+            if key < cutoff:
+                continue
+            for detector, counts in detectors.items():
+                count = sum(counts.get(name, 0) for name in verdicts)
+                if count:
+                    by_detector[detector] = by_detector.get(detector, 0) + count
+
+        count = sum(by_detector.values())
+        hours = window_days * 24
+
+        return {
+            'verdict': verdict,
+            'window_days': window_days,
+            'count': count,
+            'per_hour': count / hours if hours else 0,
+            'per_day': count / window_days if window_days else 0,
+            'by_detector': by_detector
+        }
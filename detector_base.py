@@ -0,0 +1,261 @@
+"""
+Detector Base Module
+Model, training and persistence code shared by the forest-based detectors
+Subclasses supply the feature extraction (extract_into) and result format
+"""
+
+import time
+import hashlib
+import pickle
+import model_store
+from hashing import file_sha256
+from cascade import ScreenModel
+from similarity_index import signatures
+from datetime import datetime
+
+# numpy and scikit-learn are imported inside the methods that use them,
+# so importing this module (e.g. for --stats) stays cheap.
+
+class ForestDetector:
+    """
+    Random forest detector over one feature schema
+
+    Subclasses set detector_type and file_kind (as used in progress and
+    error messages), implement extract_into(row, path, data) and
+    _build_result, and return the layout they train on from
+    _training_schema.
+    """
+    detector_type = None
+    file_kind = None
+
+    def __init__(self):
+        self._model = None
+        self._engine = None
+        # Evaluate the forest with forest_engine instead of sklearn's predict_proba
+        self.use_forest_engine = True
+        # Attach an LSH signature of each file's feature row to its result,
+        # for the forensic log's similarity index
+        self.similarity_signatures = True
+        # Tier-1 cascade model (cascade.ScreenModel), fit alongside the forest
+        self.screen = None
+        self.model_version = 'untrained'
+        self.model_path = None
+        self.training_metadata = {}
+
+    @property
+    def model(self):
+        """Random forest classifier, created on first use"""
+        if self._model is None:
+            from sklearn.ensemble import RandomForestClassifier
+            self._model = RandomForestClassifier(n_estimators=100, random_state=42)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+        self._engine = None
+
+    @property
+    def forest_engine(self):
+        """The model compiled to a ForestEngine on first use (None if it is not a fitted forest)"""
+        if self._engine is None:
+            from forest_engine import compile_forest
+            self._engine = compile_forest(self._model) or False
+        return self._engine or None
+
+    def _predict_proba(self, X):
+        """predict_proba of the model, through the compiled forest engine when it can take X"""
+        engine = self.forest_engine if self.use_forest_engine else None
+        if engine is not None and engine.accepts(X):
+            return engine.predict_proba(X)
+        return self.model.predict_proba(X)
+
+    @property
+    def feature_names(self):
+        """Column names of the model's feature layout"""
+        return list(self.schema.names)
+
+    def _training_schema(self):
+        """FeatureSchema that training and feature stores use"""
+        raise NotImplementedError
+
+    def _extraction_chunks(self, paths, n_jobs=-1, store_path=None):
+        """map_chunks of _extract_training_chunk over paths, in the detector's schema"""
+        from parallel_extract import map_chunks
+
+        return map_chunks(_extract_training_chunk, paths, n_jobs, description=f'{self.file_kind} features',
+                          args=(type(self), store_path, store_path is not None, self.schema))
+
+    def build_feature_store(self, path, clean_files, malicious_files, n_jobs=-1):
+        """
+        Extract features into the feature store at path, returning it open
+
+        Files whose SHA-256 is already stored are skipped by the workers
+        before parsing, so growing a corpus only extracts the new files.
+        The store's columns are the detector's schema.
+        """
+        from feature_store import FeatureStore
+
+        store = FeatureStore(path, self.detector_type, self.schema.names)
+        file_paths = list(clean_files) + list(malicious_files)
+        added = skipped = 0
+        position = 0
+
+        try:
+            for chunk in self._extraction_chunks(file_paths, n_jobs, store_path=path):
+                rows, labels, paths, hashes = [], [], [], []
+                for sha256, row, stored in chunk:
+                    file_path = file_paths[position]
+                    label = 0 if position < len(clean_files) else 1
+                    position += 1
+
+                    if stored or store.contains(sha256):
+                        skipped += 1
+                        continue
+                    if row is None:
+                        continue
+
+                    rows.append(row)
+                    labels.append(label)
+                    paths.append(file_path)
+                    hashes.append(sha256)
+
+                if rows:
+                    store.extend(rows, labels, paths, hashes)
+                    added += len(rows)
+        except Exception:
+            store.close()
+            raise
+
+        print(f"Feature store {path}: {added} files added, {skipped} already stored, {len(store)} rows")
+        return store
+
+    def train_from_store(self, store, n_jobs=-1):
+        """Train on every row of a FeatureStore, memory-mapped rather than loaded"""
+        if len(store) == 0:
+            raise ValueError("No valid training data extracted")
+        schema = self._training_schema()
+        if tuple(store.feature_names) != schema.names:
+            raise ValueError(f"Feature store at {store.path} has a different {self.file_kind} feature layout")
+
+        self.schema = schema
+        print(f"Training from feature store {store.path}...")
+        return self._fit(store.matrix(), store.labels(), n_jobs)
+
+    def score_feature_store(self, store):
+        """
+        Malicious-class probability of every row of a FeatureStore with the
+        current model, for re-scoring and threshold experiments
+        """
+        import numpy as np
+
+        probabilities = store.score(self.model, self.feature_names)
+        classes = list(self.model.classes_)
+        if 1 not in classes:
+            return np.zeros(len(probabilities))
+        return probabilities[:, classes.index(1)]
+
+    def _fit(self, X_train, y_train, n_jobs=-1):
+        """Fit the forest and record training metadata, returning training accuracy"""
+        import numpy as np
+        from parallel_extract import resolve_n_jobs
+
+        print(f"Training with {len(X_train)} samples, {len(self.feature_names)} features")
+        started = time.perf_counter()
+        self.model.set_params(n_jobs=n_jobs)
+        try:
+            self.model.fit(X_train, y_train)
+
+            # Calculate training accuracy
+            train_acc = self.model.score(X_train, y_train)
+        finally:
+            # Scans predict a batch at a time, often on worker processes
+            self.model.set_params(n_jobs=None)
+            self._engine = None
+        print(f"Forest fit on {resolve_n_jobs(n_jobs)} cores in {time.perf_counter() - started:.2f}s")
+        print(f"Training accuracy: {train_acc:.4f}")
+
+        self.screen = ScreenModel.fit(X_train, y_train, self.schema)
+
+        self.model_version = self.model_fingerprint()
+        self.model_path = None
+        self.training_metadata = {
+            'trained_at': datetime.now().isoformat(),
+            'n_samples': int(len(X_train)),
+            'n_clean': int(np.sum(y_train == 0)),
+            'n_malicious': int(np.sum(y_train == 1)),
+            'n_features': len(self.feature_names),
+            'train_accuracy': float(train_acc)
+        }
+
+        return train_acc
+
+    def _signatures(self, X):
+        """LSH signatures of feature rows (Nones when disabled)"""
+        if not self.similarity_signatures or not len(X):
+            return [None] * len(X)
+        return signatures(X, self.schema.names)
+
+    def save_model(self, path):
+        """Save the trained model, with its feature schema, as a versioned artifact directory"""
+        manifest = model_store.save_model(
+            path, self.detector_type, self.model, self.feature_names, self.training_metadata,
+            schema=self.schema, screen=self.screen
+        )
+        self.model_version = manifest['model_version']
+        self.model_path = path
+        return manifest
+
+    def load_model(self, path):
+        """Load a model artifact saved by save_model (checksum-verified)"""
+        self.model, manifest = model_store.load_model(path, self.detector_type)
+        self.schema = model_store.load_schema(manifest)
+        self.screen = model_store.load_screen(manifest, self.schema)
+        self.training_metadata = manifest['metadata']
+        self.model_version = manifest['model_version']
+        self.model_path = path
+        return manifest
+
+    def model_fingerprint(self):
+        """Short digest identifying the trained model and its feature layout"""
+        blob = pickle.dumps((self.feature_names, self.model))
+        return hashlib.sha256(blob).hexdigest()[:16]
+
+    def get_file_hash(self, filepath):
+        """Calculate SHA256 hash of file"""
+        return file_sha256(filepath)
+
+
+def _extract_training_chunk(file_paths, detector_class, store_path=None, with_hash=False, schema=None):
+    """
+    Extract feature rows for a chunk of training files (process pool task)
+
+    Returns one (sha256, row, stored) per path: row is a float32 vector
+    in schema's layout, or None for files that yield no features, and
+    sha256 is None unless with_hash. With store_path, files already in
+    that feature store are reported as stored without being parsed.
+    """
+    from feature_store import is_stored
+
+    detector = detector_class()
+    if schema is not None:
+        detector.schema = schema
+
+    results = []
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            results.append((None, None, False))
+            continue
+
+        sha256 = file_sha256(file_path, data) if with_hash or store_path is not None else None
+        if store_path is not None and is_stored(store_path, sha256):
+            results.append((sha256, None, True))
+            continue
+
+        row = detector.schema.allocate(1)[0]
+        extracted, error = detector.extract_into(row, file_path, data)
+        results.append((sha256, row if extracted is not None else None, False))
+    return results
@@ -0,0 +1,207 @@
+"""
+EXIF Parser Module
+Streaming JPEG marker walker and bounded TIFF/EXIF directory reader
+Reports raw EXIF tag sizes without decoding tag values into Python objects
+"""
+
+import struct
+
+# Bytes per component for each TIFF field type
+TYPE_SIZES = {
+    1: 1,   # BYTE
+    2: 1,   # ASCII
+    3: 2,   # SHORT
+    4: 4,   # LONG
+    5: 8,   # RATIONAL
+    6: 1,   # SBYTE
+    7: 1,   # UNDEFINED
+    8: 2,   # SSHORT
+    9: 4,   # SLONG
+    10: 8,  # SRATIONAL
+    11: 4,  # FLOAT
+    12: 8,  # DOUBLE
+    13: 4,  # IFD
+}
+
+# Integer types whose single value is cheap to read straight from the entry
+SCALAR_FORMATS = {1: 'B', 3: 'H', 4: 'I', 6: 'b', 8: 'h', 9: 'i', 13: 'I'}
+
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+# Start-of-frame markers carry the image dimensions (DHT, JPG and DAC excluded)
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Markers without a length field
+STANDALONE_MARKERS = frozenset([0x01] + list(range(0xD0, 0xD8)))
+
+# Hard bounds against malformed or hostile files
+MAX_IFD_ENTRIES = 1024
+MAX_SEGMENTS = 4096
+
+
+class ExifParseError(ValueError):
+    """Raised when a file is not a parseable JPEG"""
+
+
+def find_exif_segment(data):
+    """
+    Walk JPEG markers up to the first start-of-frame
+
+    Returns (tiff_start, tiff_end, width, height): the bounds of the TIFF
+    block inside the first Exif APP1 segment (None, None if there is none)
+    and the frame dimensions (0, 0 if no SOF precedes the scan data).
+    """
+    if data[:2] != b'\xff\xd8':
+        raise ExifParseError("Not a valid JPEG file")
+
+    size = len(data)
+    pos = 2
+    tiff_start = tiff_end = None
+    width = height = 0
+
+    for _ in range(MAX_SEGMENTS):
+        if data[pos:pos + 1] != b'\xff':
+            # Not at a marker: stop at the corruption
+            break
+
+        # Skip the marker prefix and any fill bytes
+        while data[pos:pos + 1] == b'\xff':
+            pos += 1
+        if pos >= size:
+            break
+
+        marker = data[pos]
+        pos += 1
+
+        if marker in STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan: no more header segments
+            break
+
+        if pos + 2 > size:
+            break
+        seg_len = struct.unpack_from('>H', data, pos)[0]
+        if seg_len < 2 or pos + seg_len > size:
+            break
+
+        payload = pos + 2
+        seg_end = pos + seg_len
+
+        if marker == 0xE1 and tiff_start is None and data[payload:payload + 6] == b'Exif\x00\x00':
+            tiff_start = payload + 6
+            tiff_end = seg_end
+        elif marker in SOF_MARKERS:
+            if seg_len >= 7:
+                height, width = struct.unpack_from('>HH', data, payload + 1)
+            break
+
+        pos = seg_end
+
+    return tiff_start, tiff_end, width, height
+
+
+def read_ifds(data, start, end):
+    """
+    Read IFD0, the Exif IFD, the GPS IFD and IFD1 from a TIFF block
+
+    Returns (tags, bad_entries). tags is a list of
+    (ifd_name, tag_id, byte_size, value) tuples, where value is the
+    decoded integer for single-valued integer tags and None otherwise.
+    Entries whose data would fall outside the block, or whose type is
+    unknown, are skipped and counted in bad_entries.
+    """
+    block_len = end - start
+    if block_len < 8:
+        return [], 1
+
+    order = data[start:start + 2]
+    if order == b'II':
+        endian = '<'
+    elif order == b'MM':
+        endian = '>'
+    else:
+        return [], 1
+
+    magic, ifd0_offset = struct.unpack_from(endian + 'HI', data, start + 2)
+    if magic != 42:
+        return [], 1
+
+    tags = []
+    bad_entries = 0
+    visited = set()
+    pending = [('IFD0', ifd0_offset)]
+
+    while pending:
+        ifd_name, offset = pending.pop(0)
+        if offset in visited or offset < 8 or offset + 2 > block_len:
+            # Directory loop or pointer outside the block
+            bad_entries += 1
+            continue
+        visited.add(offset)
+
+        count = struct.unpack_from(endian + 'H', data, start + offset)[0]
+        available = (block_len - offset - 2) // 12
+        if count > MAX_IFD_ENTRIES or count > available:
+            bad_entries += 1
+            count = min(count, MAX_IFD_ENTRIES, available)
+
+        entry = start + offset + 2
+        for _ in range(count):
+            tag_id, field_type, components = struct.unpack_from(endian + 'HHI', data, entry)
+            value_field = entry + 8
+            entry += 12
+
+            type_size = TYPE_SIZES.get(field_type)
+            if type_size is None:
+                bad_entries += 1
+                continue
+
+            byte_size = type_size * components
+            if byte_size > 4:
+                data_offset = struct.unpack_from(endian + 'I', data, value_field)[0]
+                if data_offset + byte_size > block_len:
+                    bad_entries += 1
+                    continue
+
+            value = None
+            if components == 1 and field_type in SCALAR_FORMATS:
+                value = struct.unpack_from(endian + SCALAR_FORMATS[field_type], data, value_field)[0]
+
+            tags.append((ifd_name, tag_id, byte_size, value))
+
+            if value is not None and ifd_name == 'IFD0':
+                if tag_id == EXIF_IFD_POINTER:
+                    pending.append(('Exif', value))
+                elif tag_id == GPS_IFD_POINTER:
+                    pending.append(('GPS', value))
+
+        # IFD0 links to IFD1 (the thumbnail directory)
+        if ifd_name == 'IFD0' and entry + 4 <= end:
+            next_offset = struct.unpack_from(endian + 'I', data, entry)[0]
+            if next_offset:
+                pending.append(('IFD1', next_offset))
+
+    return tags, bad_entries
+
+
+def parse_jpeg_exif(data):
+    """
+    Parse the EXIF directories and frame size of a JPEG buffer
+
+    Returns a dict with 'tags' (see read_ifds), 'bad_entries', 'width'
+    and 'height'. Raises ExifParseError if data is not a JPEG.
+    """
+    tiff_start, tiff_end, width, height = find_exif_segment(data)
+
+    tags, bad_entries = [], 0
+    if tiff_start is not None:
+        tags, bad_entries = read_ifds(data, tiff_start, tiff_end)
+
+    return {
+        'tags': tags,
+        'bad_entries': bad_entries,
+        'width': width,
+        'height': height
+    }
@@ -0,0 +1,176 @@
+"""
+Feature Schema Module
+Fixed, versioned feature layouts compiled to column indices
+Saved with each model so training and inference always agree on columns
+"""
+
+import hashlib
+import json
+
+# JPEG EXIF tags with their own columns, by IFD namespace. Names follow
+# PIL.ExifTags so they match the columns of models trained before the
+# schema was fixed. Any other tag is folded into the unknown_tag_* columns.
+JPEG_TRACKED_TAGS = {
+    # IFD0 and the Exif IFD share one tag namespace, 'main'
+    'main': (
+        (0x0100, 'ImageWidth'), (0x0101, 'ImageLength'), (0x0102, 'BitsPerSample'),
+        (0x0103, 'Compression'), (0x0106, 'PhotometricInterpretation'),
+        (0x010E, 'ImageDescription'), (0x010F, 'Make'), (0x0110, 'Model'),
+        (0x0111, 'StripOffsets'), (0x0112, 'Orientation'), (0x0115, 'SamplesPerPixel'),
+        (0x0116, 'RowsPerStrip'), (0x0117, 'StripByteCounts'), (0x011A, 'XResolution'),
+        (0x011B, 'YResolution'), (0x011C, 'PlanarConfiguration'), (0x0128, 'ResolutionUnit'),
+        (0x0131, 'Software'), (0x0132, 'DateTime'), (0x013B, 'Artist'),
+        (0x013C, 'HostComputer'), (0x0201, 'JpegIFOffset'), (0x0202, 'JpegIFByteCount'),
+        (0x0213, 'YCbCrPositioning'), (0x8298, 'Copyright'), (0x829A, 'ExposureTime'),
+        (0x829D, 'FNumber'), (0x8769, 'ExifOffset'), (0x8822, 'ExposureProgram'),
+        (0x8825, 'GPSInfo'), (0x8827, 'ISOSpeedRatings'), (0x9000, 'ExifVersion'),
+        (0x9003, 'DateTimeOriginal'), (0x9004, 'DateTimeDigitized'), (0x9010, 'OffsetTime'),
+        (0x9011, 'OffsetTimeOriginal'), (0x9012, 'OffsetTimeDigitized'),
+        (0x9101, 'ComponentsConfiguration'), (0x9201, 'ShutterSpeedValue'),
+        (0x9202, 'ApertureValue'), (0x9203, 'BrightnessValue'), (0x9204, 'ExposureBiasValue'),
+        (0x9205, 'MaxApertureValue'), (0x9207, 'MeteringMode'), (0x9208, 'LightSource'),
+        (0x9209, 'Flash'), (0x920A, 'FocalLength'), (0x927C, 'MakerNote'),
+        (0x9286, 'UserComment'), (0x9290, 'SubsecTime'), (0x9291, 'SubsecTimeOriginal'),
+        (0x9292, 'SubsecTimeDigitized'), (0x9C9B, 'XPTitle'), (0x9C9C, 'XPComment'),
+        (0x9C9D, 'XPAuthor'), (0x9C9E, 'XPKeywords'), (0x9C9F, 'XPSubject'),
+        (0xA000, 'FlashPixVersion'), (0xA001, 'ColorSpace'), (0xA002, 'ExifImageWidth'),
+        (0xA003, 'ExifImageHeight'), (0xA005, 'ExifInteroperabilityOffset'),
+        (0xA217, 'SensingMethod'), (0xA300, 'FileSource'), (0xA301, 'SceneType'),
+        (0xA401, 'CustomRendered'), (0xA402, 'ExposureMode'), (0xA403, 'WhiteBalance'),
+        (0xA404, 'DigitalZoomRatio'), (0xA405, 'FocalLengthIn35mmFilm'),
+        (0xA406, 'SceneCaptureType'), (0xA407, 'GainControl'), (0xA408, 'Contrast'),
+        (0xA409, 'Saturation'), (0xA40A, 'Sharpness'), (0xA40C, 'SubjectDistanceRange'),
+        (0xA420, 'ImageUniqueID'), (0xA430, 'CameraOwnerName'), (0xA431, 'BodySerialNumber'),
+        (0xA432, 'LensSpecification'), (0xA433, 'LensMake'), (0xA434, 'LensModel'),
+        (0xC4A5, 'PrintImageMatching'),
+    ),
+    'GPS': (
+        (0, 'GPSVersionID'), (1, 'GPSLatitudeRef'), (2, 'GPSLatitude'), (3, 'GPSLongitudeRef'),
+        (4, 'GPSLongitude'), (5, 'GPSAltitudeRef'), (6, 'GPSAltitude'), (7, 'GPSTimeStamp'),
+        (8, 'GPSSatellites'), (9, 'GPSStatus'), (10, 'GPSMeasureMode'), (11, 'GPSDOP'),
+        (12, 'GPSSpeedRef'), (13, 'GPSSpeed'), (16, 'GPSImgDirectionRef'),
+        (17, 'GPSImgDirection'), (18, 'GPSMapDatum'), (27, 'GPSProcessingMethod'),
+        (29, 'GPSDateStamp'),
+    ),
+    # Thumbnail directory; columns are prefixed with 'Thumbnail'
+    'IFD1': (
+        (0x0100, 'ImageWidth'), (0x0101, 'ImageLength'), (0x0103, 'Compression'),
+        (0x0112, 'Orientation'), (0x011A, 'XResolution'), (0x011B, 'YResolution'),
+        (0x0128, 'ResolutionUnit'), (0x0201, 'JpegIFOffset'), (0x0202, 'JpegIFByteCount'),
+        (0x0213, 'YCbCrPositioning'),
+    ),
+}
+
+JPEG_TAG_NAMES = {
+    (namespace, tag_id): name
+    for namespace, tags in JPEG_TRACKED_TAGS.items()
+    for tag_id, name in tags
+}
+
+# Aggregates over tags without their own column
+JPEG_UNKNOWN_FEATURES = ('unknown_tag_count', 'unknown_tag_length', 'unknown_tag_max_length')
+
+JPEG_SUMMARY_FEATURES = (
+    'exif_tag_count', 'exif_bad_entries', 'file_size', 'image_width', 'image_height',
+    'total_exif_size', 'exif_to_file_ratio'
+)
+
+JPEG_SCHEMA_VERSION = 1
+PE_SCHEMA_VERSION = 1
+
+
+def jpeg_tag_name(namespace, name):
+    """Column stem of an EXIF tag ('Thumbnail' prefix for IFD1 tags)"""
+    return f"Thumbnail{name}" if namespace == 'IFD1' else name
+
+
+class FeatureSchema:
+    """
+    Ordered feature names of one detector, compiled to column indices
+
+    A schema is identified by (detector_type, version) and a fingerprint
+    of its names, and is saved in each model artifact. Extractors look
+    up columns once and write straight into rows from allocate(), so no
+    per-file lists or dict-to-vector passes are needed. version 0 marks a
+    legacy schema rebuilt from an older model's feature_names.
+    """
+
+    def __init__(self, detector_type, feature_names, version):
+        self.detector_type = detector_type
+        self.names = tuple(feature_names)
+        self.version = version
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.n_features = len(self.names)
+
+        if len(self.index) != self.n_features:
+            raise ValueError(f"Duplicate feature names in {detector_type} schema")
+
+    def __len__(self):
+        return self.n_features
+
+    def __eq__(self, other):
+        return (isinstance(other, FeatureSchema)
+                and (self.detector_type, self.version, self.names)
+                == (other.detector_type, other.version, other.names))
+
+    def __hash__(self):
+        return hash((self.detector_type, self.version, self.names))
+
+    @property
+    def fingerprint(self):
+        """Short digest of the detector type, version and column order"""
+        blob = json.dumps([self.detector_type, self.version, list(self.names)]).encode()
+        return hashlib.sha256(blob).hexdigest()[:16]
+
+    def column(self, name):
+        """Column index of a feature, or None if the schema lacks it"""
+        return self.index.get(name)
+
+    def allocate(self, n_rows):
+        """Zeroed float32 batch matrix of n_rows rows in this layout"""
+        import numpy as np
+        return np.zeros((n_rows, self.n_features), dtype=np.float32)
+
+    def fill(self, row, features):
+        """Write a features dict into a zeroed row (names outside the schema are ignored)"""
+        index = self.index
+        for name, value in features.items():
+            column = index.get(name)
+            if column is not None:
+                row[column] = value
+        return row
+
+    def to_dict(self):
+        """JSON-serializable form, stored in model manifests"""
+        return {
+            'detector_type': self.detector_type,
+            'version': self.version,
+            'fingerprint': self.fingerprint,
+            'feature_names': list(self.names)
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild a schema saved by to_dict, checking its fingerprint"""
+        schema = cls(state['detector_type'], state['feature_names'], state['version'])
+        if state.get('fingerprint') not in (None, schema.fingerprint):
+            raise ValueError(f"Feature schema fingerprint mismatch for {schema.detector_type}")
+        return schema
+
+
+def jpeg_exif_schema():
+    """Current JPEG EXIF layout: tracked tags, unknown-tag aggregates, summary features"""
+    names = []
+    for namespace, tags in JPEG_TRACKED_TAGS.items():
+        for _, name in tags:
+            stem = jpeg_tag_name(namespace, name)
+            names.extend((f"{stem}_length", f"{stem}_value"))
+    names.extend(JPEG_UNKNOWN_FEATURES)
+    names.extend(JPEG_SUMMARY_FEATURES)
+    return FeatureSchema('JPEG_EXIF', names, JPEG_SCHEMA_VERSION)
+
+
+def pe_schema():
+    """Current PE-Miner layout (pe_parser.PE_FEATURE_NAMES)"""
+    from pe_parser import PE_FEATURE_NAMES
+    return FeatureSchema('PE_MINER', PE_FEATURE_NAMES, PE_SCHEMA_VERSION)
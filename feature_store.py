@@ -0,0 +1,247 @@
+"""
+Feature Store Module
+On-disk store of extracted feature vectors for training and re-scoring
+A memory-mapped float32 matrix plus a SQLite path/hash/label index
+"""
+
+import json
+import os
+import sqlite3
+
+STORE_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+MATRIX_FILE = 'features.f32'
+INDEX_FILE = 'index.db'
+
+# Rows read per predict_proba call when scoring a store
+SCORE_BATCH_ROWS = 65536
+
+# Read-only index connections of extraction workers, per store path
+_index_readers = {}
+
+
+class FeatureStore:
+    """
+    Feature vectors of one detector type, persisted so retraining,
+    re-scoring and threshold experiments never re-read the raw corpus
+
+    The matrix file holds the rows back to back as little-endian float32,
+    the layout scikit-learn's forests consume, so matrix() is a read-only
+    memory map handed to fit / predict_proba without a copy and datasets
+    larger than RAM are paged in on demand. Any column is a strided view
+    of the same map. The index maps each row to its file's path, SHA-256
+    and label (0 clean, 1 malicious).
+
+    Rows are appended to the matrix before the index commits them; a
+    crash in between leaves a tail that is truncated on the next open.
+    """
+
+    def __init__(self, path, detector_type=None, feature_names=None):
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('format_version') != STORE_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported feature store format {manifest.get('format_version')} "
+                    f"(expected {STORE_FORMAT_VERSION})"
+                )
+            if detector_type is not None and manifest['detector_type'] != detector_type:
+                raise ValueError(
+                    f"Feature store at {path} is for {manifest['detector_type']}, not {detector_type}"
+                )
+            if feature_names is not None and list(feature_names) != manifest['feature_names']:
+                raise ValueError(f"Feature store at {path} has a different feature layout")
+            self.detector_type = manifest['detector_type']
+            self.feature_names = manifest['feature_names']
+        else:
+            if detector_type is None or not feature_names:
+                raise ValueError("A new feature store needs a detector_type and feature_names")
+            os.makedirs(path, exist_ok=True)
+            self.detector_type = detector_type
+            self.feature_names = list(feature_names)
+            with open(manifest_path + '.tmp', 'w') as f:
+                json.dump({
+                    'format_version': STORE_FORMAT_VERSION,
+                    'detector_type': detector_type,
+                    'feature_names': self.feature_names,
+                    'dtype': 'float32'
+                }, f, indent=2)
+            os.replace(manifest_path + '.tmp', manifest_path)
+
+        self.n_features = len(self.feature_names)
+        self._row_bytes = 4 * self.n_features
+        self._column_index = {name: i for i, name in enumerate(self.feature_names)}
+
+        self.conn = sqlite3.connect(os.path.join(path, INDEX_FILE), timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                path TEXT,
+                sha256 TEXT,
+                label INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_rows_sha256 ON rows (sha256);
+            CREATE INDEX IF NOT EXISTS idx_rows_path ON rows (path);
+        ''')
+        self.conn.commit()
+
+        self.n_rows = self.conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+
+        # Drop rows written to the matrix but never committed to the index
+        matrix_path = os.path.join(path, MATRIX_FILE)
+        with open(matrix_path, 'ab') as f:
+            if f.tell() != self.n_rows * self._row_bytes:
+                f.truncate(self.n_rows * self._row_bytes)
+        self._handle = None
+
+    def __len__(self):
+        return self.n_rows
+
+    def contains(self, sha256):
+        """Whether a file with this SHA-256 is already stored"""
+        return self.conn.execute(
+            'SELECT 1 FROM rows WHERE sha256 = ? LIMIT 1', (sha256,)
+        ).fetchone() is not None
+
+    def extend(self, rows, labels, paths=None, hashes=None):
+        """
+        Append feature rows (an n x n_features array, or a list of rows or
+        feature dicts) with their labels, returning the first new row number
+        """
+        import numpy as np
+
+        if len(rows) and isinstance(rows[0], dict):
+            rows = self.rows_from_dicts(rows)
+        matrix = np.ascontiguousarray(rows, dtype='<f4').reshape(-1, self.n_features)
+        count = len(matrix)
+        if count != len(labels):
+            raise ValueError(f"{count} rows but {len(labels)} labels")
+
+        paths = paths if paths is not None else [None] * count
+        hashes = hashes if hashes is not None else [None] * count
+
+        if self._handle is None:
+            self._handle = open(os.path.join(self.path, MATRIX_FILE), 'ab')
+        first = self.n_rows
+        self._handle.write(matrix.tobytes())
+        self._handle.flush()
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO rows (row, path, sha256, label) VALUES (?, ?, ?, ?)',
+                [(first + i, paths[i], hashes[i], int(labels[i])) for i in range(count)]
+            )
+        self.n_rows += count
+        return first
+
+    def append(self, row, label, path=None, sha256=None):
+        """Append one feature row, returning its row number"""
+        return self.extend([row], [label], [path], [sha256])
+
+    def rows_from_dicts(self, feature_dicts):
+        """Lay out feature dicts in this store's columns (missing features are 0)"""
+        import numpy as np
+
+        matrix = np.zeros((len(feature_dicts), self.n_features), dtype=np.float32)
+        column_index = self._column_index
+        for i, features in enumerate(feature_dicts):
+            for name, value in features.items():
+                column = column_index.get(name)
+                if column is not None:
+                    matrix[i, column] = value
+        return matrix
+
+    def matrix(self, feature_names=None):
+        """
+        Read-only (n_rows x n_features) float32 memory map of the stored rows
+
+        With feature_names, the columns are rearranged to that layout
+        (features the store lacks are 0), which copies the matrix; use it
+        only for models trained on a different layout.
+        """
+        import numpy as np
+
+        if self.n_rows == 0:
+            matrix = np.zeros((0, self.n_features), dtype=np.float32)
+        else:
+            matrix = np.memmap(
+                os.path.join(self.path, MATRIX_FILE), dtype='<f4', mode='r',
+                shape=(self.n_rows, self.n_features)
+            )
+
+        if feature_names is None or list(feature_names) == self.feature_names:
+            return matrix
+
+        remapped = np.zeros((self.n_rows, len(feature_names)), dtype=np.float32)
+        for i, name in enumerate(feature_names):
+            column = self._column_index.get(name)
+            if column is not None:
+                remapped[:, i] = matrix[:, column]
+        return remapped
+
+    def labels(self):
+        """Labels of the stored rows, in row order"""
+        import numpy as np
+
+        cursor = self.conn.execute('SELECT label FROM rows ORDER BY row')
+        return np.fromiter((label for (label,) in cursor), dtype=np.int64, count=self.n_rows)
+
+    def index(self, label=None):
+        """Yield (row, path, sha256, label) for every row (or every row with label)"""
+        if label is None:
+            cursor = self.conn.execute('SELECT row, path, sha256, label FROM rows ORDER BY row')
+        else:
+            cursor = self.conn.execute(
+                'SELECT row, path, sha256, label FROM rows WHERE label = ? ORDER BY row', (label,)
+            )
+        yield from cursor
+
+    def set_label(self, sha256, label):
+        """Relabel every row of a file, returning the number of rows changed"""
+        with self.conn:
+            cursor = self.conn.execute('UPDATE rows SET label = ? WHERE sha256 = ?', (int(label), sha256))
+        return cursor.rowcount
+
+    def score(self, model, feature_names=None, batch_rows=SCORE_BATCH_ROWS):
+        """
+        predict_proba of model over every stored row, batch_rows at a time
+
+        feature_names is the model's layout, if it differs from the
+        store's. Returns an (n_rows x n_classes) array.
+        """
+        import numpy as np
+
+        matrix = self.matrix(feature_names)
+        if self.n_rows == 0:
+            return np.zeros((0, len(model.classes_)))
+        return np.vstack([
+            model.predict_proba(matrix[start:start + batch_rows])
+            for start in range(0, self.n_rows, batch_rows)
+        ])
+
+    def close(self):
+        """Close the matrix handle and the index"""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        self.conn.close()
+
+
+def is_stored(path, sha256):
+    """
+    Whether the store at path holds a file with this SHA-256
+
+    For extraction workers, which must not open a FeatureStore (opening
+    one truncates uncommitted rows): each process keeps one read-only
+    connection per store.
+    """
+    conn = _index_readers.get(path)
+    if conn is None:
+        index_path = os.path.abspath(os.path.join(path, INDEX_FILE))
+        conn = _index_readers[path] = sqlite3.connect(f'file:{index_path}?mode=ro', uri=True)
+    return conn.execute('SELECT 1 FROM rows WHERE sha256 = ? LIMIT 1', (sha256,)).fetchone() is not None
@@ -0,0 +1,66 @@
+"""
+File View Module
+Opens and memory-maps a scanned file once so every pipeline stage
+(type detection, feature extraction, hashing, metadata) shares one buffer
+"""
+
+import mmap
+import os
+
+
+class FileView:
+    """
+    A file opened once, stat'ed once and memory-mapped read-only
+
+    ``data`` is a bytes-like object (the mmap itself, or b'' for empty
+    files) that supports len(), slicing, struct.unpack_from and
+    hashlib.update without copying the file into Python memory.
+    """
+
+    def __init__(self, filepath):
+        self.path = filepath
+        self._file = open(filepath, 'rb')
+        self._mmap = None
+
+        try:
+            self.stat = os.fstat(self._file.fileno())
+            if self.stat.st_size > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.data = self._mmap
+            else:
+                self.data = b''
+        except Exception:
+            self._file.close()
+            raise
+
+    @property
+    def size(self):
+        """Size of the mapped file in bytes"""
+        return len(self.data)
+
+    def close(self):
+        """Unmap and close the underlying file"""
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A consumer still holds a view; the mapping goes with it
+                pass
+            self._mmap = None
+        self.data = b''
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_view(filepath):
+    """Open a FileView, or return None if the file cannot be mapped"""
+    try:
+        return FileView(filepath)
+    except (OSError, ValueError):
+        return None
+
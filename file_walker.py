@@ -0,0 +1,166 @@
+"""
+File Walker Module
+os.scandir-based directory walker that prefilters files before they are scanned
+Include/exclude globs, extensions, size bounds and directory pruning
+"""
+
+import fnmatch
+import os
+import re
+
+
+def _compile_globs(patterns):
+    """One case-normalized regex matching any of the glob patterns (None if empty)"""
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
+
+
+class FileFilter:
+    """
+    Rules deciding which files a directory scan dispatches
+
+    extensions (e.g. {'.jpg', '.exe'}, case-insensitive) and include globs
+    restrict the files kept; exclude globs and exclude_dirs globs reject
+    files and prune whole directories. Globs match the entry's name, or
+    its path relative to the scan root when the pattern contains a '/'.
+    Name rules are checked first, so files rejected by them are never
+    stat'ed or opened; size bounds (bytes, inclusive) reuse the stat of
+    the directory entry.
+    """
+
+    def __init__(self, extensions=None, include=None, exclude=None, exclude_dirs=None,
+                 min_size=None, max_size=None):
+        self.extensions = (
+            frozenset(ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions)
+            if extensions is not None else None
+        )
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.exclude_dirs = list(exclude_dirs or [])
+        self.min_size = min_size
+        self.max_size = max_size
+
+        self._include = _compile_globs(self.include)
+        self._exclude = _compile_globs(self.exclude)
+        self._exclude_dirs = _compile_globs(self.exclude_dirs)
+        self.needs_stat = min_size is not None or max_size is not None
+
+    @staticmethod
+    def _glob_match(regex, name, relpath):
+        if regex is None:
+            return False
+        return bool(regex.match(os.path.normcase(name)) or regex.match(os.path.normcase(relpath)))
+
+    def check_name(self, name, relpath):
+        """Skip reason for a file from its name alone, or None to keep it"""
+        if self.extensions is not None and os.path.splitext(name)[1].lower() not in self.extensions:
+            return 'extension'
+        if self._include is not None and not self._glob_match(self._include, name, relpath):
+            return 'include'
+        if self._glob_match(self._exclude, name, relpath):
+            return 'exclude'
+        return None
+
+    def check_size(self, size):
+        """Skip reason for a file of size bytes, or None to keep it"""
+        if self.min_size is not None and size < self.min_size:
+            return 'size'
+        if self.max_size is not None and size > self.max_size:
+            return 'size'
+        return None
+
+    def prune_dir(self, name, relpath):
+        """Whether a directory (and everything below it) is skipped"""
+        return self._glob_match(self._exclude_dirs, name, relpath)
+
+    def check_path(self, path, root, check_size=True):
+        """
+        Skip reason for a single file under root, as a walk of root would
+        decide it, or None to keep it (for paths reported by a watcher)
+        """
+        relpath = os.path.relpath(path, root).replace(os.sep, '/')
+        parts = relpath.split('/')
+        for depth, name in enumerate(parts[:-1]):
+            if self.prune_dir(name, '/'.join(parts[:depth + 1])):
+                return 'exclude_dir'
+
+        reason = self.check_name(parts[-1], relpath)
+        if reason is None and check_size and self.needs_stat:
+            try:
+                reason = self.check_size(os.stat(path).st_size)
+            except OSError:
+                reason = 'missing'
+        return reason
+
+
+class FileWalker:
+    """
+    Walk a directory with os.scandir, yielding the DirEntry of every file
+    that passes the filter
+
+    DirEntry type checks come from the directory listing itself, and
+    DirEntry.stat() caches its result, so callers that need the stat
+    (size bounds here, the incremental manifest later) share a single
+    stat call per file. Files are followed through symlinks but
+    directories are not, like os.walk. Skipped files are counted by
+    reason in skipped.
+    """
+
+    def __init__(self, file_filter=None):
+        self.file_filter = file_filter or FileFilter()
+        self.skipped = {}
+        self.pruned_dirs = 0
+
+    def _skip(self, reason):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    @property
+    def skipped_total(self):
+        """Number of files rejected by the filter so far"""
+        return sum(self.skipped.values())
+
+    def walk(self, root, recursive=True):
+        """Yield the DirEntry of each kept file under root"""
+        file_filter = self.file_filter
+        stack = [(root, '')]
+
+        while stack:
+            directory, reldir = stack.pop()
+            subdirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        relpath = reldir + entry.name
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if recursive:
+                                    if file_filter.prune_dir(entry.name, relpath):
+                                        self.pruned_dirs += 1
+                                    else:
+                                        subdirs.append((entry.path, relpath + '/'))
+                                continue
+                            if not entry.is_file():
+                                continue
+
+                            reason = file_filter.check_name(entry.name, relpath)
+                            if reason is None and file_filter.needs_stat:
+                                reason = file_filter.check_size(entry.stat().st_size)
+                        except OSError:
+                            # Vanished or unreadable between listing and stat
+                            continue
+
+                        if reason is not None:
+                            self._skip(reason)
+                            continue
+                        yield entry
+            except OSError:
+                continue
+
+            # Depth-first, in listing order
+            stack.extend(reversed(subdirs))
+
+    def paths(self, root, recursive=True):
+        """Yield the paths of kept files under root"""
+        for entry in self.walk(root, recursive):
+            yield entry.path
@@ -0,0 +1,306 @@
+"""
+File Watcher Module
+Reports files written into a directory tree as they land
+inotify (via ctypes) on Linux, with a polling fallback, plus a debouncer
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from collections import OrderedDict, deque
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_BUFFER_SIZE = 64 * 1024
+
+
+def _walk_files(root, recursive):
+    """Yield the files under root"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch for close-write and moved-to events
+
+    New subdirectories are watched as they appear and the files already
+    inside them are reported, since they may have been written before the
+    watch was added. If the kernel queue overflows, the whole tree is
+    rescanned and reported lazily, a batch per read_events() call.
+    """
+
+    def __init__(self, root, recursive=True):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1 failed: {os.strerror(errno)}")
+
+        self.root = root
+        self.recursive = recursive
+        self.overflows = 0
+        self._watches = {}
+        self._backlog = deque()
+        self._rescan = None
+
+        try:
+            self._watch_tree(root, report=False)
+        except Exception:
+            os.close(self.fd)
+            raise
+
+    def _watch(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch failed for {directory}: {os.strerror(errno)}")
+        self._watches[wd] = directory
+
+    def _watch_tree(self, top, report=True):
+        """Watch top (and its subdirectories), optionally reporting files already there"""
+        self._watch(top)
+        if not self.recursive:
+            return
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            try:
+                                self._watch(entry.path)
+                            except OSError as e:
+                                if e.errno != 2:  # vanished already
+                                    raise
+                                continue
+                            stack.append(entry.path)
+                        elif report and entry.is_file(follow_symlinks=False):
+                            self._backlog.append(entry.path)
+            except OSError:
+                continue
+
+    def read_events(self, timeout, max_events=4096):
+        """
+        Wait up to timeout seconds and return the paths of finished files
+
+        Returns at most about max_events paths (one kernel read may add a
+        few more); the rest stay in the kernel queue or the backlog.
+        """
+        paths = self._drain_backlog(max_events)
+        if paths:
+            timeout = 0
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return paths
+
+        try:
+            buffer = os.read(self.fd, READ_BUFFER_SIZE)
+        except BlockingIOError:
+            return paths
+
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_len].rstrip(b'\0')
+            offset += EVENT_HEADER.size + name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: fall back to a lazy rescan of the tree
+                self.overflows += 1
+                self._rescan = _walk_files(self.root, self.recursive)
+                continue
+
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                if mask & IN_IGNORED:
+                    del self._watches[wd]
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._watch_tree(path)
+                    except OSError:
+                        pass
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                paths.append(path)
+
+        return paths
+
+    def _drain_backlog(self, max_events):
+        """Take up to max_events paths from the backlog and any pending rescan"""
+        paths = []
+        while self._backlog and len(paths) < max_events:
+            paths.append(self._backlog.popleft())
+        if self._rescan is not None:
+            for path in self._rescan:
+                paths.append(path)
+                if len(paths) >= max_events:
+                    break
+            else:
+                self._rescan = None
+        return paths
+
+    def close(self):
+        """Stop watching"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """
+    Portable fallback: compare (mtime_ns, size) snapshots every interval
+
+    A file is reported once it is new or its mtime or size changed since
+    the previous pass. Changes found in one pass are handed out a batch
+    per read_events() call.
+    """
+
+    def __init__(self, root, recursive=True, interval=2.0):
+        self.root = root
+        self.recursive = recursive
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+        self._backlog = deque()
+        self._next_poll = time.monotonic() + interval
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for path in _walk_files(self.root, self.recursive):
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat_result.st_mtime_ns, stat_result.st_size)
+        return snapshot
+
+    def read_events(self, timeout, max_events=4096):
+        """Return changed paths, polling the tree when the interval is due"""
+        if not self._backlog:
+            wait = self._next_poll - time.monotonic()
+            if wait > timeout:
+                time.sleep(timeout)
+                return []
+            if wait > 0:
+                time.sleep(wait)
+
+            snapshot = self._take_snapshot()
+            for path, signature in snapshot.items():
+                if self._snapshot.get(path) != signature:
+                    self._backlog.append(path)
+            self._snapshot = snapshot
+            self._next_poll = time.monotonic() + self.interval
+
+        paths = []
+        while self._backlog and len(paths) < max_events:
+            paths.append(self._backlog.popleft())
+        return paths
+
+    def close(self):
+        """Nothing to release"""
+        self._snapshot = {}
+
+
+def open_watcher(root, recursive=True, poll_interval=2.0, use_inotify=True):
+    """Watch root with inotify where available, otherwise by polling"""
+    if use_inotify:
+        try:
+            return InotifyWatcher(root, recursive)
+        except (OSError, AttributeError) as e:
+            # AttributeError: no inotify symbols in this libc (non-Linux)
+            print(f"inotify unavailable ({e}); polling every {poll_interval:g}s")
+    return PollingWatcher(root, recursive, poll_interval)
+
+
+class Debouncer:
+    """
+    Bounded set of paths waiting for writes to settle
+
+    Repeated events for a path coalesce into one entry whose timer
+    restarts; a path is ready once delay seconds pass without a new event.
+    Entries are kept in last-event order, so popping ready paths only
+    touches those that are ready.
+    """
+
+    def __init__(self, delay=0.5, max_pending=10000):
+        self.delay = delay
+        self.max_pending = max_pending
+        self.coalesced = 0
+        self._pending = OrderedDict()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def full(self):
+        """Whether the caller should stop reading events until paths drain"""
+        return len(self._pending) >= self.max_pending
+
+    def add(self, path, now=None):
+        """Record an event for path"""
+        now = time.monotonic() if now is None else now
+        if path in self._pending:
+            self._pending.move_to_end(path)
+            self.coalesced += 1
+        self._pending[path] = now
+
+    def pop_ready(self, now=None, limit=None):
+        """Remove and return the paths whose writes have settled"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        while self._pending and (limit is None or len(ready) < limit):
+            path, last_event = next(iter(self._pending.items()))
+            if now - last_event < self.delay:
+                break
+            del self._pending[path]
+            ready.append(path)
+        return ready
+
+    def next_ready_in(self, now=None):
+        """Seconds until the oldest pending path settles (None if nothing is pending)"""
+        if not self._pending:
+            return None
+        now = time.monotonic() if now is None else now
+        last_event = next(iter(self._pending.values()))
+        return max(0.0, self.delay - (now - last_event))
@@ -0,0 +1,370 @@
+"""
+Forensic Storage Module
+Pluggable backends for the forensic detection log
+JSONL (append-only text) or SQLite (WAL, indexed for investigator queries)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+# Log paths with these extensions are stored in SQLite
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# Rows fetched per lock hold when streaming SQLite entries
+SQLITE_FETCH_ROWS = 512
+
+
+def _entry_fields(log_entry):
+    """The indexed columns of a log entry"""
+    detection = log_entry.get('detection', {})
+    file_info = log_entry.get('file_info', {})
+    return (
+        detection.get('timestamp'),
+        detection.get('verdict'),
+        detection.get('detector_type'),
+        file_info.get('file_hash_sha256'),
+        log_entry.get('system_context', {}).get('hostname'),
+        file_info.get('original_path')
+    )
+
+
+def _matches(log_entry, file_hash=None, verdict=None, detector_type=None, hostname=None,
+             since=None, until=None, path_prefix=None):
+    """Whether a log entry passes every given query filter"""
+    timestamp, entry_verdict, entry_detector, entry_hash, entry_host, path = _entry_fields(log_entry)
+
+    if file_hash is not None and entry_hash != file_hash:
+        return False
+    if verdict is not None and entry_verdict != verdict:
+        return False
+    if detector_type is not None and entry_detector != detector_type:
+        return False
+    if hostname is not None and entry_host != hostname:
+        return False
+    # ISO timestamps compare correctly as strings, and a date prefix
+    # such as '2024-06-01' works as a bound
+    if since is not None and (timestamp is None or timestamp < since):
+        return False
+    if until is not None and (timestamp is None or timestamp >= until):
+        return False
+    if path_prefix is not None and not (path or '').startswith(path_prefix):
+        return False
+    return True
+
+
+class JSONLStorage:
+    """
+    Append-only JSONL log, one JSON object per line
+
+    Positions are byte offsets just past a complete line. Queries are a
+    linear scan; use SQLiteStorage for large histories.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._handle = None
+
+    def is_legacy(self):
+        """Whether the file still holds a pre-JSONL log (one JSON array)"""
+        return _is_legacy_json_log(self.path)
+
+    def append(self, log_entry):
+        """Append an entry, returning the log position after it"""
+        if self._handle is None:
+            if self.is_legacy():
+                migrate_json_log(self.path, self.path)
+            self._handle = open(self.path, 'ab')
+
+        self._handle.write(json.dumps(log_entry).encode() + b'\n')
+        self._handle.flush()
+        return self._handle.tell()
+
+    def iter_entries(self):
+        """Stream entries from disk without holding the history in memory"""
+        if not os.path.exists(self.path):
+            return
+
+        if self.is_legacy():
+            try:
+                with open(self.path, 'r') as f:
+                    yield from json.load(f)
+            except ValueError:
+                pass
+            return
+
+        for _, log_entry in self.iter_from(0):
+            if log_entry is not None:
+                yield log_entry
+
+    def iter_from(self, position):
+        """
+        Yield (position, entry) for complete lines after byte offset position
+
+        entry is None for blank or corrupt lines, which still advance the
+        position; a torn trailing line is not consumed.
+        """
+        if not os.path.exists(self.path) or self.is_legacy():
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(position)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                position += len(line)
+                line = line.strip()
+                log_entry = None
+                if line:
+                    try:
+                        log_entry = json.loads(line)
+                    except ValueError:
+                        pass
+                yield position, log_entry
+
+    def identity(self):
+        """(inode, end position) of the log, or (None, 0) if it does not exist"""
+        try:
+            stat_result = os.stat(self.path)
+        except OSError:
+            return None, 0
+        return stat_result.st_ino, stat_result.st_size
+
+    def query(self, **filters):
+        """Lazily yield entries matching the filters (see SQLiteStorage.query)"""
+        limit = filters.pop('limit', None)
+        matched = 0
+        for log_entry in self.iter_entries():
+            if limit is not None and matched >= limit:
+                return
+            if _matches(log_entry, **filters):
+                matched += 1
+                yield log_entry
+
+    def rewrite(self, entries):
+        """Replace the whole log with entries (compaction only)"""
+        self.close()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for log_entry in entries:
+                f.write(json.dumps(log_entry) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        """Close the append handle"""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class SQLiteStorage:
+    """
+    Forensic log in SQLite (WAL mode)
+
+    Each entry is stored as its JSON document next to indexed columns for
+    file hash, verdict, detector type, hostname, detection timestamp and
+    original path, so investigator queries are index lookups instead of
+    scans of the whole history. Positions are row ids, which
+    AUTOINCREMENT never reuses.
+
+    The connection may be used from any thread (the async engine appends
+    on a writer thread); a lock serializes its statements and
+    transactions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS log_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                verdict TEXT,
+                detector_type TEXT,
+                file_hash TEXT,
+                hostname TEXT,
+                original_path TEXT,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_log_file_hash ON log_entries (file_hash);
+            CREATE INDEX IF NOT EXISTS idx_log_verdict ON log_entries (verdict, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_log_detector ON log_entries (detector_type, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_log_hostname ON log_entries (hostname, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_log_timestamp ON log_entries (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_log_path ON log_entries (original_path);
+        ''')
+        self.conn.commit()
+
+    def is_legacy(self):
+        """SQLite logs never hold the pre-JSONL format"""
+        return False
+
+    def _insert(self, log_entry):
+        cursor = self.conn.execute(
+            'INSERT INTO log_entries (timestamp, verdict, detector_type, file_hash, hostname, '
+            'original_path, entry) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            _entry_fields(log_entry) + (json.dumps(log_entry),)
+        )
+        return cursor.lastrowid
+
+    def append(self, log_entry):
+        """Insert an entry, returning its row id"""
+        with self._lock:
+            row_id = self._insert(log_entry)
+            self.conn.commit()
+        return row_id
+
+    def extend(self, entries):
+        """Insert many entries in one transaction, returning the count"""
+        count = 0
+        with self._lock, self.conn:
+            for log_entry in entries:
+                self._insert(log_entry)
+                count += 1
+        return count
+
+    def iter_entries(self):
+        """Stream all entries in insertion order"""
+        for _, log_entry in self.iter_from(0):
+            yield log_entry
+
+    def iter_from(self, position):
+        """Yield (row id, entry) for rows after row id position"""
+        for row_id, entry in self._stream('SELECT id, entry FROM log_entries WHERE id > ? ORDER BY id',
+                                          (position,)):
+            yield row_id, json.loads(entry)
+
+    def _stream(self, sql, params):
+        """Yield a query's rows, holding the lock only while a batch is fetched"""
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(SQLITE_FETCH_ROWS)
+            if not rows:
+                return
+            yield from rows
+
+    def identity(self):
+        """(inode, last row id) of the database"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return None, 0
+        with self._lock:
+            row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'log_entries'").fetchone()
+        return inode, row[0] if row else 0
+
+    def query(self, file_hash=None, verdict=None, detector_type=None, hostname=None,
+              since=None, until=None, path_prefix=None, limit=None):
+        """
+        Lazily yield log entries matching every given filter
+
+        since / until bound the detection timestamp (ISO strings; until is
+        exclusive) and path_prefix matches the start of the original path.
+        Entries come back oldest first, read from the cursor as consumed.
+        """
+        clauses = []
+        params = []
+        for column, value in (
+            ('file_hash', file_hash),
+            ('verdict', verdict),
+            ('detector_type', detector_type),
+            ('hostname', hostname)
+        ):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        if path_prefix is not None:
+            # A range on the indexed column instead of LIKE, which would scan
+            clauses.append('original_path >= ? AND original_path < ?')
+            params.extend([path_prefix, path_prefix + '\U0010ffff'])
+
+        sql = 'SELECT entry FROM log_entries'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        for (entry,) in self._stream(sql, params):
+            yield json.loads(entry)
+
+    def rewrite(self, entries):
+        """Replace every stored entry with entries"""
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM log_entries')
+            for log_entry in entries:
+                self._insert(log_entry)
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.conn.close()
+
+
+def open_storage(path):
+    """Open the storage backend for a log path (SQLite for .db files)"""
+    if not path:
+        return None
+    if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS:
+        return SQLiteStorage(path)
+    return JSONLStorage(path)
+
+
+def _is_legacy_json_log(path):
+    """Check whether path holds a pre-JSONL log (one JSON array)"""
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                stripped = line.lstrip()
+                if stripped:
+                    return stripped.startswith('[')
+    except (OSError, ValueError):
+        pass
+    return False
+
+
+def migrate_json_log(json_path, jsonl_path=None):
+    """
+    Convert a legacy forensic_log.json array into the JSONL log format
+
+    Writes to jsonl_path (default: json_path with a .jsonl extension) via a
+    temporary file, so converting in place is safe. A jsonl_path with a
+    SQLite extension imports the entries into that database instead.
+    Returns the number of migrated entries.
+    """
+    if jsonl_path is None:
+        jsonl_path = os.path.splitext(json_path)[0] + '.jsonl'
+
+    if _is_legacy_json_log(json_path):
+        with open(json_path, 'r') as f:
+            entries = json.load(f)
+    else:
+        entries = list(JSONLStorage(json_path).iter_entries())
+
+    if os.path.splitext(jsonl_path)[1].lower() in SQLITE_EXTENSIONS:
+        storage = SQLiteStorage(jsonl_path)
+        try:
+            return storage.extend(entries)
+        finally:
+            storage.close()
+
+    tmp_path = jsonl_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for log_entry in entries:
+            f.write(json.dumps(log_entry) + '\n')
+    os.replace(tmp_path, jsonl_path)
+
+    return len(entries)
@@ -4,49 +4,215 @@ Based on content.txt: "Forensic Tracing Pipeline: From Detection to Law Enforcem
 Logs and traces malware from detection to investigation
 """
 
-import json
-import hashlib
 import os
 import socket
+import sqlite3
 from datetime import datetime
 import platform
 
+from detection_rollups import DetectionRollups
+from forensic_storage import open_storage, migrate_json_log
+from hashing import EVIDENCE_ALGORITHMS, file_sha256, hash_file, hash_many
+from ioc_store import KNOWN_MALICIOUS, MALICIOUS_VERDICTS
+from similarity_index import SIMILAR_FILES_K, SimilarityIndex
+
+# Sidecar file holding the incrementally maintained verdict rollups
+ROLLUP_SUFFIX = '.rollups.json'
+
+# Entries recorded between rollup sidecar saves (the log tail covers the rest)
+ROLLUP_SAVE_INTERVAL = 1000
+
+# Sidecar directory holding the similarity index of logged files
+SIMILARITY_SUFFIX = '.similarity'
+
 class ForensicTracer:
-    def __init__(self, log_file="forensic_log.json"):
+    """
+    Forensic detection log
+
+    Entries are only ever appended to a storage backend (see
+    forensic_storage): a JSONL file, or an indexed SQLite database when
+    log_file ends in .db. Logging a detection costs the same no matter how
+    long the history is; the history is read lazily, on first access to
+    ``logs``, or searched with query(). Statistics come from ``rollups``,
+    running counters that are updated as entries are recorded and
+    persisted next to the log.
+
+    Each entry records the file's digests under hash_algorithms
+    (SHA-256, which the log is indexed on, plus MD5 and SHA-1 for legacy
+    intel feeds by default), all computed in a single read of the file.
+
+    Entries carrying an LSH signature of the file's features are added to
+    ``similarity``, a similarity_index.SimilarityIndex kept next to the
+    log (unless similarity=False), so find_similar() and STF reports can
+    name previously seen files that resemble a detection.
+    """
+
+    def __init__(self, log_file="forensic_log.jsonl", storage=None,
+                 hash_algorithms=EVIDENCE_ALGORITHMS, hash_threads=None, similarity=True):
         self.log_file = log_file
-        self.logs = []
-        self.load_logs()
+        self.storage = storage if storage is not None else open_storage(log_file)
+        self.hash_algorithms = ('sha256',) + tuple(a for a in hash_algorithms if a != 'sha256')
+        self.hash_threads = hash_threads
+        self._logs = None
+        self._rollups = None
+        self._unsaved_rollups = 0
+        self._appending = False
+        self.similarity_enabled = similarity and self.storage is not None
+        self._similarity = None
+
+    @property
+    def logs(self):
+        """All log entries, loaded from disk on first access"""
+        if self._logs is None:
+            self.load_logs()
+        return self._logs
+
+    @property
+    def rollups(self):
+        """Verdict rollups, brought up to date with the log on first access"""
+        if self._rollups is None:
+            self._rollups = self._load_rollups()
+        return self._rollups
+
+    def _load_rollups(self):
+        """Load the rollup sidecar and replay any log tail it has not seen"""
+        if self.storage is None:
+            return DetectionRollups()
+
+        if self.storage.is_legacy():
+            # Counted in memory only; the sidecar starts once the log is migrated
+            rollups = DetectionRollups()
+            for log_entry in self.iter_logs():
+                rollups.add(log_entry)
+            return rollups
+
+        rollups = DetectionRollups.load(self.storage.path + ROLLUP_SUFFIX)
+        if rollups.catch_up(self.storage):
+            rollups.save()
+        return rollups
+
+    @property
+    def similarity(self):
+        """Similarity index of logged files, opened on first access (None if disabled)"""
+        if self._similarity is None and self.similarity_enabled:
+            self._similarity = self._load_similarity()
+        return self._similarity
+
+    def _load_similarity(self):
+        """Open the similarity sidecar, indexing the existing log when it is new"""
+        index = SimilarityIndex(self.storage.path + SIMILARITY_SUFFIX)
+        if index.created:
+            for log_entry in self.iter_logs():
+                index.add_entry(log_entry)
+        return index
+
+    def _save_rollups(self):
+        """Persist the rollups if entries were recorded since the last save"""
+        if self._rollups is not None and self._unsaved_rollups:
+            self._rollups.save()
+        self._unsaved_rollups = 0
 
     def load_logs(self):
         """Load existing forensic logs"""
-        if os.path.exists(self.log_file):
-            try:
-                with open(self.log_file, 'r') as f:
-                    self.logs = json.load(f)
-            except:
-                self.logs = []
+        self._logs = list(self.iter_logs())
 
-    def save_logs(self):
-        """Save forensic logs to file"""
-        with open(self.log_file, 'w') as f:
-            json.dump(self.logs, f, indent=2)
+    def iter_logs(self):
+        """Stream log entries from storage without holding the history in memory"""
+        if self.storage is None:
+            return iter(())
+        return self.storage.iter_entries()
+
+    def query(self, file_hash=None, verdict=None, detector_type=None, hostname=None,
+              since=None, until=None, path_prefix=None, limit=None):
+        """
+        Lazily yield log entries matching every given filter
+
+        since / until bound the detection timestamp with ISO strings (a
+        date such as '2024-06-01' works; until is exclusive). With SQLite
+        storage each filter is an index lookup.
+        """
+        if self.storage is None:
+            return iter(())
+        return self.storage.query(
+            file_hash=file_hash, verdict=verdict, detector_type=detector_type,
+            hostname=hostname, since=since, until=until, path_prefix=path_prefix,
+            limit=limit
+        )
 
-    def calculate_file_hash(self, filepath):
-        """Calculate SHA256 hash of file"""
-        sha256_hash = hashlib.sha256()
+    def save_logs(self):
+        """Rewrite the whole forensic log from memory (compaction only)"""
+        if self.storage is None:
+            return
+        logs = self.logs
+        self._save_rollups()
+        self.storage.rewrite(logs)
+
+        # Positions changed: rebuild the rollups from the rewritten log
+        self._rollups = None
+        if os.path.exists(self.storage.path + ROLLUP_SUFFIX):
+            os.remove(self.storage.path + ROLLUP_SUFFIX)
+
+    def close(self):
+        """Save the rollups and release the log storage"""
+        self._save_rollups()
+        if self._similarity is not None:
+            self._similarity.close()
+            self._similarity = None
+        if self.storage is not None:
+            self.storage.close()
+
+    def calculate_file_hash(self, filepath, data=None):
+        """Calculate SHA256 hash of file (or of its already-read contents)"""
         try:
-            with open(filepath, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-            return sha256_hash.hexdigest()
-        except:
+            return file_sha256(filepath, data)
+        except OSError:
             return None
 
-    def extract_metadata(self, filepath):
-        """Extract file metadata"""
+    def calculate_file_hashes(self, filepath, data=None, known=None):
+        """
+        {algorithm: hexdigest} of a file for every hash_algorithms entry
+
+        Digests in known (e.g. a SHA-256 the verdict cache already has)
+        are reused; the rest are computed in one pass over data or the
+        file. Digests of an unreadable file are None.
+        """
+        digests = {name: (known or {}).get(name) for name in self.hash_algorithms}
+        missing = [name for name, digest in digests.items() if digest is None]
+        if missing:
+            try:
+                digests.update(hash_file(filepath, missing, data))
+            except OSError:
+                pass
+        return digests
+
+    def calculate_batch_hashes(self, items):
+        """
+        calculate_file_hashes for many (filepath, data, known) items, on
+        hash_threads threads when the batch is large enough to benefit
+        (see hashing.hash_many); returns the digest dicts in order
+        """
+        results = [None] * len(items)
+        groups = {}
+        for i, (filepath, data, known) in enumerate(items):
+            digests = {name: (known or {}).get(name) for name in self.hash_algorithms}
+            results[i] = digests
+            missing = tuple(name for name, digest in digests.items() if digest is None)
+            if missing:
+                groups.setdefault(missing, []).append(i)
+
+        for missing, indices in groups.items():
+            hashed = hash_many([(items[i][0], items[i][1]) for i in indices], missing, self.hash_threads)
+            for i, digests in zip(indices, hashed):
+                if digests is not None:
+                    results[i].update(digests)
+        return results
+
+    def extract_metadata(self, filepath, stat_info=None):
+        """Extract file metadata (from stat_info when the caller already has it)"""
         metadata = {}
         try:
-            stat_info = os.stat(filepath)
+            if stat_info is None:
+                stat_info = os.stat(filepath)
             metadata['file_size'] = stat_info.st_size
             metadata['created_time'] = datetime.fromtimestamp(stat_info.st_ctime).isoformat()
             metadata['modified_time'] = datetime.fromtimestamp(stat_info.st_mtime).isoformat()
@@ -66,9 +232,30 @@ class ForensicTracer:
         }
         return context
 
-    def log_detection(self, filepath, verdict, confidence, detector_type, additional_info=None):
+    def log_detection(self, filepath, verdict, confidence, detector_type, additional_info=None,
+                      file_hash=None, data=None, stat_info=None, file_hashes=None, ioc_matches=None):
         """
         Log malware detection event for forensic analysis
+        """
+        log_entry = self.build_log_entry(filepath, verdict, confidence, detector_type, additional_info,
+                                         file_hash=file_hash, data=data, stat_info=stat_info,
+                                         file_hashes=file_hashes, ioc_matches=ioc_matches)
+        self.record_entry(log_entry)
+        return log_entry
+
+    def build_log_entry(self, filepath, verdict, confidence, detector_type, additional_info=None,
+                        file_hash=None, data=None, stat_info=None, file_hashes=None, ioc_matches=None):
+        """
+        Build a forensic log entry without recording it
+
+        Worker processes build entries next to the file they scanned and
+        hand them to the parent, which is the only writer of the log.
+        Pass file_hash when the SHA-256 is already known (or file_hashes,
+        digests by algorithm) to skip recomputing it, and data / stat_info
+        to reuse a buffer and stat the scanner already holds instead of
+        reopening the file. Any digest still missing is computed in one
+        pass. ioc_matches, the IOC store entries a known_malicious file
+        matched, are recorded with the detection.
 
         Based on content.txt forensic pipeline:
         1. Detection & Quarantine
@@ -77,6 +264,19 @@ class ForensicTracer:
         4. Chain of Custody
         """
 
+        known = dict(file_hashes or {})
+        if file_hash:
+            known['sha256'] = file_hash
+        digests = self.calculate_file_hashes(filepath, data, known)
+
+        file_info = {
+            'original_path': os.path.abspath(filepath),
+            'filename': os.path.basename(filepath)
+        }
+        for name in self.hash_algorithms:
+            file_info[f'file_hash_{name}'] = digests[name]
+        file_info['metadata'] = self.extract_metadata(filepath, stat_info)
+
         # Create forensic log entry
         log_entry = {
             # === Step 1: Detection Information ===
@@ -88,12 +288,7 @@ class ForensicTracer:
             },
 
             # === Step 2: File Metadata (Deep Dive) ===
-            'file_info': {
-                'original_path': os.path.abspath(filepath),
-                'filename': os.path.basename(filepath),
-                'file_hash_sha256': self.calculate_file_hash(filepath),
-                'metadata': self.extract_metadata(filepath)
-            },
+            'file_info': file_info,
 
             # === Step 3: System Context (Recipient Analysis) ===
             'system_context': self.get_system_context(),
@@ -110,12 +305,67 @@ class ForensicTracer:
             'technical_details': additional_info or {}
         }
 
-        # Add to logs
-        self.logs.append(log_entry)
-        self.save_logs()
+        if ioc_matches:
+            log_entry['detection']['ioc_matches'] = ioc_matches
 
         return log_entry
 
+    def record_entry(self, log_entry):
+        """Append a built log entry to the forensic log"""
+        if self._logs is not None:
+            self._logs.append(log_entry)
+
+        if self.storage is None:
+            self.rollups.add(log_entry)
+            return
+
+        if not self._appending:
+            # The first append converts a legacy JSON log, which moves every position
+            if self.storage.is_legacy():
+                migrate_json_log(self.storage.path, self.storage.path)
+                self._rollups = None
+            self._appending = True
+
+        # Count the log's tail rather than just this entry: other processes
+        # may have appended since the rollups last caught up
+        rollups = self.rollups
+        self.storage.append(log_entry)
+        rollups.catch_up(self.storage)
+        self._unsaved_rollups += 1
+        if self._unsaved_rollups >= ROLLUP_SAVE_INTERVAL:
+            self._save_rollups()
+
+        if (log_entry.get('technical_details') or {}).get('lsh_signature'):
+            # The entry is already logged; a failing index must not lose the result
+            try:
+                similarity = self.similarity
+                if similarity is not None:
+                    similarity.add_entry(log_entry)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"Similarity index not updated for "
+                      f"{log_entry['file_info'].get('original_path')}: {e}")
+
+    def find_similar(self, log_entry, k=SIMILAR_FILES_K):
+        """
+        Previously logged files whose features resemble log_entry's file,
+        nearest first (see SimilarityIndex.query)
+        """
+        similarity = self.similarity
+        if similarity is None:
+            return []
+        return similarity.query_entry(log_entry, k)
+
+    def find_similar_to_hash(self, file_hash, k=SIMILAR_FILES_K, detector_type=None):
+        """Previously logged files resembling the logged file with this SHA-256"""
+        similarity = self.similarity
+        if similarity is None:
+            return []
+        found = similarity.signature_of(file_hash, detector_type)
+        if found is None:
+            return []
+        detector_type, signature = found
+        return similarity.query(detector_type, signature, k, exclude_sha256=file_hash)
+
     def generate_stf_report(self, log_entry):
         """
         Generate report for law enforcement (STF/Cyber Cell)
@@ -130,7 +380,8 @@ class ForensicTracer:
                 'file_hash': log_entry['file_info']['file_hash_sha256'],
                 'detection_time': log_entry['detection']['timestamp'],
                 'verdict': log_entry['detection']['verdict'],
-                'confidence': log_entry['detection']['confidence']
+                'confidence': log_entry['detection']['confidence'],
+                'ioc_lists': sorted({match['list'] for match in log_entry['detection'].get('ioc_matches', [])})
             },
 
             # === Chain of Custody ===
@@ -144,17 +395,22 @@ class ForensicTracer:
             # === Technical Artifacts ===
             'technical_artifacts': {
                 'file_hash_sha256': log_entry['file_info']['file_hash_sha256'],
+                'file_hash_md5': log_entry['file_info'].get('file_hash_md5'),
+                'file_hash_sha1': log_entry['file_info'].get('file_hash_sha1'),
                 'original_file_path': log_entry['file_info']['original_path'],
                 'file_size': log_entry['file_info']['metadata'].get('file_size', 'N/A'),
                 'system_hostname': log_entry['system_context']['hostname'],
                 'system_user': log_entry['system_context']['user']
             },
 
+            # === Related Files ===
+            'similar_files': self.find_similar(log_entry),
+
             # === Recommended Actions ===
             'recommended_actions': []
         }
 
-        if log_entry['detection']['verdict'] == 'malicious':
+        if log_entry['detection']['verdict'] in MALICIOUS_VERDICTS:
             report['recommended_actions'] = [
                 'Quarantine file immediately',
                 'Block file hash across network',
@@ -162,9 +418,16 @@ class ForensicTracer:
                 'Check for similar files on system',
                 'Submit hash to VirusTotal for correlation'
             ]
+        if log_entry['detection']['verdict'] == KNOWN_MALICIOUS:
+            report['recommended_actions'].append('Review the blocklist entries the file matched')
 
         return report
 
+    def generate_stf_reports(self, **filters):
+        """Lazily generate STF reports for the entries matching query(**filters)"""
+        for log_entry in self.query(**filters):
+            yield self.generate_stf_report(log_entry)
+
     def print_detection_summary(self, log_entry):
         """Print human-readable detection summary"""
         print("\n" + "="*60)
@@ -176,11 +439,16 @@ class ForensicTracer:
         print(f"  Verdict: {log_entry['detection']['verdict'].upper()}")
         print(f"  Confidence: {log_entry['detection']['confidence']:.2%}")
         print(f"  Detector: {log_entry['detection']['detector_type']}")
+        for match in log_entry['detection'].get('ioc_matches', []):
+            print(f"  IOC match: {match['list']} ({match['algorithm']})")
 
         print(f"\n[FILE INFORMATION]")
         print(f"  Path: {log_entry['file_info']['original_path']}")
         print(f"  Name: {log_entry['file_info']['filename']}")
         print(f"  SHA-256: {log_entry['file_info']['file_hash_sha256']}")
+        for name, label in (('md5', 'MD5'), ('sha1', 'SHA-1')):
+            if log_entry['file_info'].get(f'file_hash_{name}'):
+                print(f"  {label}: {log_entry['file_info'][f'file_hash_{name}']}")
         print(f"  Size: {log_entry['file_info']['metadata'].get('file_size', 'N/A')} bytes")
 
         print(f"\n[SYSTEM CONTEXT]")
@@ -195,17 +463,12 @@ class ForensicTracer:
         print("="*60)
 
     def get_statistics(self):
-        """Get detection statistics"""
-        total = len(self.logs)
-        malicious = sum(1 for log in self.logs if log['detection']['verdict'] == 'malicious')
-        clean = sum(1 for log in self.logs if log['detection']['verdict'] == 'clean')
-
-        return {
-            'total_scans': total,
-            'malicious_detected': malicious,
-            'clean_files': clean,
-            'detection_rate': (malicious / total * 100) if total > 0 else 0
-        }
+        """Get detection statistics (from the rollups, not the full log)"""
+        return self.rollups.get_statistics()
+
+    def get_window_rates(self, window_days=7, verdict=MALICIOUS_VERDICTS):
+        """Count and hourly/daily rate of verdict over the last window_days"""
+        return self.rollups.get_window_rates(window_days, verdict)
 
 
 def demonstrate_forensic_tracer():
@@ -242,12 +505,13 @@ def demonstrate_forensic_tracer():
     print("    - Complete system logs")
     print("    - Forensic timeline")
 
-    print("\n[OUTPUT]: forensic_log.json")
+    tracer = ForensicTracer()
+
+    print(f"\n[OUTPUT]: {tracer.storage.path}")
     print("  → Ready for STF/Cyber Cell investigation")
     print("  → Legally admissible evidence format")
     print("  → Complete audit trail maintained")
 
-    tracer = ForensicTracer()
     return tracer
 
 
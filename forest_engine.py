@@ -0,0 +1,145 @@
+"""
+Forest Engine Module
+Flat-array random forest evaluator for low-latency inference
+Exports a fitted forest to contiguous node arrays and walks them with NumPy
+"""
+
+# Rows evaluated per traversal pass; bounds the (trees x rows) work arrays
+ENGINE_BATCH_ROWS = 1024
+
+
+def _normalizes_leaf_values():
+    """
+    Whether this scikit-learn's DecisionTreeClassifier.predict_proba
+    divides leaf values by their sum: before 1.4 they held weighted class
+    counts; since then they hold the fractions, returned as they are
+    """
+    import sklearn
+
+    major, minor = (int(part) for part in sklearn.__version__.split('.')[:2])
+    return (major, minor) < (1, 4)
+
+
+class ForestEngine:
+    """
+    A fitted scikit-learn forest classifier compiled to flat node arrays
+
+    Every tree's nodes are concatenated into one set of arrays (split
+    feature, threshold, left and right child, leaf class probabilities),
+    with children renumbered to global node indices. Leaves point at
+    themselves, so one traversal step moves every (tree, row) pair down a
+    level at once and max_depth steps reach every leaf, with no Python
+    per tree or per node and none of predict_proba's per-call input
+    validation or joblib dispatch.
+
+    Results are bit-for-bit those of model.predict_proba: rows are cast
+    to float32 and compared with X <= threshold as sklearn's trees do,
+    each leaf's class probabilities are taken as
+    DecisionTreeClassifier.predict_proba takes them (see
+    _normalizes_leaf_values), and the per-tree probabilities
+    are summed in estimator order and divided by the number of trees, as
+    the forest does when it predicts on one job.
+    """
+
+    def __init__(self, model):
+        import numpy as np
+
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators:
+            raise ValueError("ForestEngine needs a fitted forest classifier")
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("ForestEngine supports single-output forests only")
+
+        self.classes_ = model.classes_
+        self.n_classes = int(model.n_classes_)
+        self.n_features = int(model.n_features_in_)
+        self.n_trees = len(estimators)
+
+        trees = [estimator.tree_ for estimator in estimators]
+        sizes = np.array([tree.node_count for tree in trees], dtype=np.intp)
+        self.roots = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.intp)
+        self.max_depth = max(int(tree.max_depth) for tree in trees)
+
+        normalize = _normalizes_leaf_values()
+        features, thresholds, lefts, rights, leaf_proba = [], [], [], [], []
+        for tree, offset in zip(trees, self.roots):
+            nodes = np.arange(tree.node_count, dtype=np.intp) + offset
+            is_leaf = tree.children_left < 0
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left + offset))
+            rights.append(np.where(is_leaf, nodes, tree.children_right + offset))
+
+            proba = tree.value[:, 0, :self.n_classes].astype(np.float64)
+            if normalize:
+                # Each row over its sum (0 sums left alone), as predict_proba did
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+            leaf_proba.append(proba)
+
+        self.feature = np.ascontiguousarray(np.concatenate(features))
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds))
+        self.left = np.ascontiguousarray(np.concatenate(lefts))
+        self.right = np.ascontiguousarray(np.concatenate(rights))
+        self.leaf_proba = np.ascontiguousarray(np.concatenate(leaf_proba))
+        self.n_nodes = len(self.feature)
+
+    def accepts(self, X):
+        """
+        Whether X can be evaluated here; otherwise callers fall back to
+        predict_proba, which raises sklearn's own error (wrong width,
+        NaN or infinity)
+        """
+        import numpy as np
+
+        X = np.asarray(X)
+        return X.ndim == 2 and X.shape[1] == self.n_features and bool(np.isfinite(X).all())
+
+    def apply(self, X):
+        """Global leaf node reached in every tree by every row, as a (n_trees x n_rows) array"""
+        import numpy as np
+
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = len(X)
+        flat = X.ravel()
+        # Offset of each row in flat, broadcast against the per-tree nodes
+        row_base = (np.arange(n_rows, dtype=np.intp) * self.n_features)[np.newaxis, :]
+
+        node = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            go_left = flat[row_base + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X, batch_rows=ENGINE_BATCH_ROWS):
+        """Class probabilities of each row of X, identical to the forest's predict_proba"""
+        import numpy as np
+
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"X has {X.shape[-1] if X.ndim else 0} features, but the forest expects {self.n_features}"
+            )
+
+        proba = np.zeros((len(X), self.n_classes), dtype=np.float64)
+        for start in range(0, len(X), batch_rows):
+            leaves = self.apply(X[start:start + batch_rows])
+            out = proba[start:start + batch_rows]
+            for tree_leaves in leaves:
+                out += self.leaf_proba[tree_leaves]
+        proba /= self.n_trees
+        return proba
+
+
+def compile_forest(model):
+    """ForestEngine for model, or None if it is not a fitted single-output forest classifier"""
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+    if not isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        return None
+    try:
+        return ForestEngine(model)
+    except (ValueError, AttributeError):
+        return None
@@ -0,0 +1,159 @@
+"""
+Hashing Module
+Single-pass multi-digest file hashing shared by the tracer, detectors and cache
+Large buffered reads, caller-supplied buffers and thread fan-out across files
+"""
+
+import hashlib
+import os
+from collections import deque
+
+# Digests identifying a file in the verdict cache, feature store and logs
+SHA256_ONLY = ('sha256',)
+
+# Digests recorded in forensic evidence; MD5 and SHA-1 are what legacy
+# threat intel feeds are keyed on
+EVIDENCE_ALGORITHMS = ('sha256', 'md5', 'sha1')
+
+# Bytes per read() and per digest update. Large enough that hashing a
+# multi-GB file costs a few hundred syscalls, not millions.
+READ_SIZE = 4 * 1024 * 1024
+
+# hash_many only hands work to threads when a batch holds at least this
+# many bytes; below it the pool's overhead outweighs the parallelism
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+# Per-process thread pools by size, recreated after a fork
+_pools = {}
+
+
+def _new_hashers(algorithms):
+    """Fresh hash objects for algorithms, in order"""
+    # MD5 and SHA-1 are file identifiers here, not security controls, which
+    # keeps them available on FIPS-restricted builds
+    return [
+        (name, hashlib.new(name, usedforsecurity=name not in ('md5', 'sha1')))
+        for name in algorithms
+    ]
+
+
+def _update_all(hashers, chunk):
+    for _, hasher in hashers:
+        hasher.update(chunk)
+
+
+def hash_buffer(data, algorithms=SHA256_ONLY):
+    """
+    {algorithm: hexdigest} of a bytes-like buffer (bytes, bytearray,
+    mmap, memoryview), computed in one pass over READ_SIZE slices so
+    every digest reads a slice while it is still in cache
+    """
+    hashers = _new_hashers(algorithms)
+    if len(hashers) == 1 or len(data) <= READ_SIZE:
+        _update_all(hashers, data)
+    else:
+        view = memoryview(data)
+        try:
+            for start in range(0, len(view), READ_SIZE):
+                chunk = view[start:start + READ_SIZE]
+                _update_all(hashers, chunk)
+                chunk.release()
+        finally:
+            view.release()
+    return {name: hasher.hexdigest() for name, hasher in hashers}
+
+
+def hash_file(path, algorithms=SHA256_ONLY, data=None):
+    """
+    {algorithm: hexdigest} of a file, reading it once for every digest
+
+    data, the file's already-read (or memory-mapped) contents, is hashed
+    instead of reopening path. Otherwise the file is read unbuffered in
+    READ_SIZE blocks into one reused buffer, with the kernel told to read
+    ahead sequentially. Raises OSError if the file cannot be read.
+    """
+    if data is not None:
+        return hash_buffer(data, algorithms)
+
+    hashers = _new_hashers(algorithms)
+    with open(path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= READ_SIZE:
+            # One read to end of file
+            _update_all(hashers, f.read())
+        else:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            buffer = bytearray(READ_SIZE)
+            view = memoryview(buffer)
+            try:
+                while True:
+                    n = f.readinto(buffer)
+                    if not n:
+                        break
+                    chunk = view[:n]
+                    _update_all(hashers, chunk)
+                    chunk.release()
+            finally:
+                view.release()
+    return {name: hasher.hexdigest() for name, hasher in hashers}
+
+
+def file_sha256(path, data=None):
+    """SHA-256 hexdigest of a file (or of its already-read contents)"""
+    return hash_file(path, SHA256_ONLY, data)['sha256']
+
+
+def _pool(threads):
+    """This process's thread pool of the given size"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    key = (os.getpid(), threads)
+    pool = _pools.get(key)
+    if pool is None:
+        # A pool inherited through fork has no threads behind it
+        for stale in [k for k in _pools if k[0] != key[0]]:
+            del _pools[stale]
+        pool = _pools[key] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='hashing')
+    return pool
+
+
+def _hash_item(item, algorithms):
+    path, data = item
+    try:
+        return hash_file(path, algorithms, data)
+    except OSError:
+        return None
+
+
+def hash_many(items, algorithms=SHA256_ONLY, threads=None):
+    """
+    Hash many files concurrently, returning their digests in order
+
+    items are (path, data) pairs, data being the file's contents or None
+    to read it from path; each result is a {algorithm: hexdigest} dict, or
+    None for a file that could not be read. hashlib releases the GIL while
+    it digests, so threads (default: one per core, at most 8) hash files
+    in parallel. Batches with under PARALLEL_MIN_BYTES of in-memory
+    buffers and fewer than two files to read are hashed on the calling
+    thread.
+    """
+    items = list(items)
+    if threads is None:
+        threads = min(8, os.cpu_count() or 1)
+
+    in_memory = sum(len(data) for _, data in items if data is not None)
+    from_disk = sum(1 for _, data in items if data is None)
+    if threads <= 1 or len(items) < 2 or (from_disk < 2 and in_memory < PARALLEL_MIN_BYTES):
+        return [_hash_item(item, algorithms) for item in items]
+
+    pool = _pool(threads)
+    results = []
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(_hash_item, item, algorithms))
+        if len(pending) >= threads * 4:
+            results.append(pending.popleft().result())
+    while pending:
+        results.append(pending.popleft().result())
+    return results
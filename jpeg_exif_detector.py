@@ -4,122 +4,220 @@ Based on research: "Detecting Malware in JPEG Files Through EXIF Tag Analysis us
 Detects malware embedded in JPEG EXIF tags using ML features
 """
 
-import os
-import hashlib
-from PIL import Image
-from PIL.ExifTags import TAGS
-import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
+import time
+from detector_base import ForestDetector
+from exif_parser import parse_jpeg_exif
+from feature_schema import JPEG_TAG_NAMES, jpeg_exif_schema
 import json
-from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-class JPEGExifDetector:
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.feature_names = []
-        self.label_encoder = LabelEncoder()
+# numpy and scikit-learn are imported inside the methods that use them,
+# so importing this module (e.g. for --stats) stays cheap.
 
-    def extract_exif_features(self, image_path):
-        """Extract EXIF tag features from JPEG file"""
-        features = {}
+class JPEGExifDetector(ForestDetector):
+    detector_type = 'JPEG_EXIF'
+    file_kind = 'JPEG'
 
+    def __init__(self):
+        super().__init__()
+        self._label_encoder = None
+        self._schema = None
+        self._tag_columns = {}
+
+    @property
+    def label_encoder(self):
+        """Label encoder, created on first use"""
+        if self._label_encoder is None:
+            from sklearn.preprocessing import LabelEncoder
+            self._label_encoder = LabelEncoder()
+        return self._label_encoder
+
+    @property
+    def schema(self):
+        """FeatureSchema of the model (the current JPEG EXIF layout until one is loaded)"""
+        if self._schema is None:
+            self._schema = jpeg_exif_schema()
+        return self._schema
+
+    @schema.setter
+    def schema(self, schema):
+        self._schema = schema
+        self._tag_columns = {}
+
+    def _training_schema(self):
+        """Training always uses the current JPEG EXIF layout"""
+        return jpeg_exif_schema()
+
+    def _columns_for_tag(self, ifd_name, tag_id):
+        """(length column, value column) of an EXIF tag in the schema, compiled once per tag"""
+        key = (ifd_name, tag_id)
+        columns = self._tag_columns.get(key)
+        if columns is None:
+            namespace = 'main' if ifd_name in ('IFD0', 'Exif') else ifd_name
+            name = JPEG_TAG_NAMES.get((namespace, tag_id))
+            if name is None and self.schema.version == 0:
+                # Legacy layouts may name any tag PIL knows
+                from PIL.ExifTags import TAGS, GPSTAGS
+                if ifd_name == 'GPS':
+                    name = GPSTAGS.get(tag_id, f"GPSUnknown_{tag_id}")
+                else:
+                    name = TAGS.get(tag_id, f"Unknown_{tag_id}")
+
+            columns = (None, None)
+            if name is not None:
+                if ifd_name == 'IFD1':
+                    name = f"Thumbnail{name}"
+                index = self.schema.index
+                columns = (index.get(f"{name}_length"), index.get(f"{name}_value"))
+            self._tag_columns[key] = columns
+        return columns
+
+    def extract_into(self, row, image_path, data=None):
+        """
+        Extract EXIF features straight into row, a zeroed row in the
+        schema's layout (see FeatureSchema.allocate)
+
+        Tags without a column of their own are counted in the unknown_tag_*
+        aggregates. data may be the file's already-read (or
+        memory-mapped) contents, in which case image_path is not opened
+        again. Returns (summary, error); summary holds the counts reported
+        in results.
+        """
         try:
+            if data is None:
+                with open(image_path, 'rb') as f:
+                    data = f.read()
+
             # Check if file is valid JPEG (starts with 0xFFD8)
-            with open(image_path, 'rb') as f:
-                header = f.read(2)
-                if header != b'\xff\xd8':
-                    return None, "Not a valid JPEG file"
+            if data[:2] != b'\xff\xd8':
+                return None, "Not a valid JPEG file"
 
-            image = Image.open(image_path)
-            exif_data = image._getexif()
+            exif = parse_jpeg_exif(data)
+            tags = exif['tags']
 
-            if exif_data is None:
+            if not tags:
                 return None, "No EXIF tags found"
 
-            # Extract EXIF tag lengths and values
-            for tag_id, value in exif_data.items():
-                tag_name = TAGS.get(tag_id, f"Unknown_{tag_id}")
-
-                # Feature 1: Tag length
-                if isinstance(value, (str, bytes)):
-                    features[f"{tag_name}_length"] = len(value)
-                elif isinstance(value, (int, float)):
-                    features[f"{tag_name}_value"] = value
-                else:
-                    features[f"{tag_name}_length"] = len(str(value))
+            unknown_count = unknown_length = unknown_max_length = 0
+            total_exif_size = 0
+            distinct = set()
 
-            # Additional suspicious indicators
-            features['exif_tag_count'] = len(exif_data)
-            features['file_size'] = os.path.getsize(image_path)
-            features['image_width'] = image.width
-            features['image_height'] = image.height
+            for ifd_name, tag_id, byte_size, value in tags:
+                length_column, value_column = self._columns_for_tag(ifd_name, tag_id)
+                distinct.add((ifd_name if ifd_name in ('GPS', 'IFD1') else 'main', tag_id, value is None))
 
-            # Check for anomalous EXIF sizes
-            total_exif_size = sum([v for k, v in features.items() if '_length' in k])
-            features['total_exif_size'] = total_exif_size
-            features['exif_to_file_ratio'] = total_exif_size / features['file_size'] if features['file_size'] > 0 else 0
+                # Tag length (raw size in bytes) or scalar value
+                if value is None:
+                    total_exif_size += byte_size
+                    column = length_column
+                else:
+                    column = value_column
+
+                if column is not None:
+                    row[column] = byte_size if value is None else value
+                elif length_column is None and value_column is None:
+                    unknown_count += 1
+                    unknown_length += byte_size
+                    unknown_max_length = max(unknown_max_length, byte_size)
+
+            file_size = len(data)
+            exif_to_file_ratio = total_exif_size / file_size if file_size > 0 else 0
+
+            index = self.schema.index
+            for name, value in (
+                ('unknown_tag_count', unknown_count),
+                ('unknown_tag_length', unknown_length),
+                ('unknown_tag_max_length', unknown_max_length),
+                ('exif_tag_count', len(tags)),
+                ('exif_bad_entries', exif['bad_entries']),
+                ('file_size', file_size),
+                ('image_width', exif['width']),
+                ('image_height', exif['height']),
+                ('total_exif_size', total_exif_size),
+                ('exif_to_file_ratio', exif_to_file_ratio)
+            ):
+                column = index.get(name)
+                if column is not None:
+                    row[column] = value
 
-            return features, None
+            return {
+                'features_extracted': len(distinct) + 7,
+                'exif_tag_count': len(tags),
+                'exif_to_file_ratio': exif_to_file_ratio
+            }, None
 
         except Exception as e:
             return None, str(e)
 
-    def create_feature_vector(self, features_dict):
-        """Convert features dict to fixed-size vector"""
-        # Create consistent feature vector
-        if not self.feature_names:
-            self.feature_names = sorted(features_dict.keys())
-
-        vector = []
-        for fname in self.feature_names:
-            vector.append(features_dict.get(fname, 0))
+    def extract_exif_features(self, image_path, data=None):
+        """
+        Extract EXIF tag features from JPEG file as a {feature name: value}
+        dict of the schema's non-zero features and the summary features
+        """
+        row = self.schema.allocate(1)[0]
+        summary, error = self.extract_into(row, image_path, data)
+        if error:
+            return None, error
 
-        return np.array(vector).reshape(1, -1)
+        features = {self.schema.names[i]: float(row[i]) for i in row.nonzero()[0]}
+        features['exif_tag_count'] = summary['exif_tag_count']
+        features['exif_to_file_ratio'] = summary['exif_to_file_ratio']
+        return features, None
 
-    def train(self, clean_images, malicious_images):
-        """Train the model on clean and malicious JPEG files"""
-        X_train = []
-        y_train = []
+    def create_feature_vector(self, features_dict):
+        """Convert a features dict to a 1xN float32 matrix in the schema's layout"""
+        return self.schema.fill(self.schema.allocate(1)[0], features_dict).reshape(1, -1)
+
+    def train(self, clean_images, malicious_images, feature_store=None, n_jobs=-1):
+        """
+        Train the model on clean and malicious JPEG files
+
+        Features are extracted on n_jobs processes (-1: every core) and
+        the forest is fit on n_jobs cores. Training always uses the
+        current JPEG EXIF schema, which is saved with the model. With
+        feature_store (a directory), extracted features are persisted
+        there (files already stored are not re-extracted) and the model
+        is trained from the store, see build_feature_store.
+        """
+        import numpy as np
+
+        self.schema = self._training_schema()
+
+        if feature_store is not None:
+            store = self.build_feature_store(feature_store, clean_images, malicious_images, n_jobs)
+            try:
+                return self.train_from_store(store, n_jobs)
+            finally:
+                store.close()
 
         print(f"Training on {len(clean_images)} clean and {len(malicious_images)} malicious images...")
 
-        # Process clean images
-        for img_path in clean_images:
-            features, error = self.extract_exif_features(img_path)
-            if features:
-                if not self.feature_names:
-                    self.feature_names = sorted(features.keys())
-                X_train.append(self.create_feature_vector(features).flatten())
-                y_train.append(0)  # Clean
-
-        # Process malicious images
-        for img_path in malicious_images:
-            features, error = self.extract_exif_features(img_path)
-            if features:
-                X_train.append(self.create_feature_vector(features).flatten())
-                y_train.append(1)  # Malicious
-
-        if len(X_train) == 0:
-            raise ValueError("No valid training data extracted")
+        image_paths = list(clean_images) + list(malicious_images)
 
-        X_train = np.array(X_train)
-        y_train = np.array(y_train)
+        # Fill one preallocated matrix instead of stacking per-file rows
+        X_train = self.schema.allocate(len(image_paths))
+        y_train = np.empty(len(image_paths), dtype=np.int64)
+        count = 0
+        position = 0
 
-        print(f"Training with {len(X_train)} samples, {len(self.feature_names)} features")
-        self.model.fit(X_train, y_train)
+        for chunk in self._extraction_chunks(image_paths, n_jobs):
+            for _, row, _ in chunk:
+                if row is not None:
+                    X_train[count] = row
+                    y_train[count] = 0 if position < len(clean_images) else 1
+                    count += 1
+                position += 1
 
-        # Calculate training accuracy
-        train_acc = self.model.score(X_train, y_train)
-        print(f"Training accuracy: {train_acc:.4f}")
+        if count == 0:
+            raise ValueError("No valid training data extracted")
 
-        return train_acc
+        return self._fit(X_train[:count], y_train[:count], n_jobs)
 
-    def predict(self, image_path):
+    def predict(self, image_path, data=None):
         """Predict if image contains malware"""
-        features, error = self.extract_exif_features(image_path)
+        X = self.schema.allocate(1)
+        summary, error = self.extract_into(X[0], image_path, data)
 
         if error:
             return {
@@ -128,32 +226,92 @@ class JPEGExifDetector:
                 'error': error
             }
 
-        if not features:
-            return {
-                'verdict': 'unknown',
-                'confidence': 0.0,
-                'error': 'No features extracted'
-            }
-
-        X = self.create_feature_vector(features)
-        prediction = self.model.predict(X)[0]
-        confidence = self.model.predict_proba(X)[0]
-
-        return {
+        return self._build_result(summary, self._predict_proba(X)[0], signature=self._signatures(X)[0])
+
+    def predict_batch(self, paths, data=None, metrics=None, screen=None):
+        """
+        Predict a batch of files with a single predict_proba call
+
+        Features are extracted straight into one preallocated matrix.
+        data optionally holds each file's already-read contents (or None),
+        aligned with paths. When metrics (a ScanMetrics) is given, feature
+        extraction and inference times are recorded per file. With screen
+        thresholds (see cascade.resolve_thresholds) and a screen model,
+        files whose EXIF summary the screen is confident about skip the
+        forest; the EXIF segment is the only part of the file read either
+        way, so escalated files reuse their extracted row.
+        Returns one result dict per path, in order.
+        """
+        if data is None:
+            data = [None] * len(paths)
+
+        results = [None] * len(paths)
+        X = self.schema.allocate(len(paths))
+        extracted = []
+        screening = screen is not None and self.screen is not None
+
+        for i, path in enumerate(paths):
+            started = time.perf_counter()
+            # Successful rows are packed at the top of X
+            summary, error = self.extract_into(X[len(extracted)], path, data[i])
+            if metrics is not None:
+                metrics.observe('extract_features', time.perf_counter() - started, self.detector_type)
+
+            if error:
+                X[len(extracted)] = 0
+                results[i] = {
+                    'verdict': 'error',
+                    'confidence': 0.0,
+                    'error': error
+                }
+                continue
+
+            if screening:
+                started = time.perf_counter()
+                proba = self.screen.settle(X[len(extracted)], screen)
+                if metrics is not None:
+                    metrics.observe('screen', time.perf_counter() - started, self.detector_type)
+                    metrics.increment('screen_settled' if proba is not None else 'screen_escalated',
+                                      self.detector_type)
+                if proba is not None:
+                    # The row is complete here, so it still gets a signature
+                    signature = self._signatures(X[len(extracted):len(extracted) + 1])[0]
+                    X[len(extracted)] = 0
+                    results[i] = self._build_result(summary, proba, tier='screen', signature=signature)
+                    continue
+
+            extracted.append((i, summary))
+
+        if extracted:
+            started = time.perf_counter()
+            probabilities = self._predict_proba(X[:len(extracted)])
+            if metrics is not None:
+                elapsed = time.perf_counter() - started
+                metrics.observe('predict', elapsed / len(extracted), self.detector_type, len(extracted))
+            hashes = self._signatures(X[:len(extracted)])
+            for (i, summary), proba, signature in zip(extracted, probabilities, hashes):
+                results[i] = self._build_result(summary, proba, signature=signature)
+
+        return results
+
+    def _build_result(self, summary, proba, tier='forest', signature=None):
+        """Turn one row of predict_proba output (from the screen or forest tier) into a result dict"""
+        import numpy as np
+
+        best = int(np.argmax(proba))
+        prediction = self.model.classes_[best]
+
+        result = {
             'verdict': 'malicious' if prediction == 1 else 'clean',
-            'confidence': float(confidence[prediction]),
-            'features_extracted': len(features),
-            'exif_tags': features.get('exif_tag_count', 0),
-            'suspicious_ratio': features.get('exif_to_file_ratio', 0)
+            'confidence': float(proba[best]),
+            'tier': tier,
+            'features_extracted': summary['features_extracted'],
+            'exif_tags': summary['exif_tag_count'],
+            'suspicious_ratio': summary['exif_to_file_ratio']
         }
-
-    def get_file_hash(self, filepath):
-        """Calculate SHA256 hash of file"""
-        sha256_hash = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        if signature is not None:
+            result['lsh_signature'] = signature
+        return result
 
 
 def demonstrate_jpeg_detector():
@@ -181,7 +339,7 @@ def demonstrate_jpeg_detector():
     print("\n[3] Model Training:")
     print("    Algorithm: Random Forest Classifier")
     print("    Expected Accuracy: ~95.9% (from research paper)")
-    print("    Features: 189 structural features")
+    print(f"    Features: {len(detector.feature_names)} EXIF features")
 
     print("\n[4] Detection Capabilities:")
     print("    ✓ Zero-day malware detection")
@@ -4,38 +4,214 @@ Integrates all modules: JPEG EXIF detector, PE file detector, and Forensic trace
 Provides unified interface for file scanning and detection
 """
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import os
 import sys
+import json
 import argparse
+from collections import deque
 from datetime import datetime
 
+from cascade import DEFAULT_SCAN_MODE, SCAN_MODES, resolve_thresholds
 from jpeg_exif_detector import JPEGExifDetector
 from pe_file_detector import PEFileDetector
-from forensic_tracer import ForensicTracer
+from forensic_tracer import ForensicTracer, migrate_json_log
+from hashing import hash_many
+from ioc_store import KNOWN_MALICIOUS, MALICIOUS_VERDICTS, IOCStore, open_ioc_store
+from file_view import open_view
+from file_walker import FileFilter, FileWalker
+from model_store import ModelIntegrityError, read_manifest
+from scan_metrics import ScanMetrics
+
+_IMPORT_FINISHED = time.perf_counter()
+
+# Heavy dependencies are only imported once a detector actually needs them;
+# --startup-profile reports which of them a run ended up loading.
+HEAVY_MODULES = ('numpy', 'sklearn', 'PIL', 'joblib', 'scipy')
+STARTUP_BUDGET_MS = 100.0
+
+# Model artifacts loaded automatically when present
+DEFAULT_JPEG_MODEL = os.path.join('models', 'jpeg_exif.model')
+DEFAULT_PE_MODEL = os.path.join('models', 'pe_miner.model')
+
+# Manifest of previous scans used by incremental directory scans
+DEFAULT_SCAN_MANIFEST = 'scan_manifest.db'
+
+# Hash blocklist checked before the detectors, loaded automatically when present
+DEFAULT_IOC_STORE = 'ioc_store'
+
+# Detector type of verdicts settled by the IOC store
+IOC_DETECTOR = 'IOC'
+
+# Verdicts that get a forensic log entry
+LOGGED_VERDICTS = MALICIOUS_VERDICTS + ('clean',)
 
 
 class MalwareDetectionSystem:
     """Unified malware detection system"""
 
-    def __init__(self):
-        self.jpeg_detector = JPEGExifDetector()
-        self.pe_detector = PEFileDetector()
-        self.tracer = ForensicTracer()
+    def __init__(self, log_file="forensic_log.jsonl", cache_path=None, cache_size=1000000,
+                 jpeg_model=None, pe_model=None, manifest_path=None, mode=DEFAULT_SCAN_MODE,
+                 screen_thresholds=None, ioc_store=None):
+        self.tracer = ForensicTracer(log_file)
+
+        # Scan mode of the detection cascade: 'deep' runs every file through
+        # the full extractor and forest; 'balanced' and 'fast' let each
+        # detector's header screen settle files it is confident about.
+        # screen_thresholds ({'clean': p, 'malicious': p}) overrides the
+        # mode's settle thresholds.
+        self.mode = mode
+        self.screen_thresholds = resolve_thresholds(mode, **(screen_thresholds or {}))
+
+        # Detectors (and their saved models) are loaded on first use, so
+        # --stats and unsupported files never pay for sklearn or numpy.
+        # An explicitly requested model must exist; checking its manifest
+        # here fails fast without loading the forest.
+        self._jpeg_detector = None
+        self._pe_detector = None
+        self._model_paths = {}
+        for file_type, path, default in (
+            ('jpeg', jpeg_model, DEFAULT_JPEG_MODEL),
+            ('pe', pe_model, DEFAULT_PE_MODEL)
+        ):
+            if path is None and os.path.isdir(default):
+                path = default
+            if path is not None:
+                read_manifest(path)
+            self._model_paths[file_type] = path
+
+        # Every file's hash is looked up in the IOC store (a memory-mapped
+        # blocklist, see ioc_store) before any detector runs; a listed file
+        # is settled as known_malicious without feature extraction or ML.
+        # An explicitly requested store must exist; the default one is
+        # used only if a store has been built there.
+        if ioc_store is None:
+            self.ioc_store = open_ioc_store(DEFAULT_IOC_STORE)
+        else:
+            self.ioc_store = IOCStore(ioc_store)
+        self.ioc_path = self.ioc_store.path if self.ioc_store is not None else None
+
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.verdict_cache = None
+        if cache_path:
+            from verdict_cache import VerdictCache
+            self.verdict_cache = VerdictCache(cache_path, cache_size)
+
+        # Opened by the first incremental scan
+        self.manifest_path = manifest_path or DEFAULT_SCAN_MANIFEST
+        self.scan_manifest = None
 
         self.supported_types = {
             'jpeg': ['.jpg', '.jpeg'],
             'pe': ['.exe', '.dll', '.sys']
         }
 
-    def detect_file_type(self, filepath):
+        # Per-stage latency histograms and counters, see get_metrics()
+        self.metrics = ScanMetrics()
+
+    @property
+    def jpeg_detector(self):
+        """JPEG EXIF detector, loaded on first use"""
+        if self._jpeg_detector is None:
+            self._jpeg_detector = JPEGExifDetector()
+            if self._model_paths['jpeg']:
+                self._jpeg_detector.load_model(self._model_paths['jpeg'])
+        return self._jpeg_detector
+
+    @jpeg_detector.setter
+    def jpeg_detector(self, detector):
+        self._jpeg_detector = detector
+
+    @property
+    def pe_detector(self):
+        """PE file detector, loaded on first use"""
+        if self._pe_detector is None:
+            self._pe_detector = PEFileDetector()
+            if self._model_paths['pe']:
+                self._pe_detector.load_model(self._model_paths['pe'])
+        return self._pe_detector
+
+    @pe_detector.setter
+    def pe_detector(self, detector):
+        self._pe_detector = detector
+
+    def _worker_detector(self, file_type):
+        """
+        What a worker needs to rebuild a detector: the saved model's path
+        (reloaded, memory-mapped, in each worker) or the in-memory detector
+        (pickled to each worker once)
+        """
+        detector = self._jpeg_detector if file_type == 'jpeg' else self._pe_detector
+        if detector is None:
+            return self._model_paths[file_type]
+        return detector.model_path or detector
+
+    def model_versions(self):
+        """
+        Current model version per detector type, read from the saved
+        artifact's manifest when the detector has not been loaded yet
+
+        In a screening mode the detectors' versions also name the mode and
+        its thresholds, since a screen verdict depends on them: a later
+        scan in another mode (or deep) rechecks those files.
+
+        With an IOC store, every version (including the IOC store's own
+        and that of unsupported files) carries the store's version, so a
+        blocklist update rechecks files an incremental scan would skip.
+        """
+        versions = {}
+        for file_type, detector_class, detector in (
+            ('jpeg', JPEGExifDetector, self._jpeg_detector),
+            ('pe', PEFileDetector, self._pe_detector)
+        ):
+            if detector is not None:
+                version = detector.model_version
+            elif self._model_paths[file_type]:
+                version = read_manifest(self._model_paths[file_type])['model_version']
+            else:
+                version = 'untrained'
+            if self.screen_thresholds is not None:
+                version = (f"{version}+{self.mode}-{self.screen_thresholds['clean']:g}"
+                           f"-{self.screen_thresholds['malicious']:g}")
+            versions[detector_class.detector_type] = version
+
+        if self.ioc_store is not None:
+            versions = {
+                detector_type: f"{version}+ioc-{self.ioc_store.version}"
+                for detector_type, version in versions.items()
+            }
+            versions[IOC_DETECTOR] = self.ioc_store.version
+            versions['UNKNOWN'] = self.ioc_store.version
+        return versions
+
+    def _worker_initargs(self):
+        """Arguments that rebuild this system's detectors (and scan mode) in a worker"""
+        return (
+            self._worker_detector('jpeg'),
+            self._worker_detector('pe'),
+            self.cache_path,
+            self.cache_size,
+            self.mode,
+            self.screen_thresholds,
+            self.ioc_path
+        )
+
+    def detect_file_type(self, filepath, view=None):
         """Detect file type based on magic bytes and extension"""
         # Check extension first
         ext = os.path.splitext(filepath)[1].lower()
 
         # Read magic bytes
         try:
-            with open(filepath, 'rb') as f:
-                magic = f.read(4)
+            if view is not None:
+                magic = view.data[:4]
+            else:
+                with open(filepath, 'rb') as f:
+                    magic = f.read(4)
 
             # JPEG: FFD8
             if magic[:2] == b'\xff\xd8':
@@ -60,60 +236,348 @@ class MalwareDetectionSystem:
         if not os.path.exists(filepath):
             return {'error': 'File not found', 'path': filepath}
 
-        # Detect file type
-        file_type = self.detect_file_type(filepath)
+        clock = time.perf_counter
+        scan_started = clock()
+
+        # Open and map the file once for every stage of the scan
+        view = open_view(filepath)
+        opened = clock()
+        try:
+            # Detect file type
+            file_type = self.detect_file_type(filepath, view)
+            detected = clock()
+
+            if verbose:
+                print(f"\n{'='*60}")
+                print(f"Scanning: {os.path.basename(filepath)}")
+                print(f"Type: {file_type.upper()}")
+                print(f"{'='*60}")
+
+            result = self.analyze_file(filepath, file_type, view)
+            log_entry = self.build_log_entry(result, view)
+        finally:
+            if view is not None:
+                view.close()
+
+        detector_type = result['detector']
+        self.metrics.observe('open', opened - scan_started, detector_type)
+        self.metrics.observe('detect_type', detected - opened, detector_type)
 
+        # Log to forensic tracer
+        if log_entry is not None:
+            self._record_entry(log_entry, detector_type)
+
+        self.metrics.observe('scan_file', clock() - scan_started, detector_type)
+
+        if log_entry is not None and verbose and result['verdict'] in MALICIOUS_VERDICTS:
+            print("\n⚠️  MALICIOUS FILE DETECTED ⚠️")
+            self.tracer.print_detection_summary(log_entry)
+
+        # Print result
         if verbose:
-            print(f"\n{'='*60}")
-            print(f"Scanning: {os.path.basename(filepath)}")
-            print(f"Type: {file_type.upper()}")
-            print(f"{'='*60}")
+            self.print_scan_result(result)
+
+        return result
 
-        result = None
+    def process_file(self, filepath):
+        """
+        Analyze a file and build its log entry from a single mapping
+
+        Returns (result, log_entry); log_entry is None when the verdict
+        does not need to be logged. Nothing is recorded here.
+        """
+        _, result, log_entry = self.process_batch([filepath])[0]
+        return result, log_entry
+
+    def process_batch(self, paths):
+        """
+        Analyze a batch of files, returning (path, result, log_entry) tuples
+
+        Each file is mapped once; files of the same type share a single
+        model call, and the files that get log entries are hashed together
+        (on threads when the batch is large). Nothing is recorded here.
+        """
+        clock = time.perf_counter
+        views = []
+        open_times = []
+        for filepath in paths:
+            started = clock()
+            views.append(open_view(filepath))
+            open_times.append(clock() - started)
+
+        try:
+            results = self.analyze_batch(paths, views)
+            for result, seconds in zip(results, open_times):
+                self.metrics.observe('open', seconds, result['detector'])
+            hashes = self._hash_batch(results, views)
+            return [
+                (filepath, result, self.build_log_entry(result, view, file_hashes))
+                for filepath, result, view, file_hashes in zip(paths, results, views, hashes)
+            ]
+        finally:
+            for view in views:
+                if view is not None:
+                    view.close()
+
+    def analyze_file(self, filepath, file_type=None, view=None):
+        """Route a file to its detector and return the annotated result"""
+        return self.analyze_batch([filepath], [view], [file_type])[0]
+
+    def analyze_batch(self, paths, views=None, file_types=None):
+        """Route files to their detectors in per-type batches"""
+        if views is None:
+            views = [None] * len(paths)
+        if file_types is None:
+            file_types = [None] * len(paths)
+
+        detectors = {
+            'jpeg': lambda: self.jpeg_detector,
+            'pe': lambda: self.pe_detector
+        }
+
+        clock = time.perf_counter
+        results = [None] * len(paths)
+        detect_times = [None] * len(paths)
+        batches = {}
+        digests = self._ioc_digests(paths, views)
+
+        for i, filepath in enumerate(paths):
+            file_type = file_types[i]
+            if file_type is None:
+                started = clock()
+                file_type = self.detect_file_type(filepath, views[i])
+                detect_times[i] = clock() - started
+
+            matches = self._ioc_lookup(digests[i])
+            if matches:
+                result = {
+                    'verdict': KNOWN_MALICIOUS,
+                    'confidence': 1.0,
+                    'tier': 'ioc',
+                    'ioc_matches': matches
+                }
+                results[i] = self._annotate_result(result, filepath, file_type, IOC_DETECTOR)
+            elif file_type in detectors:
+                batches.setdefault(file_type, []).append(i)
+            else:
+                result = {
+                    'verdict': 'unsupported',
+                    'confidence': 0.0,
+                    'error': f'Unsupported file type: {file_type}'
+                }
+                results[i] = self._annotate_result(result, filepath, file_type, 'UNKNOWN')
 
         # Route to appropriate detector
-        if file_type == 'jpeg':
-            result = self.jpeg_detector.predict(filepath)
-            detector_type = 'JPEG_EXIF'
-        elif file_type == 'pe':
-            result = self.pe_detector.predict(filepath)
-            detector_type = 'PE_MINER'
-        else:
-            result = {
-                'verdict': 'unsupported',
-                'confidence': 0.0,
-                'error': f'Unsupported file type: {file_type}'
-            }
-            detector_type = 'UNKNOWN'
+        for file_type, indices in batches.items():
+            detector = detectors[file_type]()
+            detector_type = detector.detector_type
+            try:
+                predicted = self._predict_cached(
+                    detector,
+                    [paths[i] for i in indices],
+                    [views[i] for i in indices],
+                    [digests[i]['sha256'] if digests[i] is not None else None for i in indices]
+                )
+            except Exception as e:
+                predicted = [
+                    {'verdict': 'error', 'confidence': 0.0, 'error': str(e)}
+                    for _ in indices
+                ]
+
+            for i, result in zip(indices, predicted):
+                results[i] = self._annotate_result(result, paths[i], file_type, detector_type)
+
+        # Digests computed for the IOC check are reused for the log entry
+        for result, file_hashes in zip(results, digests):
+            if file_hashes is not None:
+                result['file_hashes'] = file_hashes
+                result['file_hash_sha256'] = file_hashes['sha256']
+
+        metrics = self.metrics
+        for result, view, seconds in zip(results, views, detect_times):
+            detector_type = result['detector']
+            if seconds is not None:
+                metrics.observe('detect_type', seconds, detector_type)
+            metrics.increment('files_scanned', detector_type)
+            metrics.increment(f"verdict_{result['verdict']}", detector_type)
+            if view is not None:
+                metrics.increment('bytes_scanned', detector_type, view.size)
+
+        return results
+
+    def _ioc_digests(self, paths, views):
+        """
+        Digests of each file for the IOC lookup (None when there is no
+        store or the file cannot be read), computed in one pass per file
+        over the store's algorithms and the tracer's evidence algorithms
+        """
+        if self.ioc_store is None:
+            return [None] * len(paths)
+
+        algorithms = tuple(self.tracer.hash_algorithms) + tuple(
+            algorithm for algorithm in self.ioc_store.algorithms
+            if algorithm not in self.tracer.hash_algorithms
+        )
+        started = time.perf_counter()
+        digests = hash_many(
+            [(filepath, view.data if view is not None else None) for filepath, view in zip(paths, views)],
+            algorithms, self.tracer.hash_threads
+        )
+        if paths:
+            self.metrics.observe('hash', (time.perf_counter() - started) / len(paths), IOC_DETECTOR, len(paths))
+        return digests
 
-        # Add file info
+    def _ioc_lookup(self, file_hashes):
+        """IOC store matches for a file's digests, timed and counted"""
+        if file_hashes is None:
+            return []
+        started = time.perf_counter()
+        matches = self.ioc_store.lookup(file_hashes)
+        self.metrics.observe('ioc_lookup', time.perf_counter() - started, IOC_DETECTOR)
+        if matches:
+            self.metrics.increment('ioc_hits', IOC_DETECTOR)
+        return matches
+
+    def _annotate_result(self, result, filepath, file_type, detector_type):
+        """Add file info to a detector result"""
         result['file_path'] = filepath
         result['file_type'] = file_type
         result['detector'] = detector_type
         result['scan_time'] = datetime.now().isoformat()
+        return result
 
-        # Log to forensic tracer
-        if result['verdict'] in ['malicious', 'clean']:
-            log_entry = self.tracer.log_detection(
-                filepath,
-                result['verdict'],
-                result.get('confidence', 0.0),
-                detector_type,
-                {
-                    'file_type': file_type,
-                    'features_extracted': result.get('features_extracted', 0)
-                }
+    def _predict_cached(self, detector, paths, views, sha256s=None):
+        """
+        Run detector.predict_batch, consulting the verdict cache first
+
+        sha256s optionally holds each file's SHA-256 from the IOC check
+        (or None), so the cache does not hash those files again. Only
+        forest verdicts are cached: they hold in every scan mode,
+        while a screen verdict depends on the mode it was settled under.
+        """
+        data = [view.data if view is not None else None for view in views]
+
+        if self.verdict_cache is None:
+            return detector.predict_batch(paths, data, self.metrics, self.screen_thresholds)
+
+        clock = time.perf_counter
+        detector_type = detector.detector_type
+        results = [None] * len(paths)
+        hashes = []
+        misses = []
+        if sha256s is None:
+            sha256s = [None] * len(paths)
+
+        for i, (filepath, view) in enumerate(zip(paths, views)):
+            started = clock()
+            stat_result = view.stat if view is not None else None
+            file_hash = self.verdict_cache.file_hash(filepath, stat_result, data[i], sha256s[i])
+            hashes.append(file_hash)
+
+            cached = self.verdict_cache.get(file_hash, detector.model_version)
+            self.metrics.observe('cache_lookup', clock() - started, detector_type)
+            if cached is not None:
+                cached['cached'] = True
+                results[i] = cached
+            else:
+                misses.append(i)
+
+        self.metrics.increment('cache_hits', detector_type, len(paths) - len(misses))
+        self.metrics.increment('cache_misses', detector_type, len(misses))
+
+        if misses:
+            predicted = detector.predict_batch(
+                [paths[i] for i in misses],
+                [data[i] for i in misses],
+                self.metrics,
+                self.screen_thresholds
             )
+            for i, result in zip(misses, predicted):
+                if result['verdict'] in ['malicious', 'clean'] and result.get('tier') != 'screen':
+                    self.verdict_cache.put(hashes[i], detector.model_version, result)
+                results[i] = result
 
-            if verbose and result['verdict'] == 'malicious':
-                print("\n⚠️  MALICIOUS FILE DETECTED ⚠️")
-                self.tracer.print_detection_summary(log_entry)
+        for result, file_hash in zip(results, hashes):
+            result['file_hash_sha256'] = file_hash
 
-        # Print result
-        if verbose:
-            self.print_scan_result(result)
+        return results
 
-        return result
+    def _hash_batch(self, results, views):
+        """
+        Evidence digests of the batch's files that get log entries (None
+        for the rest), computed in one pass per file and reusing the
+        SHA-256 from the verdict cache and any digests of the IOC check
+        """
+        hashes = [None] * len(results)
+        needed = [i for i, result in enumerate(results) if result['verdict'] in LOGGED_VERDICTS]
+        if not needed:
+            return hashes
+
+        started = time.perf_counter()
+        digests = self.tracer.calculate_batch_hashes([
+            (
+                results[i]['file_path'],
+                views[i].data if views[i] is not None else None,
+                results[i].get('file_hashes') or {'sha256': results[i].get('file_hash_sha256')}
+            )
+            for i in needed
+        ])
+        elapsed = (time.perf_counter() - started) / len(needed)
+        for i, file_hashes in zip(needed, digests):
+            hashes[i] = file_hashes
+            self.metrics.observe('hash', elapsed, results[i]['detector'])
+        return hashes
+
+    def build_log_entry(self, result, view=None, file_hashes=None):
+        """
+        Build the forensic log entry for a scan result, if it needs one
+
+        file_hashes are the file's digests when already computed (see
+        _hash_batch); otherwise they are computed here, in one pass.
+        """
+        if result['verdict'] not in LOGGED_VERDICTS:
+            return None
+
+        clock = time.perf_counter
+        detector_type = result['detector']
+        data = view.data if view is not None else None
+
+        if file_hashes is None:
+            started = clock()
+            file_hashes = self.tracer.calculate_file_hashes(
+                result['file_path'], data,
+                result.get('file_hashes') or {'sha256': result.get('file_hash_sha256')}
+            )
+            self.metrics.observe('hash', clock() - started, detector_type)
+
+        technical_details = {
+            'file_type': result['file_type'],
+            'features_extracted': result.get('features_extracted', 0)
+        }
+        if result.get('lsh_signature'):
+            technical_details['lsh_signature'] = result['lsh_signature']
+
+        started = clock()
+        log_entry = self.tracer.build_log_entry(
+            result['file_path'],
+            result['verdict'],
+            result.get('confidence', 0.0),
+            detector_type,
+            technical_details,
+            data=data,
+            stat_info=view.stat if view is not None else None,
+            file_hashes=file_hashes,
+            ioc_matches=result.get('ioc_matches')
+        )
+        self.metrics.observe('log_build', clock() - started, detector_type)
+
+        return log_entry
+
+    def _record_entry(self, log_entry, detector_type):
+        """Append a log entry to the forensic log, timing the write"""
+        started = time.perf_counter()
+        self.tracer.record_entry(log_entry)
+        self.metrics.observe('log_write', time.perf_counter() - started, detector_type)
 
     def print_scan_result(self, result):
         """Print formatted scan result"""
@@ -122,50 +586,287 @@ class MalwareDetectionSystem:
         if 'confidence' in result and result['confidence'] > 0:
             print(f"Confidence: {result['confidence']:.2%}")
 
+        if result.get('tier') == 'screen':
+            print(f"Settled by: header screen ({self.mode} mode)")
+        elif result.get('tier') == 'ioc':
+            lists = ', '.join(sorted({match['list'] for match in result['ioc_matches']}))
+            print(f"Settled by: IOC store (listed in {lists})")
+
         if 'error' in result:
             print(f"Error: {result['error']}")
 
-        if result['verdict'] == 'malicious':
+        if result['verdict'] in MALICIOUS_VERDICTS:
             print("\n⚠️  ACTION REQUIRED:")
             print("  • File has been logged for forensic analysis")
             print("  • Recommend quarantine immediately")
-            print("  • Check forensic_log.json for details")
+            if self.tracer.storage is not None:
+                print(f"  • Check {self.tracer.storage.path} for details")
 
         elif result['verdict'] == 'clean':
             print("\n✓ File appears clean")
 
         print(f"\n{'='*60}")
 
-    def scan_directory(self, directory, recursive=False):
-        """Scan all supported files in directory"""
+    def make_file_filter(self, include=None, exclude=None, exclude_dirs=None,
+                         min_size=None, max_size=None, all_files=False):
+        """
+        Directory scan filter: supported extensions only, unless include
+        globs are given or all_files is set (to sniff every file's magic
+        bytes, e.g. for renamed executables)
+        """
+        extensions = None
+        if not include and not all_files:
+            extensions = [ext for exts in self.supported_types.values() for ext in exts]
+        return FileFilter(extensions, include, exclude, exclude_dirs, min_size, max_size)
+
+    def scan_directory(self, directory, recursive=False, workers=1, batch_size=64,
+                       metrics_format=None, metrics_path=None, incremental=False,
+                       file_filter=None):
+        """
+        Scan all supported files in directory
+
+        file_filter (see make_file_filter, the default) rejects files by
+        name and size while walking, so they are never opened or
+        dispatched; they are counted in the summary instead.
+
+        With metrics_format ('json' or 'prometheus') the scan's metrics are
+        exported when it finishes, to metrics_path or stdout. With
+        incremental=True only files that are new, changed, or whose
+        detector's model changed since the last scan (per the scan
+        manifest) are dispatched, and deleted files are reported.
+        """
         results = []
 
         print(f"\n{'='*60}")
         print(f"Scanning Directory: {directory}")
         print(f"Recursive: {recursive}")
+        if workers > 1:
+            print(f"Workers: {workers}")
+        if self.screen_thresholds is not None:
+            print(f"Mode: {self.mode} (screen settles clean >= {self.screen_thresholds['clean']}, "
+                  f"malicious >= {self.screen_thresholds['malicious']})")
+        if incremental:
+            print(f"Incremental: {self.manifest_path}")
         print(f"{'='*60}\n")
 
-        # Get all files
-        if recursive:
-            for root, dirs, files in os.walk(directory):
-                for filename in files:
-                    filepath = os.path.join(root, filename)
-                    result = self.scan_file(filepath, verbose=False)
-                    results.append(result)
-                    self._print_quick_result(filepath, result)
+        walker = FileWalker(file_filter or self.make_file_filter())
+        entries = walker.walk(directory, recursive)
+
+        manifest = None
+        if incremental:
+            if self.scan_manifest is None:
+                from scan_manifest import ScanManifest
+                self.scan_manifest = ScanManifest(self.manifest_path)
+            manifest = self.scan_manifest
+            manifest.begin(directory)
+            versions = self.model_versions()
+            pending_stats = {}
+            paths = self._changed_paths(entries, manifest, versions, pending_stats)
+        else:
+            paths = (entry.path for entry in entries)
+
+        if workers > 1:
+            # Workers analyze and build log entries; the parent stays the
+            # only writer of the forensic log.
+            scanned = self._scan_parallel(paths, workers, batch_size)
         else:
-            for filename in os.listdir(directory):
-                filepath = os.path.join(directory, filename)
-                if os.path.isfile(filepath):
-                    result = self.scan_file(filepath, verbose=False)
-                    results.append(result)
-                    self._print_quick_result(filepath, result)
+            scanned = (
+                item
+                for batch in _chunked(paths, batch_size)
+                for item in self.process_batch(batch)
+            )
+
+        for filepath, result, log_entry in scanned:
+            if log_entry is not None:
+                self._record_entry(log_entry, result['detector'])
+            if manifest is not None:
+                stat_result = pending_stats.pop(filepath, None)
+                if stat_result is not None:
+                    manifest.record(filepath, stat_result, result['detector'],
+                                    versions.get(result['detector']), result['verdict'])
+            results.append(result)
+            self._print_quick_result(filepath, result)
+
+        deleted = None
+        if manifest is not None:
+            deleted = manifest.finish(directory, recursive)
 
         # Print summary
-        self._print_scan_summary(results)
+        self._print_scan_summary(
+            results,
+            unchanged=manifest.unchanged if manifest is not None else None,
+            deleted=deleted,
+            walker=walker
+        )
+
+        if metrics_format:
+            self.export_metrics(metrics_format, metrics_path)
 
         return results
 
+    def watch_directory(self, directory, recursive=True, workers=1, batch_size=64,
+                        debounce=0.5, max_pending=10000, poll_interval=2.0,
+                        use_inotify=True, stop_event=None, file_filter=None):
+        """
+        Scan files as they are written into directory, until interrupted
+
+        Files reported by inotify close-write/moved-to events (or by
+        polling where inotify is unavailable) wait in a bounded debouncer
+        until writes settle for debounce seconds, then go through
+        process_batch, on worker processes when workers > 1. While
+        max_pending paths are waiting, or the workers are saturated, no
+        more events are read, so bursts back up in the kernel queue; an
+        overflow there triggers a lazy rescan of the tree instead.
+        file_filter (see make_file_filter, the default) applies to every
+        reported path, rescans included, as it does to directory scans:
+        names are checked as events arrive, size bounds once writes settle.
+        Returns the number of files scanned.
+        """
+        from file_watcher import open_watcher, Debouncer
+
+        file_filter = file_filter or self.make_file_filter()
+
+        print(f"\n{'='*60}")
+        print(f"Watching Directory: {directory}")
+        print(f"Recursive: {recursive}")
+        print(f"Debounce: {debounce:g}s")
+        if workers > 1:
+            print(f"Workers: {workers}")
+        print(f"{'='*60}\n")
+
+        watcher = open_watcher(directory, recursive, poll_interval, use_inotify)
+        debouncer = Debouncer(debounce, max_pending)
+        print(f"Using {type(watcher).__name__}; press Ctrl+C to stop\n")
+
+        # Our own log writes must not trigger scans
+        own_files = os.path.abspath(self.tracer.log_file) if self.tracer.log_file else None
+
+        executor = None
+        pending = deque()
+        max_in_flight = workers * 4
+        scanned = 0
+        skipped = 0
+
+        def handle(items):
+            for filepath, result, log_entry in items:
+                if log_entry is not None:
+                    self._record_entry(log_entry, result['detector'])
+                self._print_quick_result(filepath, result)
+            return len(items)
+
+        try:
+            if workers > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=self._worker_initargs()
+                )
+
+            while stop_event is None or not stop_event.is_set():
+                # Collect finished batches without blocking
+                while pending and pending[0].done():
+                    scanned += handle(self._collect_chunk(pending.popleft()))
+
+                saturated = debouncer.full() or len(pending) >= max_in_flight
+                wait = debouncer.next_ready_in()
+                timeout = 0.05 if saturated else min(wait if wait is not None else 1.0, 1.0)
+
+                if saturated:
+                    time.sleep(timeout)
+                else:
+                    for path in watcher.read_events(timeout, max_pending - len(debouncer)):
+                        if own_files and os.path.abspath(path).startswith(own_files):
+                            continue
+                        if file_filter.check_path(path, directory, check_size=False) is not None:
+                            skipped += 1
+                            continue
+                        debouncer.add(path)
+
+                room = max_in_flight - len(pending) if executor else None
+                ready = debouncer.pop_ready(limit=room * batch_size if room is not None else None)
+                ready = [path for path in ready if os.path.isfile(path)]
+                if file_filter.needs_stat:
+                    kept = [path for path in ready if file_filter.check_path(path, directory) is None]
+                    skipped += len(ready) - len(kept)
+                    ready = kept
+
+                for batch in _chunked(ready, batch_size):
+                    if executor is not None:
+                        pending.append(executor.submit(_scan_chunk, batch))
+                    else:
+                        scanned += handle(self.process_batch(batch))
+
+        except KeyboardInterrupt:
+            print("\nStopping watch...")
+        finally:
+            while pending:
+                scanned += handle(self._collect_chunk(pending.popleft()))
+            if executor is not None:
+                executor.shutdown()
+            watcher.close()
+
+        print(f"\nWatch stopped: {scanned} files scanned, {debouncer.coalesced} events coalesced, "
+              f"{skipped} skipped by filters")
+        return scanned
+
+    def _iter_directory(self, directory, recursive, file_filter=None):
+        """Yield the files to scan under directory"""
+        walker = FileWalker(file_filter or self.make_file_filter())
+        return walker.paths(directory, recursive)
+
+    def _changed_paths(self, entries, manifest, versions, pending_stats):
+        """
+        Yield the paths of the directory entries the manifest says need
+        scanning
+
+        The entries' cached stat results are kept in pending_stats until
+        the scan records them, which bounds it to the files in flight.
+        """
+        for entry in entries:
+            try:
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            if manifest.needs_scan(entry.path, stat_result, versions):
+                pending_stats[entry.path] = stat_result
+                yield entry.path
+
+    def _scan_parallel(self, paths, workers, chunk_size=64):
+        """
+        Scan paths on a process pool, yielding (path, result, log_entry)
+
+        Paths are sent in chunks to amortize IPC, and at most a few chunks
+        per worker are in flight so huge trees never queue up in memory.
+        Results come back in submission order; each chunk's worker metrics
+        are merged into self.metrics.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        max_in_flight = workers * 4
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=self._worker_initargs()
+        ) as executor:
+            pending = deque()
+
+            for chunk in _chunked(paths, chunk_size):
+                pending.append(executor.submit(_scan_chunk, chunk))
+
+                if len(pending) >= max_in_flight:
+                    yield from self._collect_chunk(pending.popleft())
+
+            while pending:
+                yield from self._collect_chunk(pending.popleft())
+
+    def _collect_chunk(self, future):
+        """Merge a finished chunk's worker metrics and return its items"""
+        items, metrics_snapshot = future.result()
+        self.metrics.merge(metrics_snapshot)
+        return items
+
     def _print_quick_result(self, filepath, result):
         """Print quick one-line result"""
         filename = os.path.basename(filepath)
@@ -173,6 +874,8 @@ class MalwareDetectionSystem:
 
         if verdict == 'malicious':
             print(f"  ❌ {filename:<50} MALICIOUS")
+        elif verdict == KNOWN_MALICIOUS:
+            print(f"  ❌ {filename:<50} KNOWN MALICIOUS (IOC)")
         elif verdict == 'clean':
             print(f"  ✓  {filename:<50} Clean")
         elif verdict == 'unsupported':
@@ -180,10 +883,11 @@ class MalwareDetectionSystem:
         else:
             print(f"  ?  {filename:<50} {verdict}")
 
-    def _print_scan_summary(self, results):
+    def _print_scan_summary(self, results, unchanged=None, deleted=None, walker=None):
         """Print summary of directory scan"""
         total = len(results)
-        malicious = sum(1 for r in results if r['verdict'] == 'malicious')
+        malicious = sum(1 for r in results if r['verdict'] in MALICIOUS_VERDICTS)
+        known = sum(1 for r in results if r['verdict'] == KNOWN_MALICIOUS)
         clean = sum(1 for r in results if r['verdict'] == 'clean')
         unsupported = sum(1 for r in results if r['verdict'] == 'unsupported')
         errors = sum(1 for r in results if 'error' in r)
@@ -193,20 +897,160 @@ class MalwareDetectionSystem:
         print(f"{'='*60}")
         print(f"Total files scanned: {total}")
         print(f"Malicious detected:  {malicious}")
+        if self.ioc_store is not None:
+            print(f"  Known (IOC store):  {known}")
         print(f"Clean files:         {clean}")
         print(f"Unsupported:         {unsupported}")
         print(f"Errors:              {errors}")
 
+        if walker is not None and (walker.skipped or walker.pruned_dirs):
+            reasons = ', '.join(f"{reason}: {count}" for reason, count in sorted(walker.skipped.items()))
+            print(f"Filtered (skipped):  {walker.skipped_total}" + (f" ({reasons})" if reasons else ""))
+            if walker.pruned_dirs:
+                print(f"Pruned directories:  {walker.pruned_dirs}")
+        if self.screen_thresholds is not None:
+            self._print_tier_rates(results)
+        if unchanged is not None:
+            print(f"Unchanged (skipped): {unchanged}")
+        if deleted is not None:
+            print(f"Deleted since last:  {len(deleted)}")
+            for path in deleted[:10]:
+                print(f"  - {path}")
+            if len(deleted) > 10:
+                print(f"  ... and {len(deleted) - 10} more")
+
         if malicious > 0:
             print(f"\n⚠️  {malicious} MALICIOUS FILE(S) DETECTED!")
-            print("Check forensic_log.json for detailed analysis")
+            if self.tracer.storage is not None:
+                print(f"Check {self.tracer.storage.path} for detailed analysis")
 
         print(f"{'='*60}\n")
 
+    def _print_tier_rates(self, results):
+        """Print, per detector, the share of verdicts settled by each cascade tier"""
+        tiers = ('screen', 'forest', 'cache')
+        counts = {}
+        for result in results:
+            if result.get('cached'):
+                tier = 'cache'
+            elif 'tier' in result:
+                tier = result['tier']
+            else:
+                continue
+            by_tier = counts.setdefault(result['detector'], dict.fromkeys(tiers, 0))
+            by_tier[tier] += 1
+
+        print(f"Tier hit rates ({self.mode}):")
+        for detector_type, by_tier in sorted(counts.items()):
+            total = sum(by_tier.values())
+            rates = '  '.join(
+                f"{tier} {by_tier[tier] / total:6.1%}" for tier in tiers
+                if tier != 'cache' or by_tier[tier]
+            )
+            print(f"  {detector_type:<10} {rates}  ({total} files)")
+
+    def close(self):
+        """Flush and close the forensic log, scan manifest, verdict cache and IOC store"""
+        self.tracer.close()
+        if self.ioc_store is not None:
+            self.ioc_store.close()
+            self.ioc_store = None
+        if self.scan_manifest is not None:
+            self.scan_manifest.close()
+            self.scan_manifest = None
+        if self.verdict_cache is not None:
+            self.verdict_cache.close()
+            self.verdict_cache = None
+
     def get_statistics(self):
         """Get detection statistics from forensic logs"""
         return self.tracer.get_statistics()
 
+    def query_logs(self, **filters):
+        """Lazily yield forensic log entries matching filters (see ForensicTracer.query)"""
+        return self.tracer.query(**filters)
+
+    def find_similar(self, file_hash, k=10):
+        """Previously logged files resembling the logged file with this SHA-256"""
+        return self.tracer.find_similar_to_hash(file_hash, k)
+
+    def get_window_rates(self, window_days=7, verdict=MALICIOUS_VERDICTS):
+        """Detection rate of verdict over the last window_days"""
+        return self.tracer.get_window_rates(window_days, verdict)
+
+    def get_metrics(self):
+        """Per-stage latency and counters for scans run by this system"""
+        return self.metrics.get_metrics()
+
+    def export_metrics(self, fmt='json', path=None):
+        """Write the metrics as 'json' or 'prometheus' text to path or stdout"""
+        text = self.metrics.export(fmt)
+        if path:
+            with open(path, 'w') as f:
+                f.write(text)
+            print(f"Metrics written to {path}")
+        else:
+            print(text)
+        return text
+
+
+# Per-process detection system used by scan_directory workers
+_worker_system = None
+
+
+def _build_worker_system(jpeg_detector, pe_detector, cache_path, cache_size,
+                         mode=DEFAULT_SCAN_MODE, screen_thresholds=None, ioc_store=None):
+    """
+    Build a log-less detection system for a worker
+
+    Each detector is passed as a trained instance, as the path of its
+    saved model artifact, or as None for a fresh untrained detector.
+    """
+    system = MalwareDetectionSystem(
+        log_file=None,
+        cache_path=cache_path,
+        cache_size=cache_size,
+        jpeg_model=jpeg_detector if isinstance(jpeg_detector, str) else None,
+        pe_model=pe_detector if isinstance(pe_detector, str) else None,
+        mode=mode,
+        screen_thresholds=screen_thresholds,
+        ioc_store=ioc_store
+    )
+    if jpeg_detector is not None and not isinstance(jpeg_detector, str):
+        system.jpeg_detector = jpeg_detector
+    if pe_detector is not None and not isinstance(pe_detector, str):
+        system.pe_detector = pe_detector
+    return system
+
+
+def _init_worker(*initargs):
+    """Load the detectors once per worker process (initargs from _worker_initargs)"""
+    global _worker_system
+    _worker_system = _build_worker_system(*initargs)
+
+
+def _scan_chunk(paths):
+    """
+    Analyze a chunk of files inside a worker process
+
+    Returns (items, metrics_snapshot); the worker's metrics are reset so
+    the parent merges every observation exactly once.
+    """
+    items = _worker_system.process_batch(paths)
+    return items, _worker_system.metrics.drain()
+
+
+def _chunked(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
 def main():
     """Main entry point with CLI"""
@@ -216,6 +1060,7 @@ def main():
 
     parser.add_argument(
         'path',
+        nargs='?',
         help='File or directory to scan'
     )
 
@@ -231,11 +1076,246 @@ def main():
         help='Show detection statistics'
     )
 
+    parser.add_argument(
+        '--window-days',
+        type=int,
+        default=7,
+        help='With --stats, also report malicious detections over the last N days (default: 7)'
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Scan directories on N worker processes (default: 1)'
+    )
+
+    parser.add_argument(
+        '-b', '--batch-size',
+        type=int,
+        default=64,
+        help='Files per model call when scanning directories (default: 64)'
+    )
+
+    parser.add_argument(
+        '--jpeg-model',
+        metavar='DIR',
+        help=f'Saved JPEG EXIF model artifact (default: {DEFAULT_JPEG_MODEL} if present)'
+    )
+
+    parser.add_argument(
+        '--pe-model',
+        metavar='DIR',
+        help=f'Saved PE model artifact (default: {DEFAULT_PE_MODEL} if present)'
+    )
+
+    cascade = parser.add_argument_group('scan mode')
+    cascade.add_argument('--mode', choices=list(SCAN_MODES), default=DEFAULT_SCAN_MODE,
+                         help='fast/balanced: a header-only screen settles confident files and only '
+                              'ambiguous ones reach the full extractor and forest; deep: every file '
+                              f'gets the full model (default: {DEFAULT_SCAN_MODE})')
+    cascade.add_argument('--screen-clean-threshold', type=float, metavar='P',
+                         help='Screen confidence needed to settle a file as clean (overrides the mode)')
+    cascade.add_argument('--screen-malicious-threshold', type=float, metavar='P',
+                         help='Screen confidence needed to settle a file as malicious (overrides the mode)')
+
+    ioc = parser.add_argument_group('IOC store')
+    ioc.add_argument('--ioc-store', metavar='DIR',
+                     help='Hash blocklist checked before the detectors; listed files are reported '
+                          f'as known_malicious (default: {DEFAULT_IOC_STORE} if present)')
+    ioc.add_argument('--ioc-import', action='append', metavar='NAME=PATH',
+                     help='Load a text list of SHA-256/SHA-1/MD5 hashes into the IOC store as list '
+                          'NAME, replacing any list of that name (repeatable)')
+
+    walk = parser.add_argument_group('directory filters')
+    walk.add_argument('--include', action='append', metavar='GLOB',
+                      help='Only scan files matching GLOB (repeatable; replaces the default '
+                           'supported-extension filter)')
+    walk.add_argument('--exclude', action='append', metavar='GLOB',
+                      help='Skip files matching GLOB (repeatable)')
+    walk.add_argument('--exclude-dir', action='append', metavar='GLOB',
+                      help='Do not descend into directories matching GLOB (repeatable)')
+    walk.add_argument('--min-size', type=int, metavar='BYTES', help='Skip files smaller than BYTES')
+    walk.add_argument('--max-size', type=int, metavar='BYTES', help='Skip files larger than BYTES')
+    walk.add_argument('--all-files', action='store_true',
+                      help='Sniff every file instead of only supported extensions')
+
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep watching the directory and scan files as they are written (Linux inotify, '
+             'polling elsewhere)'
+    )
+
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=0.5,
+        help='With --watch, seconds a file must stay unchanged before it is scanned (default: 0.5)'
+    )
+
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        default=2.0,
+        help='With --watch, seconds between polls when inotify is unavailable (default: 2.0)'
+    )
+
+    parser.add_argument(
+        '--max-pending',
+        type=int,
+        default=10000,
+        help='With --watch, most files waiting to be scanned before events back up (default: 10000)'
+    )
+
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only scan files that are new or changed since the last directory scan'
+    )
+
+    parser.add_argument(
+        '--manifest',
+        metavar='DB_PATH',
+        help=f'Scan manifest used by --incremental (default: {DEFAULT_SCAN_MANIFEST})'
+    )
+
+    parser.add_argument(
+        '--cache',
+        metavar='DB_PATH',
+        help='Reuse verdicts for unchanged files from this cache database'
+    )
+
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=1000000,
+        help='Maximum number of cached verdicts (default: 1000000)'
+    )
+
+    parser.add_argument(
+        '--log',
+        metavar='PATH',
+        help='Forensic log to write and query; a .db path uses the indexed '
+             'SQLite backend (default: forensic_log.jsonl)'
+    )
+
+    parser.add_argument(
+        '--migrate-log',
+        metavar='JSON_LOG',
+        help='Convert a legacy forensic_log.json into the JSONL log format '
+             '(or import a log into the --log database)'
+    )
+
+    query = parser.add_argument_group('log queries')
+    query.add_argument('--find-hash', metavar='SHA256', help='Log entries for this file hash')
+    query.add_argument('--find-verdict', help='Log entries with this verdict (e.g. malicious)')
+    query.add_argument('--find-detector', help='Log entries from this detector (JPEG_EXIF, PE_MINER)')
+    query.add_argument('--find-host', metavar='HOSTNAME', help='Log entries from this host')
+    query.add_argument('--since', metavar='ISO_TIME', help='Detections at or after this time (e.g. 2024-06-01)')
+    query.add_argument('--until', metavar='ISO_TIME', help='Detections before this time')
+    query.add_argument('--path-prefix', metavar='PREFIX', help='Files whose original path starts with PREFIX')
+    query.add_argument('--limit', type=int, help='Return at most N matching entries')
+    query.add_argument('--stf-report', action='store_true',
+                       help='Print an STF report (JSON) for each matching entry')
+    query.add_argument('--similar', metavar='SHA256',
+                       help='Previously logged files whose features resemble this logged file')
+    query.add_argument('--similar-k', type=int, default=10, metavar='K',
+                       help='With --similar, return the K nearest files (default: 10)')
+
+    parser.add_argument(
+        '--metrics',
+        choices=['json', 'prometheus'],
+        help='Export per-stage scan metrics in this format when the scan finishes'
+    )
+
+    parser.add_argument(
+        '--metrics-file',
+        metavar='PATH',
+        help='Write --metrics output to PATH instead of stdout'
+    )
+
+    parser.add_argument(
+        '--startup-profile',
+        action='store_true',
+        help=f'Report import and startup time against the {STARTUP_BUDGET_MS:.0f} ms budget'
+    )
+
     args = parser.parse_args()
+    timings = [('imports', _IMPORT_FINISHED - _IMPORT_STARTED)]
+    stage_started = _IMPORT_FINISHED
+
+    def mark(stage):
+        nonlocal stage_started
+        now = time.perf_counter()
+        timings.append((stage, now - stage_started))
+        stage_started = now
+
+    mark('argument parsing')
+
+    if args.migrate_log:
+        count = migrate_json_log(args.migrate_log, args.log)
+        print(f"Migrated {count} log entries from {args.migrate_log}")
+        return
+
+    if args.ioc_import:
+        _import_ioc_lists(parser, args.ioc_store or DEFAULT_IOC_STORE, args.ioc_import)
+        return
+
+    args.query = {
+        key: value for key, value in (
+            ('file_hash', args.find_hash),
+            ('verdict', args.find_verdict),
+            ('detector_type', args.find_detector),
+            ('hostname', args.find_host),
+            ('since', args.since),
+            ('until', args.until),
+            ('path_prefix', args.path_prefix)
+        ) if value is not None
+    }
+
+    if not args.stats and not args.query and not args.similar and not args.path:
+        parser.error('the following arguments are required: path')
+
+    screen_thresholds = {
+        verdict: value for verdict, value in (
+            ('clean', args.screen_clean_threshold),
+            ('malicious', args.screen_malicious_threshold)
+        ) if value is not None
+    }
 
     # Initialize system
-    system = MalwareDetectionSystem()
+    try:
+        system = MalwareDetectionSystem(
+            log_file=args.log or "forensic_log.jsonl",
+            cache_path=args.cache,
+            cache_size=args.cache_size,
+            jpeg_model=args.jpeg_model,
+            pe_model=args.pe_model,
+            manifest_path=args.manifest,
+            mode=args.mode,
+            screen_thresholds=screen_thresholds,
+            ioc_store=args.ioc_store
+        )
+    except ModelIntegrityError as e:
+        print(f"\nError: Cannot load model: {e}")
+        sys.exit(1)
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+
+    mark('system init')
+
+    try:
+        _run(args, system)
+    finally:
+        system.close()
+        mark('stats' if args.stats else 'query' if args.query or args.similar else 'scan')
+        if args.startup_profile:
+            _print_startup_profile(timings)
+
 
+def _run(args, system):
+    """Run the operation selected on the command line"""
     print("\n" + "="*60)
     print("  MALWARE DETECTION SYSTEM")
     print("  ML-Based Zero-Day Detection")
@@ -247,20 +1327,124 @@ def main():
         print("\n[DETECTION STATISTICS]")
         print(f"  Total scans: {stats['total_scans']}")
         print(f"  Malicious detected: {stats['malicious_detected']}")
+        if stats['known_malicious']:
+            print(f"  Known malicious (IOC store): {stats['known_malicious']}")
         print(f"  Clean files: {stats['clean_files']}")
-        print(f"  Detection rate: {stats['detection_rate']:.2f}%\n")
+        print(f"  Detection rate: {stats['detection_rate']:.2f}%")
+
+        for detector, counts in sorted(stats['by_detector'].items()):
+            print(f"  {detector}: {sum(counts.values())} scans, "
+                  f"{sum(counts.get(verdict, 0) for verdict in MALICIOUS_VERDICTS)} malicious")
+
+        if args.window_days > 0:
+            window = system.get_window_rates(args.window_days)
+            print(f"\n  Last {window['window_days']} days: {window['count']} malicious "
+                  f"({window['per_hour']:.2f}/hour, {window['per_day']:.2f}/day)")
+            for detector, count in sorted(window['by_detector'].items()):
+                print(f"    {detector}: {count}")
+        print()
+        return
+
+    if args.query:
+        _print_query_results(system, args)
+        return
+
+    if args.similar:
+        _print_similar_files(system, args.similar, args.similar_k)
         return
 
     # Scan path
     if os.path.isfile(args.path):
         system.scan_file(args.path)
+        if args.metrics:
+            system.export_metrics(args.metrics, args.metrics_file)
+    elif os.path.isdir(args.path) and args.watch:
+        system.watch_directory(args.path, args.recursive, workers=args.workers,
+                               batch_size=args.batch_size, debounce=args.debounce,
+                               max_pending=args.max_pending, poll_interval=args.poll_interval,
+                               file_filter=system.make_file_filter(
+                                   args.include, args.exclude, args.exclude_dir,
+                                   args.min_size, args.max_size, args.all_files))
     elif os.path.isdir(args.path):
-        system.scan_directory(args.path, args.recursive)
+        system.scan_directory(args.path, args.recursive, workers=args.workers,
+                              batch_size=args.batch_size, metrics_format=args.metrics,
+                              metrics_path=args.metrics_file, incremental=args.incremental,
+                              file_filter=system.make_file_filter(
+                                  args.include, args.exclude, args.exclude_dir,
+                                  args.min_size, args.max_size, args.all_files))
     else:
         print(f"\nError: Path not found: {args.path}")
         sys.exit(1)
 
 
+def _import_ioc_lists(parser, path, imports):
+    """Build the IOC store at path from --ioc-import NAME=PATH lists"""
+    from ioc_store import build_ioc_store
+
+    sources = {}
+    for item in imports:
+        name, sep, list_path = item.partition('=')
+        if not sep or not name or not list_path:
+            parser.error(f"--ioc-import expects NAME=PATH, got {item}")
+        if not os.path.isfile(list_path):
+            parser.error(f"IOC list not found: {list_path}")
+        sources[name] = list_path
+
+    started = time.perf_counter()
+    manifest = build_ioc_store(path, sources)
+    print(f"IOC store {path} (version {manifest['version']}), built in {time.perf_counter() - started:.1f}s")
+    print(f"  Lists: {', '.join(manifest['lists'])}")
+    for algorithm, count in sorted(manifest['counts'].items()):
+        print(f"  {algorithm}: {count} hashes")
+
+
+def _print_query_results(system, args):
+    """Print the log entries (or their STF reports) matching the query flags"""
+    print("\n[LOG QUERY]")
+    for key, value in args.query.items():
+        print(f"  {key}: {value}")
+    print()
+
+    matches = 0
+    for log_entry in system.query_logs(limit=args.limit, **args.query):
+        matches += 1
+        if args.stf_report:
+            print(json.dumps(system.tracer.generate_stf_report(log_entry), indent=2))
+            continue
+        detection = log_entry['detection']
+        file_info = log_entry['file_info']
+        print(f"  {detection['timestamp']}  {detection['verdict']:<10} {detection['detector_type']:<10} "
+              f"{(file_info['file_hash_sha256'] or '')[:16]}  {file_info['original_path']}")
+
+    print(f"\n  {matches} matching entr{'y' if matches == 1 else 'ies'}\n")
+
+
+def _print_similar_files(system, file_hash, k):
+    """Print the logged files nearest to a logged file in the similarity index"""
+    print(f"\n[SIMILAR FILES] {file_hash}\n")
+    matches = system.find_similar(file_hash, k)
+    for match in matches:
+        print(f"  {match['distance']:>3} bits  {match['similarity']:.1%}  {match['verdict'] or '':<10} "
+              f"{match['sha256'][:16]}  {match['path']}")
+    print(f"\n  {len(matches)} similar file{'' if len(matches) == 1 else 's'}\n")
+
+
+def _print_startup_profile(timings):
+    """Print per-stage startup timings and the heavy modules that got loaded"""
+    startup_ms = sum(seconds for stage, seconds in timings if stage in
+                     ('imports', 'argument parsing', 'system init')) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    print("\n[STARTUP PROFILE]")
+    for stage, seconds in timings:
+        print(f"  {stage:<18} {seconds * 1000:9.2f} ms")
+    print(f"  {'startup total':<18} {startup_ms:9.2f} ms "
+          f"({'within' if startup_ms <= STARTUP_BUDGET_MS else 'OVER'} "
+          f"{STARTUP_BUDGET_MS:.0f} ms budget)")
+    print(f"  Heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+    print("  (run with python -X importtime for a per-module breakdown)\n")
+
+
 if __name__ == "__main__":
     if len(sys.argv) == 1:
         # Demo mode
@@ -271,7 +1455,18 @@ if __name__ == "__main__":
         print("\nUsage:")
         print("  python main_detector.py <file_or_directory>")
         print("  python main_detector.py <directory> -r    # Recursive scan")
+        print("  python main_detector.py <directory> -r -w 8  # Scan on 8 processes")
         print("  python main_detector.py --stats           # Show statistics")
+        print("  python main_detector.py --migrate-log forensic_log.json")
+        print("  python main_detector.py --log forensic_log.db --find-verdict malicious --since 2024-06-01")
+        print("  python main_detector.py --similar <sha256>             # Files resembling a logged file")
+        print("  python main_detector.py --ioc-import feed=hashes.txt  # Load a hash blocklist")
+        print("  python main_detector.py <file> --startup-profile")
+        print("  python main_detector.py <directory> -r --metrics prometheus")
+        print("  python main_detector.py <directory> -r --incremental  # Skip unchanged files")
+        print("  python main_detector.py <directory> -r --watch        # Scan files as they land")
+        print("  python main_detector.py <directory> -r --exclude-dir .git --max-size 50000000")
+        print("  python main_detector.py <directory> -r --mode fast  # Header screen first")
 
         print("\nExamples:")
         print("  python main_detector.py suspicious.exe")
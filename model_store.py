@@ -0,0 +1,182 @@
+"""
+Model Store Module
+Versioned on-disk artifacts for trained detector models
+Lets the scanner start from a saved forest instead of retraining per run
+"""
+
+import hashlib
+import json
+import os
+import platform
+from datetime import datetime
+
+MODEL_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+FOREST_FILE = 'forest.joblib'
+
+# Manifest fields that decide what a model predicts; their digest is the
+# artifact's checksum and model_version
+PAYLOAD_FIELDS = ('detector_type', 'feature_names', 'feature_schema', 'screen', 'files')
+
+
+class ModelIntegrityError(ValueError):
+    """Raised when a model artifact is missing, corrupt or incompatible"""
+
+
+def _file_sha256(path):
+    """SHA-256 of a file on disk"""
+    sha256_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for byte_block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256_hash.update(byte_block)
+    return sha256_hash.hexdigest()
+
+
+def payload_sha256(manifest):
+    """SHA-256 of the canonical JSON of a manifest's PAYLOAD_FIELDS"""
+    payload = {field: manifest.get(field) for field in PAYLOAD_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def save_model(path, detector_type, model, feature_names, metadata=None, schema=None, screen=None):
+    """
+    Save a trained model as a versioned artifact directory
+
+    The directory holds the forest (an uncompressed joblib pickle, so its
+    arrays can be memory-mapped on load) and a manifest with the format
+    version, the frozen feature_names, the versioned feature schema (a
+    FeatureSchema, when given), the cascade's screen model (a
+    cascade.ScreenModel, when given), training metadata and the forest's
+    SHA-256. The payload checksum covers the forest's digest, the screen
+    and the schema, and model_version is derived from it, so retraining
+    either tier changes the version. Returns the manifest.
+    """
+    import joblib
+    import sklearn
+
+    os.makedirs(path, exist_ok=True)
+
+    forest_path = os.path.join(path, FOREST_FILE)
+    tmp_path = forest_path + '.tmp'
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, forest_path)
+
+    manifest = {
+        'format_version': MODEL_FORMAT_VERSION,
+        'detector_type': detector_type,
+        'feature_names': list(feature_names),
+        'feature_schema': schema.to_dict() if schema is not None else None,
+        'screen': screen.to_dict() if screen is not None else None,
+        'files': {
+            FOREST_FILE: _file_sha256(forest_path)
+        },
+        'metadata': dict(metadata or {}),
+        'environment': {
+            'saved_at': datetime.now().isoformat(),
+            'python_version': platform.python_version(),
+            'sklearn_version': sklearn.__version__
+        }
+    }
+    # Round-trip through JSON so the digest is of exactly what is stored
+    manifest = json.loads(json.dumps(manifest))
+    manifest['payload_sha256'] = payload_sha256(manifest)
+    manifest['model_version'] = manifest['payload_sha256'][:16]
+
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    return manifest
+
+
+def read_manifest(path):
+    """Read and validate an artifact's manifest without loading the forest"""
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ModelIntegrityError(f"Unreadable model manifest {manifest_path}: {e}")
+
+    if manifest.get('format_version') != MODEL_FORMAT_VERSION:
+        raise ModelIntegrityError(
+            f"Unsupported model format {manifest.get('format_version')} "
+            f"(expected {MODEL_FORMAT_VERSION})"
+        )
+
+    return manifest
+
+
+def load_model(path, detector_type=None, mmap=True, verify=True):
+    """
+    Load a model artifact, returning (model, manifest)
+
+    The manifest's payload checksum and the forest's checksum are
+    verified before the forest is unpickled, and detector_type (when given) must match the artifact.
+    With mmap=True the forest's arrays are memory-mapped read-only, so
+    processes loading the same artifact share its pages.
+    """
+    import joblib
+
+    manifest = read_manifest(path)
+
+    if detector_type is not None and manifest['detector_type'] != detector_type:
+        raise ModelIntegrityError(
+            f"Model at {path} is for {manifest['detector_type']}, not {detector_type}"
+        )
+
+    forest_path = os.path.join(path, FOREST_FILE)
+    if verify:
+        # Artifacts saved before the payload checksum only carry the forest's
+        if 'payload_sha256' in manifest and payload_sha256(manifest) != manifest['payload_sha256']:
+            raise ModelIntegrityError(f"Checksum mismatch for {os.path.join(path, MANIFEST_FILE)}")
+        try:
+            checksum = _file_sha256(forest_path)
+        except OSError as e:
+            raise ModelIntegrityError(f"Missing model file {forest_path}: {e}")
+        if checksum != manifest['files'][FOREST_FILE]:
+            raise ModelIntegrityError(f"Checksum mismatch for {forest_path}")
+
+    model = joblib.load(forest_path, mmap_mode='r' if mmap else None)
+
+    return model, manifest
+
+
+def load_schema(manifest):
+    """
+    The FeatureSchema a model was trained with
+
+    Artifacts saved before schemas were recorded get a legacy (version 0)
+    schema built from their feature_names.
+    """
+    from feature_schema import FeatureSchema
+
+    state = manifest.get('feature_schema')
+    if state is None:
+        return FeatureSchema(manifest['detector_type'], manifest['feature_names'], 0)
+
+    try:
+        schema = FeatureSchema.from_dict(state)
+    except (KeyError, ValueError) as e:
+        raise ModelIntegrityError(f"Invalid feature schema in model manifest: {e}")
+    if list(schema.names) != manifest['feature_names'] or schema.detector_type != manifest['detector_type']:
+        raise ModelIntegrityError("Model manifest feature_names do not match its feature schema")
+    return schema
+
+
+def load_screen(manifest, schema):
+    """
+    The cascade screen saved with a model, resolved in schema, or None
+    for artifacts saved without one (their files always escalate)
+    """
+    from cascade import ScreenModel
+
+    state = manifest.get('screen')
+    if state is None:
+        return None
+
+    try:
+        return ScreenModel.from_dict(state, schema)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ModelIntegrityError(f"Invalid screen model in model manifest: {e}")
@@ -0,0 +1,85 @@
+"""
+Parallel Extract Module
+Fans training-time feature extraction out across a process pool
+Chunked, bounded in flight, with progress and throughput reporting
+"""
+
+import os
+import time
+from collections import deque
+
+# Files per task sent to a worker; amortizes IPC and pickling
+DEFAULT_CHUNK_SIZE = 64
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+
+def resolve_n_jobs(n_jobs):
+    """Number of processes for n_jobs (None or -1: every core, -2: all but one, ...)"""
+    cpus = os.cpu_count() or 1
+    if n_jobs is None or n_jobs == 0:
+        return cpus
+    if n_jobs < 0:
+        return max(1, cpus + 1 + n_jobs)
+    return n_jobs
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def map_chunks(func, items, n_jobs=-1, chunk_size=DEFAULT_CHUNK_SIZE, description='files', args=()):
+    """
+    Yield func(chunk, *args) for consecutive chunks of items, in order
+
+    With more than one job the chunks run on a process pool (func and
+    args must be picklable), at most a few chunks per worker in flight.
+    Inputs too small to fill two chunks run inline. Progress and
+    throughput are printed every PROGRESS_INTERVAL seconds and at the end.
+    """
+    n_jobs = resolve_n_jobs(n_jobs)
+    total = len(items)
+    done = 0
+    started = last_report = time.perf_counter()
+
+    def report(final=False):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed > 0 else 0
+        end = '\n' if final else '\r'
+        print(f"  Extracting {description}: {done}/{total} ({rate:.0f} files/s)", end=end, flush=True)
+
+    def progress(chunk):
+        nonlocal done, last_report
+        done += len(chunk)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            report()
+
+    if n_jobs <= 1 or total < 2 * chunk_size:
+        for chunk in _chunks(items, chunk_size):
+            yield func(chunk, *args)
+            progress(chunk)
+        report(final=True)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    print(f"  Extracting {description} on {n_jobs} processes")
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        for chunk in _chunks(items, chunk_size):
+            pending.append((chunk, executor.submit(func, chunk, *args)))
+            if len(pending) >= n_jobs * 4:
+                chunk, future = pending.popleft()
+                yield future.result()
+                progress(chunk)
+
+        while pending:
+            chunk, future = pending.popleft()
+            yield future.result()
+            progress(chunk)
+
+    report(final=True)
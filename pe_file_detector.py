@@ -4,149 +4,143 @@ Based on research: "PE-Miner: Mining Structural Information to Detect Malicious
 Analyzes PE file structure to detect malware with >99% accuracy
 """
 
-import os
-import struct
-import hashlib
-import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.tree import DecisionTreeClassifier
-from datetime import datetime
+import time
+import model_store
+from detector_base import ForestDetector
+from pe_parser import PE_FEATURE_NAMES, HEADER_FEATURE_NAMES, FEATURE_INDEX, parse_pe, parse_pe_headers
+from feature_schema import pe_schema
 import json
 
-class PEFileDetector:
+# numpy and scikit-learn are imported inside the methods that use them,
+# so importing this module (e.g. for --stats) stays cheap.
+
+class PEFileDetector(ForestDetector):
+    detector_type = 'PE_MINER'
+    file_kind = 'PE'
+
     def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.feature_names = []
+        super().__init__()
+        self.schema = pe_schema()
+
+    def _training_schema(self):
+        """Training always uses the current PE layout"""
+        return pe_schema()
+
+    def extract_into(self, row, pe_path, data=None):
+        """
+        Extract structural features straight into row, a row in the
+        schema's layout (see FeatureSchema.allocate)
+
+        Returns (features, error): features is the parsed vector as Python
+        floats (exact, for reporting; row holds it as float32). data may
+        be the file's already-read (or memory-mapped) contents.
+        """
+        try:
+            if data is None:
+                with open(pe_path, 'rb') as f:
+                    data = f.read()
+
+            features = parse_pe(data)
+            row[:] = features
+            return features, None
 
-    def extract_pe_features(self, pe_path):
-        """Extract structural features from PE file"""
-        features = {}
+        except Exception as e:
+            return None, str(e)
 
+    def screen_into(self, row, pe_path, data=None):
+        """
+        Header-only counterpart of extract_into for the cascade's screen:
+        fills only the COFF and optional header fields and the derived
+        features (see pe_parser.parse_pe_headers)
+        """
         try:
-            with open(pe_path, 'rb') as f:
-                # Check DOS header (MZ signature)
-                dos_header = f.read(2)
-                if dos_header != b'MZ':
-                    return None, "Not a valid PE file (missing MZ signature)"
-
-                # Read DOS header
-                f.seek(0)
-                dos_magic = f.read(64)
-
-                # Get PE header offset
-                f.seek(0x3C)
-                pe_offset = struct.unpack('<I', f.read(4))[0]
-
-                # Read PE signature
-                f.seek(pe_offset)
-                pe_sig = f.read(4)
-                if pe_sig != b'PE\x00\x00':
-                    return None, "Invalid PE signature"
-
-                # COFF File Header (20 bytes)
-                coff_header = f.read(20)
-                machine = struct.unpack('<H', coff_header[0:2])[0]
-                num_sections = struct.unpack('<H', coff_header[2:4])[0]
-                timestamp = struct.unpack('<I', coff_header[4:8])[0]
-                num_symbols = struct.unpack('<I', coff_header[12:16])[0]
-
-                features['machine_type'] = machine
-                features['num_sections'] = num_sections
-                features['timestamp'] = timestamp
-                features['num_symbols'] = num_symbols
-
-                # Optional Header
-                opt_header_size = struct.unpack('<H', coff_header[16:18])[0]
-                characteristics = struct.unpack('<H', coff_header[18:20])[0]
-                features['characteristics'] = characteristics
-
-                if opt_header_size > 0:
-                    opt_header = f.read(min(opt_header_size, 224))
-
-                    if len(opt_header) >= 28:
-                        magic = struct.unpack('<H', opt_header[0:2])[0]
-                        major_linker = struct.unpack('<B', opt_header[2:3])[0]
-                        minor_linker = struct.unpack('<B', opt_header[3:4])[0]
-                        size_of_code = struct.unpack('<I', opt_header[4:8])[0]
-                        size_of_init_data = struct.unpack('<I', opt_header[8:12])[0]
-                        size_of_uninit_data = struct.unpack('<I', opt_header[12:16])[0]
-                        entry_point = struct.unpack('<I', opt_header[16:20])[0]
-
-                        features['magic'] = magic
-                        features['major_linker_version'] = major_linker
-                        features['minor_linker_version'] = minor_linker
-                        features['size_of_code'] = size_of_code
-                        features['size_of_init_data'] = size_of_init_data
-                        features['size_of_uninit_data'] = size_of_uninit_data
-                        features['entry_point'] = entry_point
-
-                # Calculate derived features
-                features['file_size'] = os.path.getsize(pe_path)
-                features['sections_per_kb'] = num_sections / (features['file_size'] / 1024) if features['file_size'] > 0 else 0
-                features['code_to_file_ratio'] = features.get('size_of_code', 0) / features['file_size'] if features['file_size'] > 0 else 0
-
-                # Suspicious indicators
-                features['is_dll'] = 1 if (characteristics & 0x2000) else 0
-                features['is_executable'] = 1 if (characteristics & 0x0002) else 0
-                features['timestamp_suspicious'] = 1 if timestamp > 2000000000 or timestamp < 1000000000 else 0
+            if data is None:
+                with open(pe_path, 'rb') as f:
+                    data = f.read()
 
+            features = parse_pe_headers(data)
+            row[:] = features
             return features, None
 
         except Exception as e:
             return None, str(e)
 
-    def create_feature_vector(self, features_dict):
-        """Convert features dict to fixed-size vector"""
-        if not self.feature_names:
-            self.feature_names = sorted(features_dict.keys())
+    def extract_pe_features(self, pe_path, data=None):
+        """
+        Extract structural features from PE file
 
-        vector = []
-        for fname in self.feature_names:
-            vector.append(features_dict.get(fname, 0))
+        Returns a fixed-layout vector aligned with feature_names
+        (see pe_parser.PE_FEATURE_NAMES). data may be the file's
+        already-read (or memory-mapped) contents, in which case pe_path
+        is not opened again.
+        """
+        import numpy as np
 
-        return np.array(vector).reshape(1, -1)
+        try:
+            if data is None:
+                with open(pe_path, 'rb') as f:
+                    data = f.read()
 
-    def train(self, clean_executables, malicious_executables):
-        """Train the model on clean and malicious PE files"""
-        X_train = []
-        y_train = []
+            return np.array(parse_pe(data)), None
+
+        except Exception as e:
+            return None, str(e)
+
+    def create_feature_vector(self, features):
+        """Convert a feature vector (or legacy features dict) to a 1xN float32 matrix"""
+        X = self.schema.allocate(1)
+        if isinstance(features, dict):
+            self.schema.fill(X[0], features)
+        else:
+            X[0] = features
+        return X
+
+    def train(self, clean_executables, malicious_executables, feature_store=None, n_jobs=-1):
+        """
+        Train the model on clean and malicious PE files
+
+        Features are extracted on n_jobs processes (-1: every core) and
+        the forest is fit on n_jobs cores. With feature_store (a
+        directory), extracted features are persisted there (files already
+        stored are not re-extracted) and the model is trained from the
+        store, see build_feature_store.
+        """
+        import numpy as np
+
+        if feature_store is not None:
+            store = self.build_feature_store(feature_store, clean_executables, malicious_executables, n_jobs)
+            try:
+                return self.train_from_store(store, n_jobs)
+            finally:
+                store.close()
 
         print(f"Training on {len(clean_executables)} clean and {len(malicious_executables)} malicious executables...")
 
-        # Process clean executables
-        for pe_path in clean_executables:
-            features, error = self.extract_pe_features(pe_path)
-            if features:
-                if not self.feature_names:
-                    self.feature_names = sorted(features.keys())
-                X_train.append(self.create_feature_vector(features).flatten())
-                y_train.append(0)  # Clean
-
-        # Process malicious executables
-        for pe_path in malicious_executables:
-            features, error = self.extract_pe_features(pe_path)
-            if features:
-                X_train.append(self.create_feature_vector(features).flatten())
-                y_train.append(1)  # Malicious
-
-        if len(X_train) == 0:
-            raise ValueError("No valid training data extracted")
+        pe_paths = list(clean_executables) + list(malicious_executables)
 
-        X_train = np.array(X_train)
-        y_train = np.array(y_train)
+        # Fill one preallocated matrix instead of stacking per-file rows
+        X_train = self.schema.allocate(len(pe_paths))
+        y_train = np.empty(len(pe_paths), dtype=np.int64)
+        count = 0
+        position = 0
 
-        print(f"Training with {len(X_train)} samples, {len(self.feature_names)} features")
-        self.model.fit(X_train, y_train)
+        for chunk in self._extraction_chunks(pe_paths, n_jobs):
+            for _, row, _ in chunk:
+                if row is not None:
+                    X_train[count] = row
+                    y_train[count] = 0 if position < len(clean_executables) else 1
+                    count += 1
+                position += 1
 
-        # Calculate training accuracy
-        train_acc = self.model.score(X_train, y_train)
-        print(f"Training accuracy: {train_acc:.4f}")
+        if count == 0:
+            raise ValueError("No valid training data extracted")
 
-        return train_acc
+        return self._fit(X_train[:count], y_train[:count], n_jobs)
 
-    def predict(self, pe_path):
+    def predict(self, pe_path, data=None):
         """Predict if PE file is malicious"""
-        features, error = self.extract_pe_features(pe_path)
+        X = self.schema.allocate(1)
+        features, error = self.extract_into(X[0], pe_path, data)
 
         if error:
             return {
@@ -155,36 +149,105 @@ class PEFileDetector:
                 'error': error
             }
 
-        if not features:
-            return {
-                'verdict': 'unknown',
-                'confidence': 0.0,
-                'error': 'No features extracted'
-            }
-
-        X = self.create_feature_vector(features)
-        prediction = self.model.predict(X)[0]
-        confidence = self.model.predict_proba(X)[0]
-
-        return {
+        return self._build_result(features, self._predict_proba(X)[0], signature=self._signatures(X)[0])
+
+    def predict_batch(self, paths, data=None, metrics=None, screen=None):
+        """
+        Predict a batch of files with a single predict_proba call
+
+        Features are parsed straight into one preallocated matrix.
+        data optionally holds each file's already-read contents (or None),
+        aligned with paths. When metrics (a ScanMetrics) is given, feature
+        extraction and inference times are recorded per file. With screen
+        thresholds (see cascade.resolve_thresholds) and a screen model,
+        each file's headers are screened first and files the screen is
+        confident about skip the full parse and the forest. Those results
+        carry no lsh_signature, so they are not added to the similarity
+        index: their row holds only the header fields.
+        Returns one result dict per path, in order.
+        """
+        if data is None:
+            data = [None] * len(paths)
+
+        results = [None] * len(paths)
+        X = self.schema.allocate(len(paths))
+        extracted = []
+        screening = screen is not None and self.screen is not None
+
+        for i, path in enumerate(paths):
+            if screening:
+                started = time.perf_counter()
+                features, error = self.screen_into(X[len(extracted)], path, data[i])
+                proba = self.screen.settle(X[len(extracted)], screen) if not error else None
+                X[len(extracted)] = 0
+                if metrics is not None:
+                    metrics.observe('screen', time.perf_counter() - started, self.detector_type)
+                    metrics.increment('screen_settled' if proba is not None else 'screen_escalated',
+                                      self.detector_type)
+                if proba is not None:
+                    # No signature: one of a header-only row would not be
+                    # comparable with the full rows the forest tier signs
+                    results[i] = self._build_result(features, proba, tier='screen')
+                    continue
+
+            started = time.perf_counter()
+            # Successful rows are packed at the top of X
+            features, error = self.extract_into(X[len(extracted)], path, data[i])
+            if metrics is not None:
+                metrics.observe('extract_features', time.perf_counter() - started, self.detector_type)
+
+            if error:
+                results[i] = {
+                    'verdict': 'error',
+                    'confidence': 0.0,
+                    'error': error
+                }
+            else:
+                extracted.append((i, features))
+
+        if extracted:
+            started = time.perf_counter()
+            probabilities = self._predict_proba(X[:len(extracted)])
+            if metrics is not None:
+                elapsed = time.perf_counter() - started
+                metrics.observe('predict', elapsed / len(extracted), self.detector_type, len(extracted))
+            hashes = self._signatures(X[:len(extracted)])
+            for (i, features), proba, signature in zip(extracted, probabilities, hashes):
+                results[i] = self._build_result(features, proba, signature=signature)
+
+        return results
+
+    def _build_result(self, features, proba, tier='forest', signature=None):
+        """Turn one row of predict_proba output (from the screen or forest tier) into a result dict"""
+        import numpy as np
+
+        best = int(np.argmax(proba))
+        prediction = self.model.classes_[best]
+
+        result = {
             'verdict': 'malicious' if prediction == 1 else 'clean',
-            'confidence': float(confidence[prediction]),
-            'features_extracted': len(features),
-            'num_sections': features.get('num_sections', 0),
-            'timestamp': features.get('timestamp', 0),
+            'confidence': float(proba[best]),
+            'tier': tier,
+            # A screened file's row holds only its header fields
+            'features_extracted': len(HEADER_FEATURE_NAMES) if tier == 'screen' else len(features),
+            'num_sections': int(features[FEATURE_INDEX['num_sections']]),
+            'timestamp': int(features[FEATURE_INDEX['timestamp']]),
             'suspicious_indicators': {
-                'suspicious_timestamp': bool(features.get('timestamp_suspicious', 0)),
-                'code_ratio': features.get('code_to_file_ratio', 0)
+                'suspicious_timestamp': bool(features[FEATURE_INDEX['timestamp_suspicious']]),
+                'code_ratio': float(features[FEATURE_INDEX['code_to_file_ratio']])
             }
         }
+        if signature is not None:
+            result['lsh_signature'] = signature
+        return result
 
-    def get_file_hash(self, filepath):
-        """Calculate SHA256 hash of file"""
-        sha256_hash = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+    def load_model(self, path):
+        """Load a model artifact saved by save_model (checksum-verified)"""
+        if model_store.read_manifest(path)['feature_names'] != list(PE_FEATURE_NAMES):
+            raise model_store.ModelIntegrityError(
+                f"Model at {path} was trained on a different PE feature layout; retrain it"
+            )
+        return super().load_model(path)
 
 
 def demonstrate_pe_detector():
@@ -195,7 +258,7 @@ def demonstrate_pe_detector():
 
     detector = PEFileDetector()
 
-    print("\n[1] PE File Structural Analysis Features (189 total):")
+    print(f"\n[1] PE File Structural Analysis Features ({len(PE_FEATURE_NAMES)} total):")
     print("    ┌─ COFF File Header:")
     print("    │  ✓ Machine type, # of sections, timestamp, # of symbols")
     print("    ├─ Optional Header:")
@@ -0,0 +1,338 @@
+"""
+PE Parser Module
+Zero-copy structural parser for the PE-Miner feature set
+Covers COFF, optional header (PE32/PE32+), data directories, section
+table, imported DLLs and resource directory counts
+"""
+
+import struct
+
+# Precompiled layouts, all read with unpack_from straight off the buffer
+DOS_LFANEW = struct.Struct('<I')
+COFF_HEADER = struct.Struct('<HHIIIHH')
+OPT_STANDARD_PE32 = struct.Struct('<HBBIIIIII')
+OPT_STANDARD_PE32_PLUS = struct.Struct('<HBBIIIII')
+OPT_WINDOWS_PE32 = struct.Struct('<IIIHHHHHHIIIIHHIIIIII')
+OPT_WINDOWS_PE32_PLUS = struct.Struct('<QIIHHHHHHIIIIHHQQQQII')
+DATA_DIRECTORY = struct.Struct('<II')
+SECTION_HEADER = struct.Struct('<8sIIIIIIHHI')
+IMPORT_DESCRIPTOR = struct.Struct('<IIIII')
+RESOURCE_DIRECTORY = struct.Struct('<IIHHHH')
+RESOURCE_ENTRY = struct.Struct('<II')
+
+PE32_MAGIC = 0x10B
+PE32_PLUS_MAGIC = 0x20B
+
+# Hard bounds against malformed or hostile files
+MAX_SECTIONS = 96
+MAX_IMPORT_DESCRIPTORS = 1024
+MAX_DLL_NAME = 256
+MAX_RESOURCE_ENTRIES = 4096
+
+COFF_FIELDS = (
+    'machine_type', 'num_sections', 'timestamp', 'pointer_to_symbol_table',
+    'num_symbols', 'size_of_optional_header', 'characteristics'
+)
+
+OPTIONAL_STANDARD_FIELDS = (
+    'magic', 'major_linker_version', 'minor_linker_version', 'size_of_code',
+    'size_of_init_data', 'size_of_uninit_data', 'entry_point', 'base_of_code',
+    'base_of_data'
+)
+
+OPTIONAL_WINDOWS_FIELDS = (
+    'image_base', 'section_alignment', 'file_alignment', 'major_os_version',
+    'minor_os_version', 'major_image_version', 'minor_image_version',
+    'major_subsystem_version', 'minor_subsystem_version', 'win32_version_value',
+    'size_of_image', 'size_of_headers', 'checksum', 'subsystem',
+    'dll_characteristics', 'size_of_stack_reserve', 'size_of_stack_commit',
+    'size_of_heap_reserve', 'size_of_heap_commit', 'loader_flags',
+    'number_of_rva_and_sizes'
+)
+
+DATA_DIRECTORIES = (
+    'export', 'import', 'resource', 'exception', 'security', 'basereloc',
+    'debug', 'architecture', 'globalptr', 'tls', 'load_config',
+    'bound_import', 'iat', 'delay_import', 'clr'
+)
+
+SECTIONS = ('text', 'data', 'rsrc')
+
+SECTION_FIELDS = (
+    'virtual_size', 'virtual_address', 'size_of_raw_data', 'pointer_to_raw_data',
+    'pointer_to_relocations', 'pointer_to_linenumbers', 'number_of_relocations',
+    'number_of_linenumbers', 'characteristics'
+)
+
+# Resource type IDs counted in the resource directory
+RESOURCE_TYPES = (
+    (1, 'cursor'), (2, 'bitmap'), (3, 'icon'), (4, 'menu'), (5, 'dialog'),
+    (6, 'string'), (7, 'fontdir'), (8, 'font'), (9, 'accelerator'),
+    (10, 'rcdata'), (11, 'messagetable'), (12, 'group_cursor'),
+    (14, 'group_icon'), (16, 'version'), (17, 'dlginclude'), (19, 'plugplay'),
+    (20, 'vxd'), (21, 'anicursor'), (22, 'aniicon'), (23, 'html'),
+    (24, 'manifest')
+)
+
+# DLLs tracked as binary "is imported" features
+TRACKED_DLLS = (
+    'KERNEL32.DLL', 'USER32.DLL', 'GDI32.DLL', 'ADVAPI32.DLL', 'SHELL32.DLL',
+    'OLE32.DLL', 'OLEAUT32.DLL', 'COMCTL32.DLL', 'COMDLG32.DLL', 'WSOCK32.DLL',
+    'WS2_32.DLL', 'WININET.DLL', 'WINHTTP.DLL', 'URLMON.DLL', 'NETAPI32.DLL',
+    'MPR.DLL', 'RASAPI32.DLL', 'IPHLPAPI.DLL', 'DNSAPI.DLL', 'WINMM.DLL',
+    'VERSION.DLL', 'SHLWAPI.DLL', 'NTDLL.DLL', 'MSVCRT.DLL', 'MSVCP60.DLL',
+    'MSVCR71.DLL', 'MSVCR80.DLL', 'MSVCR90.DLL', 'MSVCR100.DLL', 'MSVCR110.DLL',
+    'MSVCR120.DLL', 'VCRUNTIME140.DLL', 'MSVCP140.DLL', 'UCRTBASE.DLL',
+    'MFC42.DLL', 'MSVBVM60.DLL', 'MSCOREE.DLL', 'CRYPT32.DLL', 'WINTRUST.DLL',
+    'SECUR32.DLL', 'RPCRT4.DLL', 'SETUPAPI.DLL', 'PSAPI.DLL', 'USERENV.DLL',
+    'WTSAPI32.DLL', 'IMM32.DLL', 'WINSPOOL.DRV', 'GDIPLUS.DLL', 'UXTHEME.DLL',
+    'DWMAPI.DLL', 'SHFOLDER.DLL', 'OLEACC.DLL', 'MSIMG32.DLL', 'OPENGL32.DLL',
+    'GLU32.DLL', 'DDRAW.DLL', 'D3D9.DLL', 'DSOUND.DLL', 'DINPUT8.DLL',
+    'AVICAP32.DLL', 'MSACM32.DLL', 'MSVFW32.DLL', 'HAL.DLL', 'NTOSKRNL.EXE',
+    'WLDAP32.DLL', 'ODBC32.DLL', 'MSI.DLL', 'SFC.DLL', 'IMAGEHLP.DLL',
+    'DBGHELP.DLL', 'POWRPROF.DLL', 'CABINET.DLL', 'PDH.DLL'
+)
+
+DERIVED_FIELDS = (
+    'file_size', 'sections_per_kb', 'code_to_file_ratio', 'is_dll',
+    'is_executable', 'timestamp_suspicious'
+)
+
+# Fixed feature layout returned by parse_pe
+PE_FEATURE_NAMES = (
+    COFF_FIELDS
+    + OPTIONAL_STANDARD_FIELDS
+    + OPTIONAL_WINDOWS_FIELDS
+    + tuple(f'dd_{name}_{part}' for name in DATA_DIRECTORIES for part in ('rva', 'size'))
+    + tuple(f'{section}_{field}' for section in SECTIONS for field in SECTION_FIELDS)
+    + tuple(f'res_{name}' for _, name in RESOURCE_TYPES)
+    + tuple('dll_' + dll.rsplit('.', 1)[0].lower() for dll in TRACKED_DLLS)
+    + DERIVED_FIELDS
+)
+
+FEATURE_INDEX = {name: i for i, name in enumerate(PE_FEATURE_NAMES)}
+
+# Columns parse_pe_headers fills; the rest of its row stays zero
+HEADER_FEATURE_NAMES = (
+    COFF_FIELDS
+    + OPTIONAL_STANDARD_FIELDS
+    + OPTIONAL_WINDOWS_FIELDS
+    + tuple(f'dd_{name}_{part}' for name in DATA_DIRECTORIES for part in ('rva', 'size'))
+    + DERIVED_FIELDS
+)
+
+_COFF_AT = FEATURE_INDEX['machine_type']
+_STANDARD_AT = FEATURE_INDEX['magic']
+_WINDOWS_AT = FEATURE_INDEX['image_base']
+_DATA_DIR_AT = FEATURE_INDEX['dd_export_rva']
+_SECTION_AT = {section: FEATURE_INDEX[f'{section}_virtual_size'] for section in SECTIONS}
+_SECTION_NAMES = {f'.{section}'.encode(): section for section in SECTIONS}
+_RESOURCE_AT = {type_id: FEATURE_INDEX[f'res_{name}'] for type_id, name in RESOURCE_TYPES}
+_DLL_AT = {
+    dll.encode(): FEATURE_INDEX['dll_' + dll.rsplit('.', 1)[0].lower()]
+    for dll in TRACKED_DLLS
+}
+
+
+class PEParseError(ValueError):
+    """Raised when a buffer is not a parseable PE file"""
+
+
+def _rva_to_offset(rva, sections, size):
+    """Map an RVA to a file offset through the section table"""
+    for virtual_address, virtual_size, raw_pointer, raw_size in sections:
+        if virtual_address <= rva < virtual_address + max(virtual_size, raw_size):
+            offset = rva - virtual_address + raw_pointer
+            return offset if offset < size else None
+    # RVAs below the first section live in the headers
+    if sections and rva < sections[0][0] and rva < size:
+        return rva
+    return None
+
+
+def _parse_imports(data, offset, sections, row):
+    """Flag tracked DLLs named by the import descriptor table at offset"""
+    size = len(data)
+
+    for _ in range(MAX_IMPORT_DESCRIPTORS):
+        if offset + IMPORT_DESCRIPTOR.size > size:
+            break
+        descriptor = IMPORT_DESCRIPTOR.unpack_from(data, offset)
+        if not any(descriptor):
+            break
+        offset += IMPORT_DESCRIPTOR.size
+
+        name_offset = _rva_to_offset(descriptor[3], sections, size)
+        if name_offset is None:
+            continue
+        name_end = data.find(b'\x00', name_offset, min(name_offset + MAX_DLL_NAME, size))
+        if name_end < 0:
+            continue
+
+        # bytes() since a bytearray slice cannot be a dict key
+        index = _DLL_AT.get(bytes(data[name_offset:name_end]).upper())
+        if index is not None:
+            row[index] = 1.0
+
+
+def _parse_resources(data, offset, row):
+    """Count entries under each resource type in the root resource directory"""
+    size = len(data)
+
+    if offset + RESOURCE_DIRECTORY.size > size:
+        return
+    named, ids = RESOURCE_DIRECTORY.unpack_from(data, offset)[4:6]
+    entries = min(named + ids, MAX_RESOURCE_ENTRIES)
+
+    entry = offset + RESOURCE_DIRECTORY.size
+    for _ in range(entries):
+        if entry + RESOURCE_ENTRY.size > size:
+            break
+        name, target = RESOURCE_ENTRY.unpack_from(data, entry)
+        entry += RESOURCE_ENTRY.size
+
+        index = None if name & 0x80000000 else _RESOURCE_AT.get(name)
+        if index is None:
+            continue
+
+        if target & 0x80000000:
+            # Subdirectory: one entry per resource of this type
+            subdir = offset + (target & 0x7FFFFFFF)
+            if subdir + RESOURCE_DIRECTORY.size <= size:
+                sub_named, sub_ids = RESOURCE_DIRECTORY.unpack_from(data, subdir)[4:6]
+                row[index] += min(sub_named + sub_ids, MAX_RESOURCE_ENTRIES)
+        else:
+            row[index] += 1
+
+
+def _parse_headers(data, row):
+    """
+    Fill row's COFF, optional header, data directory and derived
+    features, returning (section_table_offset, num_sections)
+    """
+    size = len(data)
+
+    if data[:2] != b'MZ':
+        raise PEParseError("Not a valid PE file (missing MZ signature)")
+    if size < 0x40:
+        raise PEParseError("Truncated DOS header")
+
+    pe_offset = DOS_LFANEW.unpack_from(data, 0x3C)[0]
+    if data[pe_offset:pe_offset + 4] != b'PE\x00\x00':
+        raise PEParseError("Invalid PE signature")
+
+    coff_offset = pe_offset + 4
+    if coff_offset + COFF_HEADER.size > size:
+        raise PEParseError("Truncated COFF header")
+
+    coff = COFF_HEADER.unpack_from(data, coff_offset)
+    row[_COFF_AT:_COFF_AT + len(coff)] = coff
+    num_sections, timestamp, opt_header_size, characteristics = coff[1], coff[2], coff[5], coff[6]
+
+    # Optional header: standard fields, Windows fields, data directories
+    opt_offset = coff_offset + COFF_HEADER.size
+    opt_end = min(opt_offset + opt_header_size, size)
+    size_of_code = 0
+
+    if opt_offset + 2 <= opt_end:
+        magic = struct.unpack_from('<H', data, opt_offset)[0]
+        if magic == PE32_PLUS_MAGIC:
+            standard, windows = OPT_STANDARD_PE32_PLUS, OPT_WINDOWS_PE32_PLUS
+        else:
+            standard, windows = OPT_STANDARD_PE32, OPT_WINDOWS_PE32
+
+        if opt_offset + standard.size <= opt_end:
+            fields = standard.unpack_from(data, opt_offset)
+            row[_STANDARD_AT:_STANDARD_AT + len(fields)] = fields
+            size_of_code = fields[3]
+
+            windows_offset = opt_offset + standard.size
+            if windows_offset + windows.size <= opt_end:
+                fields = windows.unpack_from(data, windows_offset)
+                row[_WINDOWS_AT:_WINDOWS_AT + len(fields)] = fields
+
+                dir_offset = windows_offset + windows.size
+                dir_count = min(fields[-1], len(DATA_DIRECTORIES),
+                                (opt_end - dir_offset) // DATA_DIRECTORY.size)
+                for i in range(dir_count):
+                    rva, dir_size = DATA_DIRECTORY.unpack_from(data, dir_offset + i * DATA_DIRECTORY.size)
+                    row[_DATA_DIR_AT + 2 * i] = rva
+                    row[_DATA_DIR_AT + 2 * i + 1] = dir_size
+
+    # Derived features
+    row[FEATURE_INDEX['file_size']] = size
+    row[FEATURE_INDEX['sections_per_kb']] = num_sections / (size / 1024) if size > 0 else 0
+    row[FEATURE_INDEX['code_to_file_ratio']] = size_of_code / size if size > 0 else 0
+    row[FEATURE_INDEX['is_dll']] = 1 if (characteristics & 0x2000) else 0
+    row[FEATURE_INDEX['is_executable']] = 1 if (characteristics & 0x0002) else 0
+    row[FEATURE_INDEX['timestamp_suspicious']] = 1 if timestamp > 2000000000 or timestamp < 1000000000 else 0
+
+    return opt_offset + opt_header_size, num_sections
+
+
+def parse_pe_headers(data, out=None):
+    """
+    Parse only a PE buffer's headers into the PE_FEATURE_NAMES layout
+
+    Fills the COFF, optional header and data directory fields and the
+    derived features, all read from the first few hundred bytes; section,
+    import, DLL and resource features stay zero. This is the cheap
+    header-only view used by the cascade's screening tier. Returns the
+    row as a list of floats, or fills and returns out.
+    """
+    row = [0.0] * len(PE_FEATURE_NAMES)
+    _parse_headers(data, row)
+
+    if out is not None:
+        out[:] = row
+        return out
+    return row
+
+
+def parse_pe(data, out=None):
+    """
+    Parse a PE buffer into the fixed PE_FEATURE_NAMES layout
+
+    data holds the whole file (bytes, bytearray or mmap); it is read with
+    struct.unpack_from and never copied. Returns a list of floats aligned
+    with PE_FEATURE_NAMES, or fills and returns out (e.g. a row of a
+    preallocated numpy matrix) when given. Raises PEParseError when the
+    DOS/PE signatures or the COFF header are missing; damage past the
+    COFF header just leaves the affected features at zero.
+    """
+    size = len(data)
+    row = [0.0] * len(PE_FEATURE_NAMES)
+    section_offset, num_sections = _parse_headers(data, row)
+
+    # Section table
+    sections = []
+    for i in range(min(num_sections, MAX_SECTIONS)):
+        entry = section_offset + i * SECTION_HEADER.size
+        if entry + SECTION_HEADER.size > size:
+            break
+        header = SECTION_HEADER.unpack_from(data, entry)
+        sections.append((header[2], header[1], header[4], header[3]))
+
+        section = _SECTION_NAMES.get(header[0].rstrip(b'\x00'))
+        if section is not None:
+            at = _SECTION_AT[section]
+            if not any(row[at:at + len(SECTION_FIELDS)]):
+                row[at:at + len(SECTION_FIELDS)] = header[1:]
+
+    # Import and resource directories, located through the section table
+    import_rva = int(row[FEATURE_INDEX['dd_import_rva']])
+    if import_rva:
+        import_offset = _rva_to_offset(import_rva, sections, size)
+        if import_offset is not None:
+            _parse_imports(data, import_offset, sections, row)
+
+    resource_rva = int(row[FEATURE_INDEX['dd_resource_rva']])
+    if resource_rva:
+        resource_offset = _rva_to_offset(resource_rva, sections, size)
+        if resource_offset is not None:
+            _parse_resources(data, resource_offset, row)
+
+    if out is not None:
+        out[:] = row
+        return out
+    return row
@@ -0,0 +1,162 @@
+"""
+Scan Manifest Module
+Persistent record of what a directory scan saw and decided
+Lets --incremental rescans skip unchanged files and report deletions
+"""
+
+import os
+import sqlite3
+
+# Verdicts worth remembering; errors are retried on the next run
+RECORDED_VERDICTS = ('malicious', 'known_malicious', 'clean', 'unsupported')
+
+# Manifest writes between commits during a scan
+COMMIT_INTERVAL = 50000
+
+
+class ScanManifest:
+    """
+    Per-path manifest of (inode, size, mtime_ns, detector, model version,
+    verdict) from previous scans, in SQLite (WAL)
+
+    Nothing is loaded up front: each file is a primary-key lookup, so
+    opening a manifest of millions of entries is instant. Every run gets
+    a scan id; unchanged files are stamped with it, and entries under the
+    scanned directory left with an older id at the end of the run are the
+    files deleted since the last scan.
+    """
+
+    def __init__(self, db_path="scan_manifest.db"):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS manifest (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                detector TEXT NOT NULL,
+                model_version TEXT,
+                verdict TEXT NOT NULL,
+                scan_id INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS scans (
+                scan_id INTEGER PRIMARY KEY,
+                directory TEXT NOT NULL
+            );
+        ''')
+        self.conn.commit()
+
+        self.scan_id = None
+        self.unchanged = 0
+        self.changed = 0
+        self.new = 0
+        self._writes = 0
+
+    def begin(self, directory):
+        """Start a scan of directory, returning its scan id"""
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO scans (directory) VALUES (?)', (os.path.abspath(directory),)
+            )
+        self.scan_id = cursor.lastrowid
+        self.unchanged = 0
+        self.changed = 0
+        self.new = 0
+        return self.scan_id
+
+    def needs_scan(self, filepath, stat_result, model_versions):
+        """
+        Whether filepath is new or changed since it was last recorded
+
+        A file is unchanged when its inode, size and mtime match and its
+        detector's model version (model_versions maps detector type to the
+        current version) is the one that produced the stored verdict.
+        Unchanged files are stamped as seen in this scan.
+        """
+        path = os.path.abspath(filepath)
+        row = self.conn.execute(
+            'SELECT inode, size, mtime_ns, detector, model_version FROM manifest WHERE path = ?',
+            (path,)
+        ).fetchone()
+
+        if row is None:
+            self.new += 1
+            return True
+
+        inode, size, mtime_ns, detector, model_version = row
+        if (inode != stat_result.st_ino or size != stat_result.st_size
+                or mtime_ns != stat_result.st_mtime_ns
+                or model_versions.get(detector, model_version) != model_version):
+            self.changed += 1
+            return True
+
+        self.conn.execute('UPDATE manifest SET scan_id = ? WHERE path = ?', (self.scan_id, path))
+        self.unchanged += 1
+        self._count_write()
+        return False
+
+    def record(self, filepath, stat_result, detector, model_version, verdict):
+        """Store a scanned file's verdict (errors are not stored, so they are retried)"""
+        if verdict not in RECORDED_VERDICTS:
+            return
+
+        self.conn.execute(
+            'INSERT OR REPLACE INTO manifest '
+            '(path, inode, size, mtime_ns, detector, model_version, verdict, scan_id) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (os.path.abspath(filepath), stat_result.st_ino, stat_result.st_size,
+             stat_result.st_mtime_ns, detector, model_version, verdict, self.scan_id)
+        )
+        self._count_write()
+
+    def _count_write(self):
+        self._writes += 1
+        if self._writes >= COMMIT_INTERVAL:
+            self.conn.commit()
+            self._writes = 0
+
+    def finish(self, directory, recursive=True):
+        """
+        End the scan: drop and return the paths under directory that were
+        recorded by earlier scans but not seen in this one
+        """
+        root = os.path.abspath(directory)
+        prefix = os.path.join(root, '')
+
+        # Range over the primary key instead of LIKE, which would scan
+        rows = self.conn.execute(
+            'SELECT path FROM manifest WHERE path >= ? AND path < ? AND scan_id != ?',
+            (prefix, prefix + '\U0010ffff', self.scan_id)
+        ).fetchall()
+
+        deleted = [
+            path for (path,) in rows
+            if recursive or os.path.dirname(path) == root
+        ]
+
+        # Only report files that are really gone, not ones the walk skipped
+        deleted = [path for path in deleted if not os.path.exists(path)]
+
+        self.conn.executemany('DELETE FROM manifest WHERE path = ?', [(path,) for path in deleted])
+        self.conn.commit()
+        self._writes = 0
+
+        return deleted
+
+    def get_statistics(self):
+        """Counts for the current scan and the manifest size"""
+        entries = self.conn.execute('SELECT COUNT(*) FROM manifest').fetchone()[0]
+        return {
+            'entries': entries,
+            'unchanged': self.unchanged,
+            'changed': self.changed,
+            'new': self.new
+        }
+
+    def close(self):
+        """Commit and close the database"""
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,214 @@
+"""
+Scan Metrics Module
+Low-overhead per-stage latency histograms and counters for the scanner
+Exported as JSON or Prometheus text exposition format
+"""
+
+import json
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in seconds (an implicit +Inf bucket follows)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Label used for work done before a file is routed to a detector
+ALL_DETECTORS = 'ALL'
+
+# Scan stages, in pipeline order
+STAGES = (
+    'open',             # open + fstat + mmap of the file
+    'detect_type',      # magic-byte sniffing
+    'ioc_lookup',       # IOC store blocklist lookup
+    'cache_lookup',     # verdict cache hashing and lookup
+    'screen',           # cascade header screen (fast / balanced modes)
+    'extract_features', # EXIF / PE feature extraction
+    'predict',          # model inference (amortized per file in a batch)
+    'hash',             # evidence digests (SHA-256, MD5, SHA-1) for the IOC check and forensic log
+    'log_build',        # forensic log entry construction
+    'log_write',        # forensic log append
+    'scan_file'         # whole scan_file call
+)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram
+
+    observe() is a bisect and three additions, so it is cheap enough to
+    call per file on the hot path. Histograms with the same buckets merge
+    by adding their counts.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'total')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds, count=1):
+        """Record count observations of seconds each"""
+        self.counts[bisect_left(self.bounds, seconds)] += count
+        self.count += count
+        self.total += seconds * count
+
+    def merge(self, state):
+        """Add a state produced by to_state() into this histogram"""
+        counts, count, total = state
+        for i, value in enumerate(counts):
+            self.counts[i] += value
+        self.count += count
+        self.total += total
+
+    def to_state(self):
+        """Compact picklable state: (counts, count, total)"""
+        return list(self.counts), self.count, self.total
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating inside its bucket"""
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                if i == len(self.bounds):
+                    # +Inf bucket: the best estimate is its lower bound
+                    return lower
+                upper = self.bounds[i]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+
+        return self.bounds[-1]
+
+
+class ScanMetrics:
+    """
+    Stage histograms and counters, keyed by detector type
+
+    A worker process keeps its own ScanMetrics and ships drain() results
+    back with each chunk; the parent merge()s them, so the parent's
+    get_metrics() covers the whole scan.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, stage, seconds, detector=ALL_DETECTORS, count=1):
+        """Record a stage latency (seconds per file, for count files)"""
+        key = (stage, detector)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(seconds, count)
+
+    def increment(self, name, detector=ALL_DETECTORS, amount=1):
+        """Add amount to a counter"""
+        key = (name, detector)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """Picklable copy of all metrics, suitable for merge()"""
+        return {
+            'histograms': {key: h.to_state() for key, h in self.histograms.items()},
+            'counters': dict(self.counters)
+        }
+
+    def drain(self):
+        """Return a snapshot and reset, so each snapshot is merged once"""
+        snapshot = self.snapshot()
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Fold another process's snapshot into these metrics"""
+        for key, state in snapshot['histograms'].items():
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.merge(state)
+        for key, amount in snapshot['counters'].items():
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def reset(self):
+        """Drop all recorded metrics"""
+        self.histograms = {}
+        self.counters = {}
+
+    def get_metrics(self):
+        """
+        JSON-friendly summary
+
+        {'stages': {stage: {detector: {count, total_seconds, mean_ms,
+        p50_ms, p95_ms, p99_ms}}}, 'counters': {name: {detector: value}}}
+        Quantiles are bucket-interpolated estimates.
+        """
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 4)
+
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        stages = {}
+        for (stage, detector), h in sorted(
+            self.histograms.items(), key=lambda item: (order.get(item[0][0], len(order)), item[0])
+        ):
+            stages.setdefault(stage, {})[detector] = {
+                'count': h.count,
+                'total_seconds': round(h.total, 6),
+                'mean_ms': ms(h.total / h.count) if h.count else None,
+                'p50_ms': ms(h.quantile(0.50)),
+                'p95_ms': ms(h.quantile(0.95)),
+                'p99_ms': ms(h.quantile(0.99))
+            }
+
+        counters = {}
+        for (name, detector), value in sorted(self.counters.items()):
+            counters.setdefault(name, {})[detector] = value
+
+        return {'stages': stages, 'counters': counters}
+
+    def to_json(self, indent=2):
+        """Metrics summary as a JSON document"""
+        return json.dumps(self.get_metrics(), indent=indent)
+
+    def to_prometheus(self, prefix='malware_scan'):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+
+        name = f'{prefix}_stage_duration_seconds'
+        lines.append(f'# HELP {name} Time spent per file in each scan stage.')
+        lines.append(f'# TYPE {name} histogram')
+        for (stage, detector), h in sorted(self.histograms.items()):
+            labels = f'stage="{stage}",detector="{detector}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, h.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f'{name}_sum{{{labels}}} {h.total:.9f}')
+            lines.append(f'{name}_count{{{labels}}} {h.count}')
+
+        names = sorted(set(counter for counter, _ in self.counters))
+        for counter in names:
+            metric = f'{prefix}_{counter}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for (key, detector), value in sorted(self.counters.items()):
+                if key == counter:
+                    lines.append(f'{metric}{{detector="{detector}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, fmt='json'):
+        """Render the metrics as 'json' or 'prometheus' text"""
+        if fmt == 'json':
+            return self.to_json()
+        if fmt == 'prometheus':
+            return self.to_prometheus()
+        raise ValueError(f"Unknown metrics format: {fmt}")
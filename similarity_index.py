@@ -0,0 +1,334 @@
+"""
+Similarity Index Module
+Locality-sensitive hashing of detector feature vectors
+Random-hyperplane signatures, banded buckets and a memory-mapped signature file
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+INDEX_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+SIGNATURE_FILE = 'signatures.bin'
+INDEX_FILE = 'index.db'
+
+# Hyperplanes per signature, and the bands they are bucketed by. Two
+# files share a band's bucket only if all of its bits agree, so a query
+# reads a handful of ~N / 65536 buckets instead of every signature.
+SIGNATURE_BITS = 128
+SIGNATURE_BANDS = 8
+SIGNATURE_BYTES = SIGNATURE_BITS // 8
+BAND_HEX = SIGNATURE_BITS // SIGNATURE_BANDS // 4
+
+# Neighbours returned per query, and the Hamming distance (in bits) past
+# which a candidate no longer counts as similar. A bit differs with
+# probability angle / pi, so 16 of 128 bits is about 22 degrees.
+SIMILAR_FILES_K = 10
+SIMILAR_MAX_DISTANCE = 16
+
+# Projection matrices by feature layout
+_projections = {}
+
+
+def _projection(feature_names):
+    """
+    (n_features x SIGNATURE_BITS) matrix of +1 / -1 hyperplane weights
+
+    Each feature's weights are the bits of a digest of its name, so the
+    hyperplanes are the same in every process and NumPy version, and a
+    feature keeps its weights when columns are added or reordered.
+    """
+    import numpy as np
+
+    key = tuple(feature_names)
+    projection = _projections.get(key)
+    if projection is None:
+        digests = b''.join(
+            hashlib.shake_128(name.encode()).digest(SIGNATURE_BYTES) for name in key
+        )
+        bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(key), SIGNATURE_BITS)
+        projection = _projections[key] = bits.astype(np.float32) * 2.0 - 1.0
+    return projection
+
+
+def signatures(X, feature_names):
+    """
+    Hex LSH signatures of the rows of a feature matrix
+
+    Features span many orders of magnitude (sizes, timestamps, flags), so
+    each value is compressed to sign(x) * log1p(|x|) before projection;
+    otherwise the largest column would decide every hyperplane. The PE
+    layout includes pe_parser's dll_* import flags, so files importing
+    the same DLLs also move towards the same signature.
+    """
+    import numpy as np
+
+    X = np.asarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X[np.newaxis, :]
+    scaled = np.sign(X) * np.log1p(np.abs(X))
+    bits = (scaled @ _projection(feature_names)) > 0
+    packed = np.packbits(bits, axis=1)
+    return [row.tobytes().hex() for row in packed]
+
+
+def _band_keys(signature):
+    return [int(signature[band * BAND_HEX:(band + 1) * BAND_HEX], 16) for band in range(SIGNATURE_BANDS)]
+
+
+class SimilarityIndex:
+    """
+    Persistent LSH index of the files recorded in the forensic log
+
+    The signature file holds one SIGNATURE_BYTES record per file, at
+    offset row * SIGNATURE_BYTES, and is memory-mapped to rank candidates
+    by Hamming distance. The SQLite index maps each record to its file
+    (detector, SHA-256, path, verdict, time) and holds the band buckets:
+    a query looks up the records sharing at least one band with the query
+    signature and ranks only those, so it reads a few buckets however
+    large the index grows.
+
+    Several processes may share an index. Each add assigns its row and
+    writes its record while holding SQLite's write lock, so rows never
+    collide; only committed rows are read, and bytes a crashed writer
+    left past the last of them are overwritten by the next add.
+
+    Signatures are only comparable within one detector type. A file is
+    stored once per detector; logging it again updates its verdict.
+
+    An index may be used and closed from any thread (the async engine
+    logs on a writer thread); a lock serializes its operations.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+
+        self.created = not os.path.exists(manifest_path)
+        if self.created:
+            os.makedirs(path, exist_ok=True)
+            staging = f'{manifest_path}.{os.getpid()}.tmp'
+            with open(staging, 'w') as f:
+                json.dump({
+                    'format_version': INDEX_FORMAT_VERSION,
+                    'signature_bits': SIGNATURE_BITS,
+                    'bands': SIGNATURE_BANDS
+                }, f, indent=2)
+            os.replace(staging, manifest_path)
+        else:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if (manifest.get('format_version'), manifest.get('signature_bits'), manifest.get('bands')) != \
+                    (INDEX_FORMAT_VERSION, SIGNATURE_BITS, SIGNATURE_BANDS):
+                raise ValueError(f"Similarity index at {path} has an unsupported format")
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, INDEX_FILE), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                row INTEGER PRIMARY KEY,
+                detector_type TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                path TEXT,
+                verdict TEXT,
+                timestamp TEXT,
+                UNIQUE (detector_type, sha256)
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                detector_type TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                PRIMARY KEY (detector_type, band, key, row)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256);
+        ''')
+        self.conn.commit()
+
+        self._fd = os.open(os.path.join(path, SIGNATURE_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        self._map = None
+
+    def __len__(self):
+        with self._lock:
+            return self._row_count()
+
+    def _row_count(self):
+        """Number of committed rows (rows are numbered densely from 0)"""
+        return self.conn.execute('SELECT COALESCE(MAX(row) + 1, 0) FROM files').fetchone()[0]
+
+    def add(self, detector_type, signature, sha256, path=None, verdict=None, timestamp=None):
+        """
+        Index a file's signature, returning its record number
+
+        A file already indexed for this detector keeps its record; only
+        its path, verdict and time are updated.
+        """
+        if len(signature) != SIGNATURE_BYTES * 2:
+            raise ValueError(f"Expected a {SIGNATURE_BITS}-bit hex signature, got {signature!r}")
+
+        record = bytes.fromhex(signature)
+        with self._lock:
+            return self._add(detector_type, record, signature, sha256, path, verdict, timestamp)
+
+    def _add(self, detector_type, record, signature, sha256, path, verdict, timestamp):
+        # The write lock is taken up front, so the row read here is still
+        # free when it is inserted, whichever process writes next
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            existing = conn.execute(
+                'SELECT row FROM files WHERE detector_type = ? AND sha256 = ?', (detector_type, sha256)
+            ).fetchone()
+            if existing is not None:
+                conn.execute(
+                    'UPDATE files SET path = ?, verdict = ?, timestamp = ? WHERE row = ?',
+                    (path, verdict, timestamp, existing[0])
+                )
+                conn.commit()
+                return existing[0]
+
+            row = self._row_count()
+            conn.execute(
+                'INSERT INTO files (row, detector_type, sha256, path, verdict, timestamp) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (row, detector_type, sha256, path, verdict, timestamp)
+            )
+            conn.executemany(
+                'INSERT INTO buckets (detector_type, band, key, row) VALUES (?, ?, ?, ?)',
+                [(detector_type, band, key, row) for band, key in enumerate(_band_keys(signature))]
+            )
+            # Written before the commit makes the row visible to readers
+            os.pwrite(self._fd, record, row * SIGNATURE_BYTES)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return row
+
+    def add_entry(self, log_entry):
+        """Index a forensic log entry, if it carries a signature; returns its record or None"""
+        signature = (log_entry.get('technical_details') or {}).get('lsh_signature')
+        file_info = log_entry.get('file_info', {})
+        if not signature or not file_info.get('file_hash_sha256'):
+            return None
+        detection = log_entry.get('detection', {})
+        return self.add(
+            detection.get('detector_type'), signature, file_info['file_hash_sha256'],
+            file_info.get('original_path'), detection.get('verdict'), detection.get('timestamp')
+        )
+
+    def signature_of(self, sha256, detector_type=None):
+        """(detector_type, signature) of an indexed file, or None"""
+        with self._lock:
+            return self._signature_of(sha256, detector_type)
+
+    def _signature_of(self, sha256, detector_type):
+        if detector_type is None:
+            found = self.conn.execute(
+                'SELECT row, detector_type FROM files WHERE sha256 = ? ORDER BY row LIMIT 1', (sha256,)
+            ).fetchone()
+        else:
+            found = self.conn.execute(
+                'SELECT row, detector_type FROM files WHERE sha256 = ? AND detector_type = ?',
+                (sha256, detector_type)
+            ).fetchone()
+        if found is None:
+            return None
+        return found[1], bytes(self._signatures(found[0] + 1)[found[0]]).hex()
+
+    def _signatures(self, n_rows):
+        """Read-only uint8 memory map of at least n_rows committed signature records"""
+        import numpy as np
+
+        if self._map is None or len(self._map) < n_rows:
+            if n_rows == 0:
+                return np.zeros((0, SIGNATURE_BYTES), dtype=np.uint8)
+            # Map every committed row, so the map is only rebuilt when the index grows
+            self._map = np.memmap(
+                os.path.join(self.path, SIGNATURE_FILE), dtype=np.uint8, mode='r',
+                shape=(max(n_rows, self._row_count()), SIGNATURE_BYTES)
+            )
+        return self._map
+
+    def query(self, detector_type, signature, k=SIMILAR_FILES_K, max_distance=SIMILAR_MAX_DISTANCE,
+              exclude_sha256=None):
+        """
+        Up to k indexed files nearest to signature, closest first
+
+        Only files sharing a band bucket with the signature are ranked.
+        With SIGNATURE_BANDS bands of 16 bits, a file at most 7 bits away
+        always shares one; further out recall is probabilistic: about
+        99.7% at 8 bits, 89% at 12 and 63% at SIMILAR_MAX_DISTANCE (16).
+        Each match is a dict with the file's sha256, path, verdict,
+        timestamp, Hamming distance and similarity (the fraction of
+        signature bits that agree).
+        """
+        with self._lock:
+            return self._query(detector_type, signature, k, max_distance, exclude_sha256)
+
+    def _query(self, detector_type, signature, k, max_distance, exclude_sha256):
+        import numpy as np
+
+        n_rows = self._row_count()
+        if n_rows == 0:
+            return []
+
+        candidates = set()
+        for band, key in enumerate(_band_keys(signature)):
+            candidates.update(row for (row,) in self.conn.execute(
+                'SELECT row FROM buckets WHERE detector_type = ? AND band = ? AND key = ?',
+                (detector_type, band, key)
+            ))
+        rows = np.array(sorted(row for row in candidates if row < n_rows), dtype=np.intp)
+        if not len(rows):
+            return []
+
+        query = np.frombuffer(bytes.fromhex(signature), dtype=np.uint8)
+        distances = np.unpackbits(self._signatures(n_rows)[rows] ^ query, axis=1).sum(axis=1)
+        order = np.argsort(distances, kind='stable')
+
+        matches = []
+        for i in order:
+            distance = int(distances[i])
+            if max_distance is not None and distance > max_distance:
+                break
+            sha256, path, verdict, timestamp = self.conn.execute(
+                'SELECT sha256, path, verdict, timestamp FROM files WHERE row = ?', (int(rows[i]),)
+            ).fetchone()
+            if sha256 == exclude_sha256:
+                continue
+            matches.append({
+                'sha256': sha256,
+                'path': path,
+                'verdict': verdict,
+                'timestamp': timestamp,
+                'distance': distance,
+                'similarity': round(1.0 - distance / SIGNATURE_BITS, 4)
+            })
+            if len(matches) >= k:
+                break
+        return matches
+
+    def query_entry(self, log_entry, k=SIMILAR_FILES_K, max_distance=SIMILAR_MAX_DISTANCE):
+        """Files similar to a forensic log entry's file (never the file itself)"""
+        signature = (log_entry.get('technical_details') or {}).get('lsh_signature')
+        if not signature:
+            return []
+        return self.query(
+            log_entry['detection']['detector_type'], signature, k, max_distance,
+            exclude_sha256=log_entry['file_info'].get('file_hash_sha256')
+        )
+
+    def close(self):
+        """Close the signature file and the index"""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._map = None
+            self.conn.close()
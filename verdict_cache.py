@@ -0,0 +1,161 @@
+"""
+Verdict Cache Module
+Persistent, content-addressed cache of detector verdicts
+Lets rescans of unchanged files skip feature extraction and model inference
+"""
+
+import json
+import os
+import sqlite3
+import time
+
+from hashing import file_sha256
+
+
+class VerdictCache:
+    """
+    On-disk verdict cache keyed by (SHA-256, model version)
+
+    A second table maps (dev, inode) to the last known (size, mtime_ns,
+    sha256) so unchanged files are looked up without being rehashed.
+    Entries are evicted least-recently-used once max_entries is exceeded,
+    and because the model version is part of the key, retraining or
+    loading a different model invalidates every cached verdict.
+    """
+
+    def __init__(self, db_path="verdict_cache.db", max_entries=1000000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS verdicts (
+                sha256 TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (sha256, model_version)
+            );
+            CREATE INDEX IF NOT EXISTS idx_verdicts_last_used ON verdicts (last_used);
+            CREATE TABLE IF NOT EXISTS file_ids (
+                dev INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (dev, inode)
+            );
+            CREATE INDEX IF NOT EXISTS idx_file_ids_last_used ON file_ids (last_used);
+        ''')
+        self.conn.commit()
+
+        self._entries = self.conn.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0]
+
+    def file_hash(self, filepath, stat_result=None, data=None, sha256=None):
+        """
+        Return the SHA-256 of filepath, reusing the stored digest when the
+        file's (dev, inode, size, mtime) are unchanged since it was hashed
+
+        data may be the file's already-read contents, hashed instead of
+        reopening the file on a fast-path miss. sha256 may be a digest the
+        caller already computed from those contents; it is then recorded
+        for the file without hashing it again.
+        """
+        if stat_result is None:
+            stat_result = os.stat(filepath)
+
+        row = self.conn.execute(
+            'SELECT size, mtime_ns, sha256 FROM file_ids WHERE dev = ? AND inode = ?',
+            (stat_result.st_dev, stat_result.st_ino)
+        ).fetchone()
+
+        if row and row[0] == stat_result.st_size and row[1] == stat_result.st_mtime_ns:
+            return row[2]
+
+        digest = sha256 or file_sha256(filepath, data)
+
+        self.conn.execute(
+            'INSERT OR REPLACE INTO file_ids VALUES (?, ?, ?, ?, ?, ?)',
+            (stat_result.st_dev, stat_result.st_ino, stat_result.st_size,
+             stat_result.st_mtime_ns, digest, time.time())
+        )
+        self.conn.commit()
+
+        return digest
+
+    def get(self, sha256, model_version):
+        """Return the cached result for a file hash and model, or None"""
+        row = self.conn.execute(
+            'SELECT result FROM verdicts WHERE sha256 = ? AND model_version = ?',
+            (sha256, model_version)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.conn.execute(
+            'UPDATE verdicts SET last_used = ? WHERE sha256 = ? AND model_version = ?',
+            (time.time(), sha256, model_version)
+        )
+        self.conn.commit()
+
+        return json.loads(row[0])
+
+    def put(self, sha256, model_version, result):
+        """Store a detector result for a file hash and model"""
+        document = json.dumps(result)
+        now = time.time()
+        inserted = self.conn.execute(
+            'INSERT OR IGNORE INTO verdicts VALUES (?, ?, ?, ?)',
+            (sha256, model_version, document, now)
+        ).rowcount
+        if not inserted:
+            # Rescanned file: replace its result without counting a new entry
+            self.conn.execute(
+                'UPDATE verdicts SET result = ?, last_used = ? WHERE sha256 = ? AND model_version = ?',
+                (document, now, sha256, model_version)
+            )
+        self.conn.commit()
+
+        if inserted:
+            self._entries += 1
+            if self._entries > self.max_entries:
+                self.evict()
+
+    def evict(self):
+        """Drop least recently used entries down to 90% of max_entries"""
+        keep = int(self.max_entries * 0.9)
+        self.conn.execute(
+            'DELETE FROM verdicts WHERE rowid IN ('
+            ' SELECT rowid FROM verdicts ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (keep,)
+        )
+        self.conn.execute(
+            'DELETE FROM file_ids WHERE rowid IN ('
+            ' SELECT rowid FROM file_ids ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (keep,)
+        )
+        self.conn.commit()
+
+        self._entries = self.conn.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0]
+
+    def get_statistics(self):
+        """Get cache hit/miss statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': self._entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups > 0 else 0
+        }
+
+    def close(self):
+        """Close the cache database"""
+        self.conn.close()